@@ -1,25 +1,42 @@
 import random
-from market_data import MarketDataService
-from news_engine import NewsEngine
-import pandas as pd
-import ta
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from indicators import IndicatorEngine
+from strategy_registry import STRATEGY_REGISTRY, register_strategy, register_vector_signals, data_requirements, strategy_params
+import numpy as np
 
 class AITrader:
-    def __init__(self, market_service, news_service):
+    # Symbols the strategies trade; tracked so every tick's snapshot and indicator pass covers them
+    WATCHLIST = ["1120", "2222", "1010", "1180"]
+    # Sector rotation candidates (sectors from the news symbol dictionary, data/tadawul_symbols.json)
+    ROTATION_UNIVERSE = WATCHLIST + ["2010", "7010", "2280"]
+
+    def __init__(self, market_service, news_service, indicator_engine=None, time_budget=2.0, params=None):
         self.market = market_service
         self.news = news_service
-        self.strategies = {
-            "رزين": self.conservative_strategy,
-            "مقدام": self.growth_strategy,
-            "حصاد": self.dividend_strategy,
-            "برق": self.scalper_strategy,
-            "قناص": self.mean_reversion_strategy,
-            "موج": self.trend_follower_strategy,
-            "مقتحم": self.volatility_breakout_strategy,
-            "جوال": self.sector_rotator_strategy,
-            "عواطف": self.sentiment_strategy,
-            "محظوظ": self.random_strategy
-        }
+        # Shared indicator values, computed once per tick for all symbols
+        self.indicators = indicator_engine or IndicatorEngine(market_service)
+        # Batch evaluation: every strategy runs each tick against one price snapshot, frozen by prefetch
+        self.time_budget = time_budget  # seconds each strategy may run, from when it starts
+        self._batch_prices = None
+        self._pool = None
+        self._running = {}  # strategy name -> future still running from an earlier batch
+        self._unmatched = None  # strategies without a portfolio, as last reported
+        self.last_batch_seconds = 0.0
+        # Strategies come from the registry (see strategy_registry.register_strategy)
+        self.specs = dict(STRATEGY_REGISTRY)
+        self.strategies = {name: spec.func.__get__(self) for name, spec in self.specs.items()}
+        # Tunable thresholds: registered defaults, overridden by tuned values (see param_sweep)
+        self.params = strategy_params(self.specs.values(), params)
+        self.news_scores = None  # Entity sentiment frozen by prefetch for strategies that declare news=True
+        symbols, _, _ = data_requirements(self.specs.values())
+        self.market.track(symbols)
+
+    def update_indicators(self):
+        """
+        Recomputes indicators for every tracked symbol. Call once per tick before decisions.
+        """
+        return self.indicators.update()
 
     def get_decision(self, strategy_name, portfolio_state):
         """
@@ -31,107 +48,351 @@ class AITrader:
             return strategy_func(portfolio_state)
         return None
 
+    def _timed(self, starts, strategy_name, portfolio_state):
+        starts[strategy_name] = time.monotonic()
+        return self.get_decision(strategy_name, portfolio_state)
+
+    def price(self, symbol):
+        """
+        Price used by strategies: the snapshot frozen by prefetch, or None when
+        the symbol is not in it. Strategies never call the market service, so
+        they cannot trigger a fetch or touch shared state from their threads.
+        """
+        prices = self._batch_prices
+        return prices.get(symbol) if prices is not None else None
+
+    def prefetch(self, names):
+        """
+        Loads everything the given strategies declared, once, before any of them runs:
+        one bulk price snapshot, indicator state and the news sentiment per
+        symbol and sector (scores are kept current as news is ingested, so
+        freezing them is a read, never a fetch).
+        """
+        symbols, indicator_symbols, needs_news = data_requirements(self.specs[n] for n in names)
+        self.market.track(symbols)
+        self.market.refresh_snapshot()
+        self._batch_prices = self.market.snapshot_prices()
+        if indicator_symbols:
+            self.indicators.update(indicator_symbols)
+        if needs_news:
+            self.news_scores = self.news.entities.snapshot()
+
+    def evaluate_all(self, portfolios):
+        """
+        Evaluates every strategy that has a portfolio, in parallel, against a single
+        snapshot of market prices. Each strategy has its own time_budget, counted
+        from when it starts running; one that misses it is skipped for this tick
+        (and not resubmitted while it is still running).
+        Returns {strategy_name: decision}.
+        """
+        names = [name for name in portfolios if name in self.strategies]
+        unmatched = sorted(set(self.strategies) - set(names))
+        if unmatched != self._unmatched:
+            self._unmatched = unmatched
+            if unmatched:
+                print(f"Warning: No portfolio for strategies {', '.join(unmatched)}, not evaluated")
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=len(self.strategies), thread_name_prefix="strategy")
+
+        self.prefetch(names)
+        try:
+            started = time.monotonic()
+            starts = {}  # strategy name -> when its worker picked it up
+            futures = {}
+            for name in names:
+                previous = self._running.get(name)
+                if previous is not None and not previous.done():
+                    print(f"Strategy {name} still running from a previous tick, skipped")
+                    continue
+                future = self._pool.submit(self._timed, starts, name, portfolios[name])
+                self._running[name] = future
+                futures[future] = name
+
+            done = set()
+            pending = set(futures)
+            while pending:
+                # Deadlines run from each strategy's own start (from submission while still queued)
+                now = time.monotonic()
+                deadlines = {future: starts.get(futures[future], started) + self.time_budget for future in pending}
+                for future in [future for future, deadline in deadlines.items() if deadline <= now]:
+                    print(f"Strategy {futures[future]} exceeded its {self.time_budget}s budget")
+                    pending.discard(future)
+                if not pending:
+                    break
+                finished, pending = wait(pending, timeout=min(deadlines[f] for f in pending) - now,
+                                         return_when=FIRST_COMPLETED)
+                done |= finished
+
+            decisions = {}
+            for future in done:
+                name = futures[future]
+                try:
+                    decisions[name] = future.result()
+                except Exception as e:
+                    print(f"Strategy {name} failed: {e}")
+            self.last_batch_seconds = time.monotonic() - started
+            return decisions
+        finally:
+            self._batch_prices = None
+            self.news_scores = None
+
     # --- Strategy Implementations ---
 
+    @register_strategy("رزين", symbols=["1120"],
+                       params={"quantity": 10, "target": 1.05, "stop": 0.98, "min_cash": 2000})
     def conservative_strategy(self, portfolio):
         # Logic: Buy low beta, stable stocks (Al Rajhi, STC, Aramco)
         # Reason: Safety first.
+        p = self.params["رزين"]
         symbol = "1120" # Al Rajhi
-        price = self.market.get_current_price(symbol)
+        price = self.price(symbol)
         
         if not price: return None
         
         # DEMO MODE: Aggressive Entry
         # Buy if we don't own it OR if we own it but have plenty of cash (DCA)
-        if portfolio["cash"] > 2000:
+        if portfolio["cash"] > p["min_cash"]:
             return {
                 "action": "BUY",
                 "symbol": symbol,
-                "quantity": 10,
+                "quantity": p["quantity"],
                 "price": price,
                 "reason": "سهم قيادي مستقر. مكرر الربحية ضمن النطاق الآمن. فرصة جيدة للتجميع (Demo Entry).",
                 "verification_link": "https://www.saudiexchange.sa/wps/portal/tadawul/market-participants/issuers/issuers-directory/company-details/!ut/p/z1/?companySymbol=1120",
                 "goals": {
-                    "target_price": price * 1.05, # 5% target
-                    "stop_loss": price * 0.98,    # 2% stop
+                    "target_price": price * p["target"], # 5% target by default
+                    "stop_loss": price * p["stop"],      # 2% stop by default
                     "time_horizon": "1 Week"
                 }
             }
         return {"action": "HOLD", "reason": "السوق متذبذب، نفضل الانتظار في الكاش.", "goals": None}
 
+    @register_strategy("عواطف", symbols=WATCHLIST, news=True,
+                       params={"min_score": 2.0, "sector_weight": 0.5, "quantity": 50, "target": 1.02, "stop": 0.99,
+                               "min_cash": 2000})
     def sentiment_strategy(self, portfolio):
-        # Logic: Check news. If positive, buy related sector.
-        news_items = self.news.fetch_latest_news()
-        
-        # Simple heuristic: If vast majority positive, buy Index ETF or Proxy
-        positive_count = sum(1 for n in news_items if n["sentiment"] == "Positive")
-        
-        if positive_count >= 3:
-            symbol = "2222" # Aramco (Proxy for market)
-            price = self.market.get_current_price(symbol)
-            if price and portfolio["cash"] > 2000:
+        # Logic: Buy the watchlist symbol with the strongest recent news sentiment,
+        # its own headlines plus (weighted) those about its sector. O(1) per symbol.
+        p = self.params["عواطف"]
+        entities = self.news.entities
+        scores = self.news_scores or {"symbols": {}, "sectors": {}}
+        best = None
+        for symbol in self.WATCHLIST:
+            score, mentions = scores["symbols"].get(symbol, (0.0, 0.0))
+            sector_score, _ = scores["sectors"].get(entities.sector_of(symbol), (0.0, 0.0))
+            signal = score + p["sector_weight"] * sector_score
+            if signal >= p["min_score"] and (best is None or signal > best[1]):
+                best = (symbol, signal, mentions)
+
+        if best:
+            symbol, signal, mentions = best
+            name = entities.symbols.get(symbol, {}).get("name", symbol)
+            price = self.price(symbol)
+            if price and portfolio["cash"] > p["min_cash"]:
                 return {
                     "action": "BUY",
                     "symbol": symbol,
-                    "quantity": 50,
+                    "quantity": p["quantity"],
                     "price": price,
-                    "reason": f"رصدت {positive_count} أخبار إيجابية قوية تؤثر على قطاع الطاقة.",
-                    "verification_link": "https://twitter.com/search?q=Aramco",
+                    "reason": f"رصدت أخباراً إيجابية عن {name} وقطاعه (مؤشر المشاعر {signal:.1f}، {mentions:.0f} إشارة مباشرة).",
+                    "verification_link": "/api/news_archive",
                     "goals": {
-                        "target_price": price * 1.02, 
-                        "stop_loss": price * 0.99,
+                        "target_price": price * p["target"],
+                        "stop_loss": price * p["stop"],
                         "time_horizon": "2 Days"
                     }
                 }
         return {"action": "HOLD", "reason": "لم أجد أخباراً محفزة كافية للدخول.", "goals": None}
 
+    @register_strategy("قناص", symbols=["1010"], indicators=["rsi"],
+                       params={"rsi_entry": 30, "quantity": 20, "target": 1.03, "stop": 0.97, "min_cash": 5000})
     def mean_reversion_strategy(self, portfolio):
-        # Logic: Buy RSI < 30
+        # Logic: Buy RSI < 30 (rsi_entry)
+        p = self.params["قناص"]
         symbol = "1010" # Riyad Bank
-        # Need history from market_data (not implemented fully there, mocking logic)
-        rsi = 25 # Simulated low RSI
+        values = self.indicators.get(symbol)
+        if not values or values["rsi"] is None:
+            return {"action": "HOLD", "reason": "بيانات تاريخية غير كافية لحساب مؤشر RSI.", "goals": None}
+        rsi = round(values["rsi"], 1)
         
-        price = self.market.get_current_price(symbol)
-        if price and rsi < 30 and portfolio["cash"] > 5000:
+        price = self.price(symbol)
+        if price and rsi < p["rsi_entry"] and portfolio["cash"] > p["min_cash"]:
              return {
                 "action": "BUY",
                 "symbol": symbol,
-                "quantity": 20,
+                "quantity": p["quantity"],
                 "price": price,
                 "reason": f"مؤشر RSI وصل إلى {rsi} (تشبع بيعي). نتوقع ارتداداً فنياً قريباً.",
                 "verification_link": "https://www.tradingview.com/chart/?symbol=TADAWUL:1010",
                 "rsi_value": rsi, # For Visualizer
                 "goals": {
-                    "target_price": price * 1.03, 
-                    "stop_loss": price * 0.97,
+                    "target_price": price * p["target"],
+                    "stop_loss": price * p["stop"],
                     "time_horizon": "3 Days"
                 }
             }
         return {"action": "HOLD", "reason": "المؤشرات الفنية في مناطق محايدة.", "goals": None}
 
     # ... Implement others similarly ...
+    @register_strategy("مقدام")
     def growth_strategy(self, _): return {"action": "HOLD", "reason": "بحث عن أسهم نمو...", "goals": None}
+    @register_strategy("حصاد")
     def dividend_strategy(self, _): return {"action": "HOLD", "reason": "بحث عن توزيعات...", "goals": None}
+    @register_strategy("برق")
     def scalper_strategy(self, _): return {"action": "HOLD", "reason": "السيولة ضعيفة للمضاربة.", "goals": None}
-    def trend_follower_strategy(self, _): return {"action": "HOLD", "reason": "السوق في مسار عرضي.", "goals": None}
-    def volatility_breakout_strategy(self, _): return {"action": "HOLD", "reason": "التقلبات منخفضة.", "goals": None}
-    def sector_rotator_strategy(self, _): return {"action": "HOLD", "reason": "تحليل أداء القطاعات...", "goals": None}
+    @register_strategy("جوال", symbols=ROTATION_UNIVERSE, news=True,
+                       params={"min_score": 1.5, "quantity": 20, "target": 1.03, "stop": 0.98, "min_cash": 5000})
+    def sector_rotator_strategy(self, portfolio):
+        # Logic: Rotate into the sector with the best rolling news sentiment,
+        # through its most positively covered symbol not held yet.
+        p = self.params["جوال"]
+        entities = self.news.entities
+        scores = self.news_scores or {"symbols": {}, "sectors": {}}
+        if not scores["sectors"]:
+            return {"action": "HOLD", "reason": "لا يوجد قطاع بزخم إخباري إيجابي واضح.", "goals": None}
+        sector, (sector_score, _) = max(scores["sectors"].items(), key=lambda entry: entry[1][0])
+        if sector_score < p["min_score"]:
+            return {"action": "HOLD", "reason": "لا يوجد قطاع بزخم إخباري إيجابي واضح.", "goals": None}
+
+        candidates = [symbol for symbol in self.ROTATION_UNIVERSE
+                      if entities.sector_of(symbol) == sector and symbol not in portfolio["holdings"]]
+        if not candidates:
+            return {"action": "HOLD", "reason": f"متمركز بالفعل في قطاع {sector}.", "goals": None}
+        symbol = max(candidates, key=lambda s: scores["symbols"].get(s, (0.0, 0.0))[0])
+        price = self.price(symbol)
+        if price and portfolio["cash"] > p["min_cash"]:
+            return {
+                "action": "BUY",
+                "symbol": symbol,
+                "quantity": p["quantity"],
+                "price": price,
+                "reason": f"قطاع {sector} يتصدر المشاعر الإخبارية ({sector_score:.1f}). التدوير نحو {symbol}.",
+                "verification_link": f"https://www.tradingview.com/chart/?symbol=TADAWUL:{symbol}",
+                "goals": {
+                    "target_price": price * p["target"],
+                    "stop_loss": price * p["stop"],
+                    "time_horizon": "1 Week"
+                }
+            }
+        return {"action": "HOLD", "reason": f"قطاع {sector} في الصدارة لكن السيولة غير كافية.", "goals": None}
+
+    @register_strategy("موج", symbols=WATCHLIST, indicators=["ema"],
+                       params={"quantity": 15, "target": 1.06, "stop": 0.97, "min_cash": 3000})
+    def trend_follower_strategy(self, portfolio):
+        # Logic: Buy on a fresh EMA golden cross
+        p = self.params["موج"]
+        for symbol in self.WATCHLIST:
+            values = self.indicators.get(symbol)
+            if not values or values["ema_cross"] != 1:
+                continue
+            price = self.price(symbol)
+            if price and portfolio["cash"] > p["min_cash"]:
+                return {
+                    "action": "BUY",
+                    "symbol": symbol,
+                    "quantity": p["quantity"],
+                    "price": price,
+                    "reason": f"تقاطع إيجابي: المتوسط الأسي {self.indicators.fast} اخترق المتوسط {self.indicators.slow} للأعلى. الاتجاه صاعد.",
+                    "verification_link": f"https://www.tradingview.com/chart/?symbol=TADAWUL:{symbol}",
+                    "goals": {
+                        "target_price": price * p["target"],
+                        "stop_loss": price * p["stop"],
+                        "time_horizon": "2 Weeks"
+                    }
+                }
+        return {"action": "HOLD", "reason": "السوق في مسار عرضي.", "goals": None}
+
+    @register_strategy("مقتحم", symbols=WATCHLIST, indicators=["atr", "volume", "ema"],
+                       params={"quantity": 10, "target_atr": 2.0, "stop_atr": 1.0, "min_cash": 3000})
+    def volatility_breakout_strategy(self, portfolio):
+        # Logic: Volume spike on an up move, stops sized by ATR
+        p = self.params["مقتحم"]
+        for symbol in self.WATCHLIST:
+            values = self.indicators.get(symbol)
+            if not values or not values["volume_spike"] or not values["atr"] or values["trend"] != "up":
+                continue
+            price = self.price(symbol)
+            if price and portfolio["cash"] > p["min_cash"]:
+                atr = values["atr"]
+                return {
+                    "action": "BUY",
+                    "symbol": symbol,
+                    "quantity": p["quantity"],
+                    "price": price,
+                    "reason": f"انفجار في السيولة: الحجم {values['volume_ratio']:.1f} ضعف المتوسط مع اتجاه صاعد.",
+                    "verification_link": f"https://www.tradingview.com/chart/?symbol=TADAWUL:{symbol}",
+                    "goals": {
+                        "target_price": price + p["target_atr"] * atr,
+                        "stop_loss": price - p["stop_atr"] * atr,
+                        "time_horizon": "3 Days"
+                    }
+                }
+        return {"action": "HOLD", "reason": "التقلبات منخفضة.", "goals": None}
     
+    @register_strategy("محظوظ", symbols=["1180"],
+                       params={"threshold": 0.8, "quantity": 5, "target": 1.10, "stop": 0.90, "min_cash": 1000})
     def random_strategy(self, portfolio):
-        if random.random() > 0.8 and portfolio["cash"] > 1000:
+        p = self.params["محظوظ"]
+        if random.random() > p["threshold"] and portfolio["cash"] > p["min_cash"]:
             symbol = "1180" # NCB
-            price = self.market.get_current_price(symbol)
+            price = self.price(symbol)
             if price:
                 return {
                     "action": "BUY",
                     "symbol": symbol,
-                    "quantity": 5,
+                    "quantity": p["quantity"],
                     "price": price,
                     "reason": "اختيار عشوائي (استراتيجية المقارنة).",
                     "goals": {
-                        "target_price": price * 1.10,
-                        "stop_loss": price * 0.90,
+                        "target_price": price * p["target"],
+                        "stop_loss": price * p["stop"],
                         "time_horizon": "Random"
                     }
                 }
         return {"action": "HOLD", "reason": "....", "goals": None}
+
+
+# --- Vectorized forms for the backtester fast path ---
+# Same entry rules as the strategy functions above, evaluated for every day of
+# history at once on backtester.MarketArrays, with the same params.
+# Strategies without a vector form (news-driven or not yet implemented) only
+# run in event replay.
+
+
+@register_vector_signals("رزين")
+def conservative_signals(arrays, p):
+    always = np.ones(arrays.close.shape, dtype=bool)
+    return {"entries": arrays.entries_for(["1120"], always), "quantity": p["quantity"],
+            "target": arrays.close * p["target"], "stop": arrays.close * p["stop"], "min_cash": p["min_cash"]}
+
+
+@register_vector_signals("قناص")
+def mean_reversion_signals(arrays, p):
+    with np.errstate(invalid="ignore"):
+        oversold = np.round(arrays.rsi, 1) < p["rsi_entry"]
+    return {"entries": arrays.entries_for(["1010"], oversold), "quantity": p["quantity"],
+            "target": arrays.close * p["target"], "stop": arrays.close * p["stop"], "min_cash": p["min_cash"]}
+
+
+@register_vector_signals("موج")
+def trend_follower_signals(arrays, p):
+    return {"entries": arrays.entries_for(AITrader.WATCHLIST, arrays.ema_cross == 1), "symbols": AITrader.WATCHLIST,
+            "quantity": p["quantity"], "target": arrays.close * p["target"], "stop": arrays.close * p["stop"],
+            "min_cash": p["min_cash"]}
+
+
+@register_vector_signals("مقتحم")
+def volatility_breakout_signals(arrays, p):
+    atr = arrays.atr
+    with np.errstate(invalid="ignore"):
+        breakout = arrays.volume_spike & arrays.trend_up & (atr > 0)
+    return {"entries": arrays.entries_for(AITrader.WATCHLIST, breakout), "symbols": AITrader.WATCHLIST,
+            "quantity": p["quantity"], "target": arrays.close + p["target_atr"] * atr,
+            "stop": arrays.close - p["stop_atr"] * atr, "min_cash": p["min_cash"]}
+
+
+@register_vector_signals("محظوظ")
+def random_signals(arrays, p):
+    lucky = np.broadcast_to(arrays.rng.random(arrays.days) > p["threshold"], arrays.close.shape)
+    return {"entries": arrays.entries_for(["1180"], lucky), "quantity": p["quantity"],
+            "target": arrays.close * p["target"], "stop": arrays.close * p["stop"], "min_cash": p["min_cash"]}
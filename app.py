@@ -1,16 +1,36 @@
 from flask import Flask, render_template, jsonify
+from flask.json.provider import DefaultJSONProvider
 print("--- FLASK APP V-DEBUG-3 STARTING ---")
 from config import Config
-from market_data import MarketDataService
+from market_data import MarketDataService, CircuitBreaker, SymbolBackoff
+from price_providers import YFinanceProvider, FileReplayProvider
+from bar_store import BarStore
+from indicators import IndicatorEngine
+from trading_calendar import TradingCalendar
 from news_engine import NewsEngine
+from news_entities import EntityIndex
 from portfolio_manager import PortfolioManager
+from trade_log import TradeLog
+from trade_record import TradeRecord
+from state_store import StateStore
 from ai_trader import AITrader
+from strategy_registry import STRATEGY_REGISTRY, load_params
 from challenge_engine import ChallengeEngine
 import threading
 import time
 import random
 
+class TradeJSONProvider(DefaultJSONProvider):
+    """
+    jsonify() writes TradeRecord objects straight from the published snapshot, no per-request copies.
+    """
+    def default(self, o):
+        if isinstance(o, TradeRecord):
+            return o.to_dict()
+        return super().default(o)
+
 app = Flask(__name__)
+app.json = TradeJSONProvider(app)
 app.config.from_object(Config)
 
 @app.errorhandler(404)
@@ -27,11 +47,35 @@ def design_gallery():
     return render_template('design_gallery.html')
 
 # --- Services Initialization ---
-market_service = MarketDataService()
-news_service = NewsEngine()
-portfolio_manager = PortfolioManager()
-ai_trader = AITrader(market_service, news_service)
+if Config.PRICE_PROVIDER == 'replay':
+    price_provider = FileReplayProvider(Config.REPLAY_PATH, speed=Config.REPLAY_SPEED)
+else:
+    price_provider = YFinanceProvider()
+market_service = MarketDataService(price_provider, cache_ttl=Config.PRICE_CACHE_TTL, max_stale=Config.PRICE_MAX_STALE,
+                                   history_store=BarStore(Config.HISTORY_DIR), history_refresh=Config.HISTORY_REFRESH,
+                                   max_concurrency=Config.FETCH_CONCURRENCY, fetch_timeout=Config.FETCH_TIMEOUT,
+                                   calendar=TradingCalendar(Config.HOLIDAYS_FILE),
+                                   breaker=CircuitBreaker(error_threshold=Config.BREAKER_ERROR_RATE, cooldown=Config.BREAKER_COOLDOWN),
+                                   backoff=SymbolBackoff(base=Config.BACKOFF_BASE, cap=Config.BACKOFF_CAP))
+news_service = NewsEngine(Config.NEWS_SOURCES, poll_interval=Config.NEWS_POLL_INTERVAL, timeout=Config.FETCH_TIMEOUT,
+                          recent_window=Config.NEWS_RECENT_WINDOW, archive_size=Config.NEWS_ARCHIVE_SIZE,
+                          entities=EntityIndex.from_file(Config.SYMBOLS_FILE, half_life=Config.NEWS_HALF_LIFE))
+news_service.start() # Feeds are ingested in the background; strategies read the store
+# One portfolio per registered strategy
+portfolio_manager = PortfolioManager(strategy_names=list(STRATEGY_REGISTRY), trade_log=TradeLog(Config.TRADE_LOG_DIR),
+                                     recent_trades=Config.RECENT_TRADES)
+indicator_engine = IndicatorEngine(market_service, checkpoint_path=Config.INDICATOR_CHECKPOINT)
+indicator_engine.restore()
+ai_trader = AITrader(market_service, news_service, indicator_engine, time_budget=Config.STRATEGY_TIME_BUDGET,
+                     params=load_params(Config.STRATEGY_PARAMS))
 challenge_engine = ChallengeEngine(portfolio_manager)
+# Portfolio values follow every snapshot price change (incremental mark-to-market)
+market_service.subscribe(on_price=portfolio_manager.on_price)
+# Restore the running challenge week after a restart (snapshot + WAL tail), then journal every change
+state_store = StateStore(Config.STATE_DIR, snapshot_every=Config.SNAPSHOT_EVERY, sync=Config.STATE_FSYNC)
+state_store.attach(portfolio_manager, challenge_engine)
+# Request threads only read portfolio_manager.published; the simulation thread republishes every tick
+portfolio_manager.publish()
 
 # --- Simulation Loop ---
 def simulation_loop():
@@ -39,65 +83,61 @@ def simulation_loop():
     Background thread to simulate the market and AI decisions.
     """
     print("Starting Simulation Loop...")
-    challenge_engine.start_new_week()
+    if not challenge_engine.is_active: # Not recovered from a previous run
+        challenge_engine.start_new_week()
     
     while True:
         try:
+            # 0. Outside trading hours: no polling or decisions, prices stay at the last close
+            if market_service.market_session() == "closed":
+                market_service.refresh_snapshot() # Only fetches until the last close is cached
+                challenge_engine.check_status()
+                state_store.maybe_snapshot()
+                portfolio_manager.publish()
+                market_service.sleep(market_service.poll_interval(Config.TICK_INTERVAL, Config.IDLE_POLL_INTERVAL))
+                continue
+
             # 1. Update Market Status
-            # In real app, we fetch new prices here for all tracked symbols
-            
-            # 2. AI Decision Making (Randomly pick a strategy to act per tick)
-            strategies = list(portfolio_manager.portfolios.keys())
-            active_strategy = random.choice(strategies)
-            
-            portfolio_state = portfolio_manager.portfolios[active_strategy]
-            decision = ai_trader.get_decision(active_strategy, portfolio_state)
+            # One bulk fetch for all tracked symbols; every price lookup below is served from the snapshot
+            market_service.refresh_snapshot()
+            if market_service.update_history():
+                indicator_engine.checkpoint()
+            ai_trader.update_indicators()
             
-            if decision:
-                # Always log the reasoning, whether BUY, SELL, or HOLD
-                portfolio_manager.update_log(active_strategy, f"[{decision['action']}] {decision.get('reason', '')}")
+            # 2. AI Decision Making (every strategy evaluates against the same snapshot each tick)
+            # Strategy threads get the published read-only portfolios, never the live dicts
+            decisions = ai_trader.evaluate_all(portfolio_manager.published["portfolios"])
             
-            if decision and decision['action'] == 'BUY':
-                # Execute Buy
-                success, msg = portfolio_manager.execute_trade(
-                    active_strategy, 'BUY', decision['symbol'], 
-                    decision['price'], decision['quantity'], 
-                    decision['reason'], decision['goals'],
-                    extra_data=decision
-                )
-                if success:
-                    print(f"TRADE: {active_strategy} Bought {decision['symbol']}")
+            for active_strategy, decision in decisions.items():
+                if decision:
+                    # Always log the reasoning, whether BUY, SELL, or HOLD
+                    portfolio_manager.update_log(active_strategy, f"[{decision['action']}] {decision.get('reason', '')}")
+                
+                if decision and decision['action'] == 'BUY':
+                    # Execute Buy
+                    success, msg = portfolio_manager.execute_trade(
+                        active_strategy, 'BUY', decision['symbol'], 
+                        decision['price'], decision['quantity'], 
+                        decision['reason'], decision['goals'],
+                        extra_data=decision
+                    )
+                    if success:
+                        print(f"TRADE: {active_strategy} Bought {decision['symbol']}")
             
-            # 3. Simulated Price Movements & Stop Loss/Take Profit Checks
-            # (Simplified for demo)
-            for name, p in portfolio_manager.portfolios.items():
-                # Re-calculate total value based on mock price updates or real if available
-                current_val = p['cash']
-                for sym, qty in p['holdings'].items():
-                    price = market_service.get_current_price(sym)
-                    if price:
-                        current_val += price * qty
-                        
-                        # Check Stops/Targets for active trades (basic check)
-                        # In a full implementation, we'd map trades to specific lots
-                        for trade in p['active_trades']:
-                            if trade['symbol'] == sym and trade['goals']:
-                                if price >= trade['goals']['target_price']:
-                                    # Take Profit
-                                    portfolio_manager.execute_trade(name, 'SELL', sym, price, qty, "Target Reached", None, {})
-                                elif price <= trade['goals']['stop_loss']:
-                                    # Stop Loss
-                                    portfolio_manager.execute_trade(name, 'SELL', sym, price, qty, "Stop Loss Hit", None, {})
-
-                p['total_value'] = current_val
+            # 3. Stop Loss/Take Profit Checks at the latest snapshot prices
+            # (re-valuation already happened per price change through portfolio_manager.on_price)
+            for name in portfolio_manager.portfolios:
+                portfolio_manager.check_exits(name, market_service.get_current_price)
 
             challenge_engine.check_status()
+            state_store.maybe_snapshot()
+            portfolio_manager.publish() # Readers see this tick's state all at once
             
-            time.sleep(5) # Tick every 5 seconds
+            market_service.sleep(Config.TICK_INTERVAL) # Tick every 5 seconds (simulated time in replay mode)
             
         except Exception as e:
             print(f"Simulation Error: {e}")
-            time.sleep(5)
+            market_service.sleep(Config.TICK_INTERVAL)
 
 # Start Simulation Thread
 sim_thread = threading.Thread(target=simulation_loop, daemon=True)
@@ -142,43 +182,76 @@ def device_lab():
 
 # --- API Endpoints ---
 
+# (published version, JSON body) of the last /api/live_data response
+_live_data_cache = (None, None)
+
 @app.route('/api/live_data')
 def api_live_data():
     """
     Returns data for the Live Broadcast view.
     Includes Leaderboard and latest Ticker events.
     """
-    leaderboard = portfolio_manager.get_portfolio_summary()
-    
-    # Get latest 5 trades across all portfolios
-    latest_trades = []
-    for name, p in portfolio_manager.portfolios.items():
-        for trade in p['history'][-2:]: # Last 2 per strategy
-            trade_display = trade.copy()
-            trade_display['strategy'] = name
-            latest_trades.append(trade_display)
-            
-    # Sort trades by timestamp (mock timestamp for now, assume order is roughly correct)
-    # In real app, use real datetime objects
+    global _live_data_cache
+    snapshot = portfolio_manager.published # One consistent tick, no locking
     
-    return jsonify({
-        "leaderboard": leaderboard,
-        "recent_trades": latest_trades[-10:] # Return last 10 global trades
-    })
+    # Latest trades across all portfolios (last 2 per strategy, last 10 overall) and the ranked
+    # leaderboard are built at publish time; the body is serialized once per published version
+    version, body = _live_data_cache
+    if version != snapshot["version"]:
+        body = app.json.dumps({
+            "leaderboard": snapshot["leaderboard"],
+            "recent_trades": snapshot["recent_trades"]
+        })
+        _live_data_cache = (snapshot["version"], body)
+    return app.response_class(body, mimetype="application/json")
 
 @app.route('/api/portfolio/<strategy_name>')
 def api_portfolio_detail(strategy_name):
     """
     Returns full details for the App view.
     """
-    portfolio = portfolio_manager.portfolios.get(strategy_name)
+    portfolio = portfolio_manager.published["portfolios"].get(strategy_name)
     if portfolio:
         return jsonify(portfolio)
     return jsonify({"error": "Not Found"}), 404
 
+@app.route('/api/portfolio/<strategy_name>/trades')
+def api_portfolio_trades(strategy_name):
+    """
+    Older trades from the on-disk log, newest first.
+    ?segment=<name> limits to one week, ?limit=N (default 100), ?offset=N pages.
+    """
+    from flask import request
+    from itertools import islice
+    if strategy_name not in portfolio_manager.published["portfolios"]:
+        return jsonify({"error": "Not Found"}), 404
+    trade_log = portfolio_manager.trade_log
+    segment = request.args.get('segment')
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    offset = request.args.get('offset', 0, type=int)
+    trades = trade_log.iter_trades(strategy_name, segments=[segment] if segment else None, newest_first=True)
+    return jsonify({
+        "segments": trade_log.segments(),
+        "trades": list(islice(trades, offset, offset + limit))
+    })
+
+@app.route('/api/news')
+def api_news():
+    """
+    News published in the last ?max_age seconds (default NEWS_RECENT_WINDOW), newest first. ?limit=N (default 50).
+    """
+    from flask import request
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify(news_service.latest(request.args.get('max_age', type=float), limit))
+
 @app.route('/api/news_archive')
 def api_news_archive():
-    return jsonify(news_service.get_archive())
+    """
+    Latest archived news, newest first. ?limit=N (default 50), ?before_id=<id> pages back.
+    """
+    from flask import request
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify(news_service.get_archive(limit, request.args.get('before_id', type=int)))
 
 @app.route('/api/verify_data')
 def api_verify_data():
@@ -189,7 +262,8 @@ def api_verify_data():
     from flask import request
     strategy = request.args.get('strategy', 'مقدام')
     
-    audit_data = portfolio_manager.get_audit_report(strategy)
+    portfolio = portfolio_manager.published["portfolios"].get(strategy)
+    audit_data = {**portfolio["audit"], "history": portfolio["history"]} if portfolio else None
     
     if not audit_data:
         # Fallback
@@ -197,9 +271,9 @@ def api_verify_data():
         
     return jsonify({
         "server_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "market_status": "Open (Simulated)", 
-        "connection_status": "Healthy",
-        "data_source": "yfinance + Tadawul (Live Connection)",
+        "market_status": market_service.get_market_status()["status"],
+        "connection_status": "Healthy" if market_service.is_connected() else "Degraded (upstream circuit open)",
+        "data_source": market_service.provider.name,
         "audit": audit_data
     })
 
@@ -214,7 +288,7 @@ def api_chat():
     # In a real app, this would call OpenAI/Gemini
     
     # Contextual Response Logic
-    portfolio = portfolio_manager.portfolios.get(ui_persona)
+    portfolio = portfolio_manager.published["portfolios"].get(ui_persona)
     last_trade = portfolio['history'][-1] if portfolio and portfolio['history'] else None
     
     # Check if user is questioning decisions
@@ -222,9 +296,9 @@ def api_chat():
     
     if is_questioning and last_trade:
         # Smart Response based on last action
-        reason = last_trade.get('reason', 'ظروف السوق كانت مناسبة.')
-        symbol = last_trade.get('symbol', 'السهم')
-        action = "شراء" if last_trade.get('action') == "BUY" else "بيع"
+        reason = last_trade.reason or 'ظروف السوق كانت مناسبة.'
+        symbol = last_trade.symbol or 'السهم'
+        action = "شراء" if last_trade.action == "BUY" else "بيع"
         
         response_text = f"سؤال وجيه. قراري بـ {action} {symbol} كان مدروساً. السبب: {reason}. أنا ألتزم بالخطة."
         
@@ -0,0 +1,68 @@
+class AuditMetrics:
+    """
+    Running performance metrics for one portfolio, updated per closed lot and
+    per value change, so a report is O(1) to serve.
+
+    A closed trade is one lot (or the part of it) matched by a SELL: its pnl
+    is (exit - entry) * quantity. Drawdown follows total_value from its peak.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, start_value=None):
+        self.closed = 0
+        self.wins = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.best_trade_pct = None
+        self.worst_trade_pct = None
+        self.peak_value = start_value
+        self.max_drawdown_pct = 0.0
+
+    def on_fill(self, entry_price, exit_price, quantity):
+        """
+        Records one lot closed (fully or partly) by a SELL.
+        """
+        pnl = (exit_price - entry_price) * quantity
+        pct = (exit_price / entry_price - 1) * 100 if entry_price else 0.0
+        self.closed += 1
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+        else:
+            self.gross_loss -= pnl
+        if self.best_trade_pct is None or pct > self.best_trade_pct:
+            self.best_trade_pct = pct
+        if self.worst_trade_pct is None or pct < self.worst_trade_pct:
+            self.worst_trade_pct = pct
+
+    def on_value(self, value):
+        if self.peak_value is None or value > self.peak_value:
+            self.peak_value = value
+        elif self.peak_value > 0:
+            drawdown = (self.peak_value - value) / self.peak_value * 100
+            if drawdown > self.max_drawdown_pct:
+                self.max_drawdown_pct = drawdown
+
+    def report(self):
+        """
+        Metrics for the audit page; ratios are None until there is something to divide.
+        """
+        return {
+            "closed_trades": self.closed,
+            "win_rate": round(self.wins / self.closed * 100, 1) if self.closed else None,
+            "profit_factor": round(self.gross_profit / self.gross_loss, 2) if self.gross_loss else None,
+            "gross_profit": round(self.gross_profit, 2),
+            "gross_loss": round(self.gross_loss, 2),
+            "best_trade_pct": None if self.best_trade_pct is None else round(self.best_trade_pct, 2),
+            "worst_trade_pct": None if self.worst_trade_pct is None else round(self.worst_trade_pct, 2),
+            "max_drawdown_pct": round(self.max_drawdown_pct, 2),
+        }
+
+    def state(self):
+        return dict(vars(self))
+
+    def load(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
@@ -0,0 +1,410 @@
+import argparse
+import heapq
+import random
+from functools import cached_property
+import numpy as np
+import pandas as pd
+
+import indicators
+from ai_trader import AITrader
+from bar_store import BarStore
+from indicators import IndicatorEngine
+from news_entities import EntityIndex
+from portfolio_manager import PortfolioManager
+from strategy_registry import STRATEGY_REGISTRY, data_requirements, strategy_params
+
+
+def _shift(matrix):
+    """
+    Moves every column one bar later, so day t sees the value of bar t-1.
+    """
+    out = np.full(matrix.shape, np.nan)
+    out[:, 1:] = matrix[:, :-1]
+    return out
+
+
+class MarketArrays:
+    """
+    Stored daily bars for a symbol universe as (symbols x days) matrices aligned
+    on the union of trading days (NaN where a symbol has no bar), plus the
+    indicator matrices strategies read, computed once for the whole history.
+
+    Indicators are "as of the decision on day t": close-based values include
+    day t's close (the price the strategy sees), ATR and volume use completed
+    bars up to t-1, matching the live IndicatorEngine.
+    """
+    # Arrays the vector signals read; what param_sweep places in shared memory
+    SHARED_FIELDS = ("timestamp", "close", "high", "low", "volume", "close_filled", "rsi",
+                     "ema_fast", "ema_slow", "ema_cross", "atr", "volume_ratio")
+
+    def __init__(self, store, symbols, start=None, end=None, **settings):
+        self._setup(symbols, **settings)
+        self.bars = {symbol: store.read(symbol, start=start, end=end) for symbol in self.symbols}
+        stamps = [self.bars[s]["timestamp"] for s in self.symbols]
+        self.timestamp = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+
+        shape = (len(self.symbols), len(self.timestamp))
+        self.open, self.high, self.low, self.close, self.volume = (np.full(shape, np.nan) for _ in range(5))
+        # bar_pos[i, t]: number of bars of symbol i strictly before day t
+        self.bar_pos = np.zeros(shape, dtype=np.int64)
+        for i, symbol in enumerate(self.symbols):
+            bars = self.bars[symbol]
+            cols = np.searchsorted(self.timestamp, bars["timestamp"])
+            for field in ("open", "high", "low", "close", "volume"):
+                getattr(self, field)[i, cols] = bars[field]
+            self.bar_pos[i] = np.searchsorted(bars["timestamp"], self.timestamp, side="left")
+
+    def _setup(self, symbols, fast=10, slow=30, rsi_period=14, atr_period=14, volume_period=20, spike_ratio=2.0):
+        self.symbols = list(symbols)
+        self.row = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.fast = fast
+        self.slow = slow
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+        self.volume_period = volume_period
+        self.spike_ratio = spike_ratio
+        self.rng = np.random.default_rng(0)
+
+    @classmethod
+    def from_matrices(cls, symbols, matrices, **settings):
+        """
+        Rebuilds arrays from precomputed matrices (e.g. views on shared memory),
+        without per-symbol bars, so only the vectorized fast path can use them.
+        """
+        arrays = cls.__new__(cls)
+        arrays._setup(symbols, **settings)
+        arrays.bars = None
+        arrays.bar_pos = None
+        for name, matrix in matrices.items():
+            # Instance attributes take precedence over the cached properties
+            setattr(arrays, name, matrix)
+        return arrays
+
+    def settings(self):
+        return {
+            "fast": self.fast, "slow": self.slow, "rsi_period": self.rsi_period,
+            "atr_period": self.atr_period, "volume_period": self.volume_period,
+            "spike_ratio": self.spike_ratio,
+        }
+
+    @property
+    def days(self):
+        return len(self.timestamp)
+
+    def entries_for(self, symbols, mask):
+        """
+        Bool (symbols x days) matrix that is `mask` on the rows of `symbols` only.
+        """
+        entries = np.zeros(self.close.shape, dtype=bool)
+        for symbol in symbols:
+            i = self.row.get(symbol)
+            if i is not None:
+                entries[i] = mask[i]
+        return entries & ~np.isnan(self.close)
+
+    @cached_property
+    def close_filled(self):
+        """
+        Close carried forward over days without a bar, for valuation.
+        """
+        return pd.DataFrame(self.close.T).ffill().to_numpy().T
+
+    @cached_property
+    def rsi(self):
+        return indicators.rsi(self.close, self.rsi_period)
+
+    @cached_property
+    def ema_fast(self):
+        return indicators.ema(self.close, self.fast)
+
+    @cached_property
+    def ema_slow(self):
+        return indicators.ema(self.close, self.slow)
+
+    @cached_property
+    def ema_cross(self):
+        return indicators.crossover(self.ema_fast, self.ema_slow)
+
+    @cached_property
+    def trend_up(self):
+        return self.ema_fast > self.ema_slow
+
+    @cached_property
+    def atr(self):
+        return _shift(indicators.atr(self.high, self.low, self.close, self.atr_period))
+
+    @cached_property
+    def volume_ratio(self):
+        return _shift(indicators.volume_ratio(self.volume, self.volume_period))
+
+    @cached_property
+    def volume_spike(self):
+        with np.errstate(invalid="ignore"):
+            return self.volume_ratio >= self.spike_ratio
+
+
+class BacktestMarket:
+    """
+    Stands in for MarketDataService during an event replay: prices are day t's
+    closes, history is every bar before day t, and listeners (IndicatorEngine)
+    receive the same on_bars/on_price pushes as in live trading.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.tracked_symbols = set()
+        self.price_listeners = []
+        self.bar_listeners = []
+        self.prices = {}
+        self.t = -1
+
+    def track(self, symbols):
+        self.tracked_symbols.update(symbols)
+
+    def subscribe(self, on_price=None, on_bars=None):
+        if on_price:
+            self.price_listeners.append(on_price)
+        if on_bars:
+            self.bar_listeners.append(on_bars)
+
+    def step(self, t):
+        """
+        Advances to day t: pushes bars completed since the previous day, then day t's closes.
+        """
+        previous = self.t
+        self.t = t
+        for symbol, i in self.arrays.row.items():
+            lo = self.arrays.bar_pos[i, previous] if previous >= 0 else 0
+            hi = self.arrays.bar_pos[i, t]
+            if hi > lo and previous >= 0:
+                bars = {field: column[lo:hi] for field, column in self.arrays.bars[symbol].items()}
+                for listener in self.bar_listeners:
+                    listener(symbol, bars)
+            price = self.arrays.close[i, t]
+            if not np.isnan(price):
+                self.prices[symbol] = float(price)
+                for listener in self.price_listeners:
+                    listener(symbol, self.prices[symbol])
+
+    def get_history(self, symbol, window=None, start=None, end=None):
+        i = self.arrays.row.get(symbol)
+        if i is None or self.t < 0:
+            return None
+        bars = self.arrays.bars[symbol]
+        hi = int(self.arrays.bar_pos[i, self.t])
+        ts = bars["timestamp"][:hi]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(ts, end, side="right"))
+        if window is not None:
+            lo = max(lo, hi - window)
+        return {field: column[lo:hi] for field, column in bars.items()}
+
+    def get_current_price(self, symbol):
+        return self.prices.get(symbol)
+
+    def get_cached_price(self, symbol):
+        return self.prices.get(symbol)
+
+    def snapshot_prices(self):
+        return dict(self.prices)
+
+    def refresh_snapshot(self, force=False):
+        return self.prices
+
+    def market_session(self):
+        return "open"
+
+
+class NoNews:
+    """
+    No historical headlines are stored, so news-driven strategies hold in backtests.
+    """
+
+    entities = EntityIndex()
+
+    def latest(self, max_age=None, limit=50):
+        return []
+
+
+def summarize(name, equity, initial_capital, trades, wins=None, closed=None, mode="replay"):
+    """
+    Return, max drawdown and trade counts for one strategy's daily equity curve.
+    max_drawdown_pct is a positive magnitude (percent below the running peak),
+    as in the live audit report (audit_metrics.AuditMetrics).
+    """
+    final_value = float(equity[-1]) if len(equity) else initial_capital
+    max_drawdown = 0.0
+    if len(equity):
+        peak = np.maximum.accumulate(equity)
+        max_drawdown = float(((peak - equity) / peak).max() * 100)
+    return {
+        "strategy": name,
+        "mode": mode,
+        "final_value": round(final_value, 2),
+        "return_pct": round((final_value - initial_capital) / initial_capital * 100, 2),
+        "max_drawdown_pct": round(max_drawdown, 2),
+        "trades": trades,
+        "win_rate": round(wins / closed * 100, 1) if closed else None,
+        "equity": equity,
+    }
+
+
+def simulate_lots(arrays, signals, initial_capital):
+    """
+    Fast-path simulation of one strategy from its vector signals.
+    Each buy is its own lot that exits on the first later close at or beyond its
+    target or stop; cash from exits is available from the next day.
+    Returns (equity curve, trades, wins, closed lots).
+    """
+    close = arrays.close
+    entries = signals["entries"]
+    quantity = signals["quantity"]
+    min_cash = signals.get("min_cash", 0.0)
+    n_symbols, days = close.shape
+
+    cash = initial_capital
+    cash_delta = np.zeros(days)
+    qty_delta = np.zeros((n_symbols, days))
+    pending = []  # (exit day, proceeds)
+    trades = wins = closed = 0
+
+    # Symbols are checked in the strategy's own order, first hit wins
+    order = np.array([arrays.row[s] for s in signals.get("symbols", arrays.symbols) if s in arrays.row], dtype=np.int64)
+    flagged = entries[order]
+    first_symbol = order[flagged.argmax(axis=0)] if len(order) else None
+    for t in np.flatnonzero(flagged.any(axis=0)):
+        while pending and pending[0][0] < t:
+            cash += heapq.heappop(pending)[1]
+        s = first_symbol[t]
+        price = close[s, t]
+        cost = quantity * price
+        if cash <= min_cash or cash < cost:
+            continue
+        cash -= cost
+        cash_delta[t] -= cost
+        qty_delta[s, t] += quantity
+        trades += 1
+
+        future = close[s, t + 1:]
+        with np.errstate(invalid="ignore"):
+            hit = (future >= signals["target"][s, t]) | (future <= signals["stop"][s, t])
+        if hit.any():
+            exit_t = t + 1 + int(hit.argmax())
+            proceeds = quantity * close[s, exit_t]
+            heapq.heappush(pending, (exit_t, proceeds))
+            cash_delta[exit_t] += proceeds
+            qty_delta[s, exit_t] -= quantity
+            trades += 1
+            closed += 1
+            wins += proceeds > cost
+
+    holdings = np.cumsum(qty_delta, axis=1) * np.nan_to_num(arrays.close_filled)
+    equity = initial_capital + np.cumsum(cash_delta) + holdings.sum(axis=0)
+    return equity, trades, wins, closed
+
+
+def run_signals(arrays, spec, params, initial_capital, seed=0):
+    """
+    Fast-path result for one strategy with the given params.
+    """
+    arrays.rng = np.random.default_rng(seed)
+    equity, trades, wins, closed = simulate_lots(arrays, spec.vector(arrays, params), initial_capital)
+    return summarize(spec.name, equity, initial_capital, trades, wins, closed, mode="vectorized")
+
+
+class Backtester:
+    """
+    Replays stored bars through the AITrader strategies.
+
+    run(): event replay, day by day, through the real strategy functions,
+    IndicatorEngine and PortfolioManager (execute_trade, check_exits).
+    run_vectorized(): fast path for strategies with a registered vector form,
+    simulating years of daily bars in one pass per strategy.
+    """
+
+    def __init__(self, store, symbols=None, initial_capital=100000.0, **indicator_settings):
+        self.store = store
+        if symbols is None:
+            symbols, _, _ = data_requirements(STRATEGY_REGISTRY.values())
+        self.symbols = sorted(symbols)
+        self.initial_capital = initial_capital
+        self.indicator_settings = indicator_settings
+
+    def load(self, start=None, end=None):
+        return MarketArrays(self.store, self.symbols, start=start, end=end, **self.indicator_settings)
+
+    def run(self, strategy_names=None, start=None, end=None, seed=0, arrays=None, params=None):
+        """
+        params: {name: {param: value}} overrides of the registered strategy params.
+        """
+        arrays = arrays or self.load(start, end)
+        random.seed(seed)
+        market = BacktestMarket(arrays)
+        engine = IndicatorEngine(market, **self.indicator_settings)
+        trader = AITrader(market, NoNews(), engine, params=params)
+        names = list(strategy_names or trader.strategies)
+        pm = PortfolioManager(self.initial_capital, strategy_names=names)
+        market.subscribe(on_price=pm.on_price)
+        for portfolio in pm.portfolios.values():
+            portfolio["total_value"] = self.initial_capital
+
+        equity = np.zeros((len(names), arrays.days))
+        for t in range(arrays.days):
+            market.step(t)
+            trader.prefetch(names)
+            for name in names:
+                decision = trader.get_decision(name, pm.portfolios[name])
+                if decision and decision["action"] == "BUY":
+                    pm.execute_trade(name, "BUY", decision["symbol"], decision["price"], decision["quantity"],
+                                     decision["reason"], decision["goals"], extra_data=decision)
+            for j, name in enumerate(names):
+                pm.check_exits(name, market.get_current_price)
+                equity[j, t] = pm.portfolios[name]["total_value"]
+
+        return {name: summarize(name, equity[j], self.initial_capital, pm.portfolios[name]["trade_count"],
+                                pm.metrics[name].wins, pm.metrics[name].closed)
+                for j, name in enumerate(names)}
+
+    def run_vectorized(self, strategy_names=None, start=None, end=None, seed=0, arrays=None, params=None):
+        arrays = arrays or self.load(start, end)
+        names = list(strategy_names or STRATEGY_REGISTRY)
+        effective = strategy_params([STRATEGY_REGISTRY[name] for name in names], params)
+        results = {}
+        for name in names:
+            spec = STRATEGY_REGISTRY[name]
+            if spec.vector is None or arrays.days == 0:
+                flat = np.full(arrays.days, self.initial_capital)
+                results[name] = summarize(name, flat, self.initial_capital, 0, mode="no-vector")
+                continue
+            results[name] = run_signals(arrays, spec, effective[name], self.initial_capital, seed)
+        return results
+
+
+def _epoch(date):
+    return int(pd.Timestamp(date, tz="UTC").timestamp()) if date else None
+
+
+def print_ranking(results):
+    ranked = sorted(results.values(), key=lambda r: r["return_pct"], reverse=True)
+    print(f"{'Strategy':<10} {'Mode':<11} {'Return %':>9} {'Max DD %':>9} {'Trades':>7} {'Win %':>6}")
+    for r in ranked:
+        win = "-" if r["win_rate"] is None else f"{r['win_rate']:.1f}"
+        print(f"{r['strategy']:<10} {r['mode']:<11} {r['return_pct']:>9.2f} {r['max_drawdown_pct']:>9.2f} {r['trades']:>7} {win:>6}")
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Backtest AITrader strategies on stored daily bars.")
+    parser.add_argument("--history-dir", default=Config.HISTORY_DIR)
+    parser.add_argument("--start", help="YYYY-MM-DD")
+    parser.add_argument("--end", help="YYYY-MM-DD")
+    parser.add_argument("--replay", action="store_true", help="Event replay through the strategy functions")
+    parser.add_argument("--capital", type=float, default=Config.INITIAL_CAPITAL)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backtester = Backtester(BarStore(args.history_dir), initial_capital=args.capital)
+    run = backtester.run if args.replay else backtester.run_vectorized
+    print_ranking(run(start=_epoch(args.start), end=_epoch(args.end), seed=args.seed))
@@ -0,0 +1,131 @@
+import os
+import threading
+import numpy as np
+
+
+class BarStore:
+    """
+    On-disk OHLCV history, one column file per field per symbol:
+
+        <root>/<symbol>/timestamp.bin   int64 epoch seconds, ascending
+        <root>/<symbol>/open.bin        float64
+        ...
+
+    Files are raw arrays, so reads are memory-mapped and slicing returns
+    views into the page cache instead of loading a DataFrame.
+    Appends only ever add bars newer than the last stored timestamp.
+    """
+    COLUMNS = {
+        "timestamp": np.int64,
+        "open": np.float64,
+        "high": np.float64,
+        "low": np.float64,
+        "close": np.float64,
+        "volume": np.float64,
+    }
+
+    def __init__(self, root):
+        self.root = root
+        self._maps = {}  # symbol -> {field: np.memmap}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol, field):
+        return os.path.join(self.root, symbol, f"{field}.bin")
+
+    def symbols(self):
+        return sorted(d for d in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, d)))
+
+    def _open(self, symbol):
+        """
+        Memory-maps every column of a symbol, trimming columns left uneven by an
+        interrupted append back to the shortest one.
+        """
+        lengths = {}
+        for field, dtype in self.COLUMNS.items():
+            path = self._path(symbol, field)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths[field] = size // np.dtype(dtype).itemsize
+
+        n = min(lengths.values())
+        columns = {}
+        for field, dtype in self.COLUMNS.items():
+            if lengths[field] != n:
+                with open(self._path(symbol, field), "r+b") as f:
+                    f.truncate(n * np.dtype(dtype).itemsize)
+            if n == 0:
+                columns[field] = np.empty(0, dtype=dtype)
+            else:
+                columns[field] = np.memmap(self._path(symbol, field), dtype=dtype, mode="r", shape=(n,))
+        return columns
+
+    def _columns(self, symbol):
+        columns = self._maps.get(symbol)
+        if columns is None:
+            with self._lock:
+                columns = self._maps.get(symbol)
+                if columns is None:
+                    columns = self._open(symbol)
+                    self._maps[symbol] = columns
+        return columns
+
+    def count(self, symbol):
+        return len(self._columns(symbol)["timestamp"])
+
+    def last_timestamp(self, symbol):
+        """
+        Timestamp of the newest stored bar, or None when the symbol has no history.
+        """
+        ts = self._columns(symbol)["timestamp"]
+        return int(ts[-1]) if len(ts) else None
+
+    def append(self, symbol, bars):
+        """
+        Appends bars newer than the last stored timestamp.
+        bars: {field: array-like} with the same length for every field.
+        Returns the number of bars written.
+        """
+        ts = np.asarray(bars["timestamp"], dtype=np.int64)
+        if len(ts) == 0:
+            return 0
+
+        with self._lock:
+            existing = self._maps.pop(symbol, None) or self._open(symbol)
+            last = int(existing["timestamp"][-1]) if len(existing["timestamp"]) else None
+            del existing  # drop the maps before the files grow
+
+            order = np.argsort(ts, kind="stable")
+            mask = np.ones(len(ts), dtype=bool)
+            if last is not None:
+                mask = ts[order] > last
+            # Keep one bar per timestamp
+            sorted_ts = ts[order]
+            mask[1:] &= sorted_ts[1:] != sorted_ts[:-1]
+            selected = order[mask]
+            if len(selected) == 0:
+                return 0
+
+            os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+            for field, dtype in self.COLUMNS.items():
+                values = bars.get(field)
+                if values is None:
+                    column = np.full(len(selected), np.nan, dtype=dtype)
+                else:
+                    column = np.asarray(values, dtype=dtype)[selected]
+                with open(self._path(symbol, field), "ab") as f:
+                    f.write(column.tobytes())
+            return len(selected)
+
+    def read(self, symbol, start=None, end=None, last=None):
+        """
+        Returns {field: array} views of the stored bars with start <= timestamp <= end,
+        limited to the newest `last` bars. No data is copied.
+        """
+        columns = self._columns(symbol)
+        ts = columns["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+        if last is not None:
+            lo = max(lo, hi - last)
+        return {field: column[lo:hi] for field, column in columns.items()}
@@ -1,4 +1,5 @@
 import datetime
+import random
 
 class ChallengeEngine:
     def __init__(self, portfolio_manager):
@@ -14,6 +15,7 @@ class ChallengeEngine:
         self.week_start = datetime.datetime.now()
         self.week_end = self.week_start + datetime.timedelta(days=7) # Sunday to Thursday usually
         self.is_active = True
+        self.pm.start_week(self.week_start, self.week_end)
         
         # Reset Logic
         import random
@@ -23,11 +25,7 @@ class ChallengeEngine:
                 variation = random.uniform(-1.5, 2.5) # -1.5% to +2.5%
                 seeded_cash = initial_capital * (1 + (variation / 100))
                 
-                data["cash"] = seeded_cash
-                data["holdings"] = {}
-                data["history"] = []
-                data["active_trades"] = []
-                data["total_value"] = seeded_cash
+                self.pm.reset_portfolio(name, seeded_cash)
         
         print(f"--- New Challenge Week Started: {self.week_start} ---")
 
@@ -66,7 +64,7 @@ class ChallengeEngine:
         for name, data in self.pm.portfolios.items():
             # Add random variation to the impact so not everyone moves exactly same
             variation = random.uniform(0.99, 1.01)
-            data["total_value"] *= (event["impact"] * variation)
+            self.pm.set_value(name, data["total_value"] * event["impact"] * variation)
 
     def end_week(self):
         """
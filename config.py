@@ -7,3 +7,40 @@ class Config:
     INITIAL_CAPITAL = 100000.0  # SAR
     COMMISSION_RATE = 0.00155   # Standard Saudi Market Commission (approx)
     TAX_RATE = 0.15             # VAT on Commission
+    # Market Data Settings
+    PRICE_CACHE_TTL = float(os.environ.get('PRICE_CACHE_TTL', 5))     # seconds a price snapshot is reused
+    PRICE_MAX_STALE = float(os.environ.get('PRICE_MAX_STALE', 60))    # seconds a snapshot may be served if refresh fails
+    FETCH_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', 4))   # max concurrent upstream calls
+    FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', 10))        # seconds per upstream call
+    BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))  # upstream error share that trips the breaker
+    BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', 30))  # seconds before a trial call after tripping
+    BACKOFF_BASE = float(os.environ.get('BACKOFF_BASE', 5))           # first retry delay for a symbol with no data
+    BACKOFF_CAP = float(os.environ.get('BACKOFF_CAP', 600))           # longest retry delay for a symbol
+    # Price source: 'yfinance' (live) or 'replay' (recorded OHLCV files, offline)
+    PRICE_PROVIDER = os.environ.get('PRICE_PROVIDER', 'yfinance')
+    REPLAY_PATH = os.environ.get('REPLAY_PATH', 'data/replay')
+    REPLAY_SPEED = float(os.environ.get('REPLAY_SPEED', 1))           # 100 = 100x real time, 0 = no sleeping
+    TICK_INTERVAL = float(os.environ.get('TICK_INTERVAL', 5))         # seconds of market time per simulation tick
+    # Local OHLCV history (memory-mapped column files per symbol)
+    HISTORY_DIR = os.environ.get('HISTORY_DIR', 'storage/bars')
+    HISTORY_REFRESH = float(os.environ.get('HISTORY_REFRESH', 3600))  # seconds between incremental history updates
+    INDICATOR_CHECKPOINT = os.environ.get('INDICATOR_CHECKPOINT', 'storage/indicators.json')
+    # Trading calendar: price polling is suspended outside Tadawul sessions
+    HOLIDAYS_FILE = os.environ.get('HOLIDAYS_FILE', 'data/tadawul_holidays.txt')
+    IDLE_POLL_INTERVAL = float(os.environ.get('IDLE_POLL_INTERVAL', 60))  # seconds between ticks while closed
+    STRATEGY_TIME_BUDGET = float(os.environ.get('STRATEGY_TIME_BUDGET', 2))  # seconds each strategy may run per tick
+    TRADE_LOG_DIR = os.environ.get('TRADE_LOG_DIR', 'storage/trades')  # weekly append-only trade history segments
+    RECENT_TRADES = int(os.environ.get('RECENT_TRADES', 200))         # trades per portfolio kept in memory
+    STATE_DIR = os.environ.get('STATE_DIR', 'storage/state')          # portfolio snapshot + write-ahead log
+    SNAPSHOT_EVERY = int(os.environ.get('SNAPSHOT_EVERY', 1000))      # WAL events between state snapshots
+    STATE_FSYNC = os.environ.get('STATE_FSYNC', '0') == '1'          # fsync every WAL write
+    STRATEGY_PARAMS = os.environ.get('STRATEGY_PARAMS', 'storage/strategy_params.json')  # tuned thresholds from param_sweep
+    SWEEP_PROCESSES = int(os.environ.get('SWEEP_PROCESSES', 0))       # parameter sweep workers, 0 = one per CPU
+    # News feeds (RSS 2.0 / Atom), polled in the background with conditional requests
+    NEWS_SOURCES = [url.strip() for url in os.environ.get(
+        'NEWS_SOURCES', 'https://www.argaam.com/ar/company/marketnews/rss').split(',') if url.strip()]
+    NEWS_POLL_INTERVAL = float(os.environ.get('NEWS_POLL_INTERVAL', 300))   # seconds between feed polls
+    NEWS_RECENT_WINDOW = float(os.environ.get('NEWS_RECENT_WINDOW', 3600))  # seconds of news served by /api/news
+    NEWS_ARCHIVE_SIZE = int(os.environ.get('NEWS_ARCHIVE_SIZE', 5000))      # news items retained (ring buffer)
+    SYMBOLS_FILE = os.environ.get('SYMBOLS_FILE', 'data/tadawul_symbols.json')  # symbol/sector names news is mapped to
+    NEWS_HALF_LIFE = float(os.environ.get('NEWS_HALF_LIFE', 6 * 3600))      # seconds for a headline's weight to halve
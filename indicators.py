@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from streaming_indicators import SymbolIndicators
+
+# --- Vectorized indicator functions ---
+# Every function takes 2D arrays shaped (symbols, bars), oldest bar first,
+# with NaN padding on the left for symbols that have shorter history.
+# Recursions run over the bar axis only; each step covers all symbols at once.
+
+
+def ewm(values, alpha, min_periods=1):
+    """
+    Exponentially weighted mean (adjust=False), seeded at each row's first valid value.
+    """
+    out = np.full(values.shape, np.nan)
+    prev = np.full(values.shape[0], np.nan)
+    seen = np.zeros(values.shape[0], dtype=np.int64)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        valid = ~np.isnan(x)
+        prev = np.where(np.isnan(prev), x, np.where(valid, alpha * x + (1 - alpha) * prev, prev))
+        seen += valid
+        out[:, t] = np.where(seen >= min_periods, prev, np.nan)
+    return out
+
+
+def ema(values, span):
+    return ewm(values, 2.0 / (span + 1), min_periods=span)
+
+
+def sma(values, period):
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= period:
+        out[:, period - 1:] = sliding_window_view(values, period, axis=1).mean(axis=-1)
+    return out
+
+
+def rsi(close, period=14):
+    """
+    Wilder RSI (smoothing alpha = 1/period).
+    """
+    delta = np.diff(close, axis=1, prepend=np.nan)
+    gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0))
+    loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0))
+    avg_gain = ewm(gain, 1.0 / period, min_periods=period)
+    avg_loss = ewm(loss, 1.0 / period, min_periods=period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        out = 100.0 - 100.0 / (1.0 + rs)
+    # No losses in the window: RSI is 100
+    out = np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, out)
+    return out
+
+
+def atr(high, low, close, period=14):
+    """
+    Wilder Average True Range.
+    """
+    prev_close = np.roll(close, 1, axis=1)
+    prev_close[:, 0] = np.nan
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return ewm(true_range, 1.0 / period, min_periods=period)
+
+
+def crossover(fast, slow):
+    """
+    +1 where fast crossed above slow on that bar, -1 where it crossed below, 0 otherwise.
+    """
+    above = fast > slow
+    out = np.zeros(fast.shape, dtype=np.int8)
+    out[:, 1:] = above[:, 1:].astype(np.int8) - above[:, :-1].astype(np.int8)
+    out[np.isnan(fast) | np.isnan(slow)] = 0
+    out[:, 1:][np.isnan(fast[:, :-1]) | np.isnan(slow[:, :-1])] = 0
+    return out
+
+
+def volume_ratio(volume, period=20):
+    """
+    Each bar's volume relative to the average of the `period` bars before it.
+    """
+    baseline = np.full(volume.shape, np.nan)
+    baseline[:, 1:] = sma(volume, period)[:, :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return volume / baseline
+
+
+class IndicatorEngine:
+    """
+    Serves one shared indicator set per symbol to every strategy.
+
+    Live values come from streaming state (streaming_indicators.SymbolIndicators):
+    completed bars are committed as the bar store grows, and each price pushed by
+    MarketDataService only peeks, so a tick costs O(1) per symbol whatever the
+    lookback. Streams are warmed from stored history on first use and can be
+    checkpointed to skip the warm-up on restart.
+    The vectorized functions above compute the same indicators over whole
+    histories (backtester.MarketArrays).
+    """
+
+    def __init__(self, market, fast=10, slow=30, rsi_period=14,
+                 atr_period=14, volume_period=20, spike_ratio=2.0, warm_bars=250,
+                 checkpoint_path=None):
+        self.market = market
+        self.fast = fast
+        self.slow = slow
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+        self.volume_period = volume_period
+        self.spike_ratio = spike_ratio
+        self.warm_bars = warm_bars
+        self.checkpoint_path = checkpoint_path
+        self.streams = {}  # symbol -> SymbolIndicators
+        self.values = {}   # symbol -> latest indicator dict
+        self._lock = threading.Lock()
+        market.subscribe(on_price=self.on_price, on_bars=self.on_bars)
+
+    def _config(self):
+        return {
+            "fast": self.fast, "slow": self.slow, "rsi_period": self.rsi_period,
+            "atr_period": self.atr_period, "volume_period": self.volume_period,
+            "spike_ratio": self.spike_ratio,
+        }
+
+    def _new_stream(self):
+        return SymbolIndicators(**self._config())
+
+    def _stream(self, symbol):
+        """
+        Returns the stream for a symbol, creating and warming it from history on first use.
+        """
+        stream = self.streams.get(symbol)
+        if stream is None:
+            with self._lock:
+                stream = self.streams.get(symbol)
+                if stream is None:
+                    stream = self._new_stream()
+                    bars = self.market.get_history(symbol, window=self.warm_bars)
+                    if bars is not None:
+                        self._commit(stream, bars)
+                    self.streams[symbol] = stream
+        return stream
+
+    @staticmethod
+    def _commit(stream, bars):
+        committed = 0
+        for ts, high, low, close, volume in zip(bars["timestamp"], bars["high"], bars["low"],
+                                                bars["close"], bars["volume"]):
+            committed += stream.commit(int(ts), float(high), float(low), float(close), float(volume))
+        return committed
+
+    def on_bars(self, symbol, bars):
+        """
+        Commits newly stored bars (called by MarketDataService.update_history).
+        """
+        stream = self._stream(symbol)
+        self._commit(stream, bars)
+        self.values[symbol] = stream.values(self.market.get_cached_price(symbol))
+
+    def on_price(self, symbol, price):
+        """
+        Refreshes a symbol's values for a new live price (called on snapshot refresh).
+        """
+        self.values[symbol] = self._stream(symbol).values(price)
+
+    def get(self, symbol):
+        """
+        Latest indicator values for a symbol, or None if it has no history yet.
+        """
+        values = self.values.get(symbol)
+        if values is None or values["bars"] == 0:
+            return None
+        return values
+
+    def update(self, symbols=None):
+        """
+        Makes sure every tracked symbol has warm streaming state and current values.
+        Cost per symbol is O(1) once warmed; prices arrive through on_price.
+        """
+        for symbol in sorted(symbols or self.market.tracked_symbols):
+            if symbol not in self.values:
+                self.values[symbol] = self._stream(symbol).values(self.market.get_cached_price(symbol))
+        return self.values
+
+    def checkpoint(self, path=None):
+        """
+        Writes the streaming state of every symbol to a JSON file.
+        """
+        path = path or self.checkpoint_path
+        if not path:
+            return
+        data = {
+            "config": self._config(),
+            "streams": {symbol: stream.state() for symbol, stream in list(self.streams.items())},
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def restore(self, path=None):
+        """
+        Loads streams from a checkpoint, then commits any bars stored after it.
+        A checkpoint written with different indicator settings is ignored.
+        """
+        path = path or self.checkpoint_path
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read indicator checkpoint {path}: {e}")
+            return 0
+        if data.get("config") != self._config():
+            print("Indicator checkpoint settings changed, warming from history instead")
+            return 0
+
+        for symbol, state in data["streams"].items():
+            stream = self._new_stream()
+            stream.load(state)
+            if stream.last_ts is not None:
+                bars = self.market.get_history(symbol, start=stream.last_ts + 1)
+                if bars is not None:
+                    self._commit(stream, bars)
+            self.streams[symbol] = stream
+        return len(data["streams"])
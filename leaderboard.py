@@ -0,0 +1,79 @@
+from bisect import bisect_left, insort
+
+
+class Leaderboard:
+    """
+    Portfolios ranked by total value, kept in order as values change.
+
+    _order is a sorted list of (-value, name), so a value change is a bisect
+    out and an insort back in, never a full sort. ranking() rebuilds the
+    ready-to-serve list only when something changed since the last call,
+    reusing the entry dicts of portfolios whose rank and fields did not move;
+    between changes every caller gets the same cached list. Entries are never
+    modified once handed out, so a ranking can be published as-is.
+
+    rank_change is how many places a portfolio moved at its last rank change
+    (positive = up), kept until it moves again.
+    """
+
+    def __init__(self, base_value=100000.0):
+        self.base_value = base_value  # return is measured against this
+        self._order = []      # sorted [(-value, name)]
+        self._values = {}     # name -> value
+        self._fields = {}     # name -> extra entry fields (last_log)
+        self._ranks = {}      # name -> rank in the cached ranking (1 = best)
+        self._moves = {}      # name -> places moved at its last rank change
+        self._entries = {}    # name -> entry in the cached ranking
+        self._changed = set()
+        self._ranking = []
+
+    def __len__(self):
+        return len(self._values)
+
+    def update(self, name, value=None, **fields):
+        """
+        Records a portfolio's new value and/or entry fields. O(log n) search
+        plus a list shift; no-op when nothing differs.
+        """
+        if value is not None and value != self._values.get(name):
+            old = self._values.get(name)
+            if old is not None:
+                del self._order[bisect_left(self._order, (-old, name))]
+            insort(self._order, (-value, name))
+            self._values[name] = value
+            self._changed.add(name)
+        if fields:
+            current = self._fields.setdefault(name, {})
+            if any(current.get(key) != field for key, field in fields.items()):
+                current.update(fields)
+                self._changed.add(name)
+
+    def ranking(self):
+        """
+        Entries best first: {name, value, last_log, return, rank, rank_change}.
+        """
+        if not self._changed:
+            return self._ranking
+        changed, self._changed = self._changed, set()
+        ranking = []
+        for rank, (negated, name) in enumerate(self._order, 1):
+            old_rank = self._ranks.get(name)
+            if old_rank == rank and name not in changed:
+                ranking.append(self._entries[name])
+                continue
+            if old_rank is not None and old_rank != rank:
+                self._moves[name] = old_rank - rank
+            self._ranks[name] = rank
+            value = -negated
+            entry = {
+                "name": name,
+                "value": value,
+                "last_log": self._fields.get(name, {}).get("last_log", "..."),
+                "return": ((value - self.base_value) / self.base_value) * 100,
+                "rank": rank,
+                "rank_change": self._moves.get(name, 0),
+            }
+            self._entries[name] = entry
+            ranking.append(entry)
+        self._ranking = ranking
+        return ranking
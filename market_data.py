@@ -1,67 +1,484 @@
-import yfinance as yf
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from datetime import datetime, timedelta
+from price_providers import YFinanceProvider
+from trading_calendar import KSA
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling upstream while the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Global breaker over upstream calls.
+    Trips to "open" when the error rate over the last `window` seconds reaches
+    error_threshold (after at least min_calls calls); calls then fail fast for
+    `cooldown` seconds, after which a single trial call is let through
+    ("half_open"). A successful trial closes the breaker, a failed one reopens it.
+    Only used from the fetcher's loop thread.
+    """
+
+    def __init__(self, error_threshold=0.5, min_calls=5, window=60.0, cooldown=30.0):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = None
+        self.trips = 0
+        self._calls = deque()  # (time, ok)
+        self._trial_in_flight = False
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def allow(self):
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record(self, ok):
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._trial_in_flight = False
+            if ok:
+                self.state = "closed"
+                self._calls.clear()
+            else:
+                self._open(now)
+            return
+
+        self._calls.append((now, ok))
+        self._trim(now)
+        failures = sum(1 for _, call_ok in self._calls if not call_ok)
+        if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.error_threshold:
+            self._open(now)
+
+    def _open(self, now):
+        if self.state != "open":
+            self.trips += 1
+            print(f"Circuit breaker OPEN: upstream failing, pausing calls for {self.cooldown}s")
+        self.state = "open"
+        self.opened_at = now
+        self._calls.clear()
+
+    def status(self):
+        info = {"state": self.state, "trips": self.trips}
+        if self.state == "open":
+            info["retry_in"] = round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+        return info
+
+
+class SymbolBackoff:
+    """
+    Negative cache for symbols that come back without data: each consecutive
+    failure doubles the wait before the symbol is requested again (capped).
+    """
+
+    def __init__(self, base=5.0, cap=600.0):
+        self.base = base
+        self.cap = cap
+        self._failures = {}  # symbol -> (consecutive failures, retry_at)
+
+    def is_blocked(self, symbol):
+        entry = self._failures.get(symbol)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def blocked(self):
+        now = time.monotonic()
+        return sorted(s for s, (_, retry_at) in list(self._failures.items()) if now < retry_at)
+
+    def record_failure(self, symbol):
+        count = self._failures.get(symbol, (0, 0))[0] + 1
+        delay = min(self.cap, self.base * 2 ** (count - 1))
+        self._failures[symbol] = (count, time.monotonic() + delay)
+        if count == 1 or delay == self.cap:
+            print(f"Backing off {symbol} for {delay:.0f}s after {count} empty responses")
+
+    def record_success(self, symbol):
+        self._failures.pop(symbol, None)
+
+
+class AsyncPriceFetcher:
+    """
+    Runs provider calls on a private asyncio loop with:
+    - a concurrency limit on upstream calls,
+    - per-key single-flight: concurrent callers asking for the same symbol (or
+      the same index/history request) await the one request already in flight,
+    - a timeout per upstream call,
+    - a circuit breaker that fails calls fast while upstream is erroring.
+    get_prices()/call() are the synchronous facade used by MarketDataService.
+    """
+
+    def __init__(self, provider, max_concurrency=4, timeout=10.0, breaker=None):
+        self.provider = provider
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="market-fetch")
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._semaphore = None
+        self._inflight = {}  # key -> asyncio.Future (only touched on the loop thread)
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="market-fetch-loop", daemon=True).start()
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    self._loop = loop
+        return self._loop
+
+    async def _run(self, func, *args):
+        async with self._semaphore:
+            if not self.breaker.allow():
+                raise CircuitOpenError("circuit breaker open")
+            loop = asyncio.get_running_loop()
+            try:
+                result = await asyncio.wait_for(loop.run_in_executor(self._executor, func, *args), self.timeout)
+            except Exception:
+                self.breaker.record(False)
+                raise
+            self.breaker.record(True)
+            return result
+
+    async def fetch(self, key, func, *args):
+        """
+        Calls func(*args) once for all concurrent callers using the same key.
+        Returns None on error or timeout.
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(func, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.TimeoutError:
+            print(f"Timeout fetching {key} after {self.timeout}s")
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            print(f"Error fetching {key}: {e}")
+        return None
+
+    async def fetch_prices(self, symbols):
+        """
+        Returns ({symbol: price}, errored) where errored holds the symbols whose
+        request failed (error, timeout, open breaker) rather than returning no data.
+        Symbols already in flight join that request, the rest are fetched
+        together in one bulk provider call.
+        """
+        loop = asyncio.get_running_loop()
+        waiting = {}
+        missing = []
+        for symbol in symbols:
+            future = self._inflight.get(("price", symbol))
+            if future is None:
+                missing.append(symbol)
+            else:
+                waiting[symbol] = future
+
+        if missing:
+            bulk = asyncio.ensure_future(self._run(self.provider.fetch_prices, missing))
+            for symbol in missing:
+                key = ("price", symbol)
+                future = loop.create_future()
+                self._inflight[key] = future
+                waiting[symbol] = future
+            bulk.add_done_callback(lambda task: self._resolve(task, missing))
+
+        prices = {}
+        errored = set()
+        for symbol, future in waiting.items():
+            try:
+                price = await asyncio.shield(future)
+            except Exception:
+                errored.add(symbol)
+                continue
+            if price is not None:
+                prices[symbol] = price
+        return prices, errored
+
+    def _resolve(self, task, symbols):
+        error = None
+        if task.cancelled():
+            error = asyncio.CancelledError()
+        elif task.exception() is not None:
+            error = task.exception()
+            if isinstance(error, asyncio.TimeoutError):
+                print(f"Timeout fetching prices for {len(symbols)} symbols after {self.timeout}s")
+            elif not isinstance(error, CircuitOpenError):
+                print(f"Error fetching prices for {len(symbols)} symbols: {error}")
+        result = {} if error else (task.result() or {})
+        for symbol in symbols:
+            future = self._inflight.pop(("price", symbol), None)
+            if future is None or future.done():
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result.get(symbol))
+
+    def _wait(self, coro):
+        loop = self._ensure_loop()
+        # Upper bound for the caller: queueing behind the concurrency limit plus one call
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(self.timeout * 2 + 1)
+
+    def get_prices(self, symbols):
+        """
+        Synchronous facade for fetch_prices.
+        """
+        symbols = list(symbols)
+        try:
+            return self._wait(self.fetch_prices(symbols))
+        except Exception as e:
+            print(f"Error waiting for prices: {e}")
+            return {}, set(symbols)
+
+    def call(self, key, func, *args):
+        """
+        Synchronous single-flight call of func(*args) on the fetch loop.
+        """
+        try:
+            return self._wait(self.fetch(key, func, *args))
+        except Exception as e:
+            print(f"Error waiting for {key}: {e}")
+            return None
+
 
 class MarketDataService:
-    def __init__(self):
+    SESSION_LABELS = {"open": "Open", "pre_open": "Pre-Open", "closed": "Closed"}
+
+    def __init__(self, provider=None, cache_ttl=5.0, max_stale=60.0, history_store=None, history_refresh=3600.0,
+                 max_concurrency=4, fetch_timeout=10.0, calendar=None, breaker=None, backoff=None):
         self.last_update = None
-        self.market_suffix = ".SR"
+        self.provider = provider or YFinanceProvider()
+        # Trading calendar: outside sessions prices are served from the cached last close
+        self.calendar = calendar
+        self._index = None  # (index dict, fetched_at)
+        # All upstream calls go through the fetcher (concurrency limit, coalescing, timeouts)
+        self.fetcher = AsyncPriceFetcher(self.provider, max_concurrency=max_concurrency, timeout=fetch_timeout,
+                                         breaker=breaker)
+        # Negative cache: symbols returning no data are retried with exponential backoff
+        self.backoff = backoff or SymbolBackoff()
+        # Local bar history (BarStore), topped up incrementally from the provider
+        self.history_store = history_store
+        self.history_refresh = history_refresh  # seconds between history checks per symbol
+        self._history_checked = {}              # symbol -> provider time of last check
+        # Price snapshot: one bulk fetch per tick for the whole tracked universe,
+        # every get_current_price call is then served from memory.
+        self.cache_ttl = cache_ttl    # seconds before a snapshot is refreshed
+        self.max_stale = max_stale    # seconds a price may still be served if refresh fails
+        self.tracked_symbols = set()
+        self._snapshot = {}           # symbol -> (price, fetched_at)
+        self._snapshot_symbols = set()  # universe covered by the last refresh
+        self._snapshot_lock = threading.Lock()
+        # Subscribers notified of every refreshed price and every batch of stored bars
+        self.price_listeners = []   # callback(symbol, price)
+        self.bar_listeners = []     # callback(symbol, bars)
 
     def is_connected(self):
-        return True # Simulated always connected
+        return self.fetcher.breaker.state != "open"
+
+    def track(self, symbols):
+        """
+        Adds symbols to the universe fetched on every snapshot refresh.
+        """
+        for symbol in symbols:
+            self.tracked_symbols.add(symbol)
+
+    def subscribe(self, on_price=None, on_bars=None):
+        """
+        Registers callbacks for new snapshot prices and newly stored history bars.
+        """
+        if on_price:
+            self.price_listeners.append(on_price)
+        if on_bars:
+            self.bar_listeners.append(on_bars)
+
+    def market_session(self):
+        """
+        "open", "pre_open" or "closed" on the provider's clock.
+        Always "open" without a calendar or for providers that ignore market hours.
+        """
+        if self.calendar is None or not self.provider.respects_market_hours:
+            return "open"
+        return self.calendar.session(self.provider.now())
+
+    def poll_interval(self, tick_interval, idle_interval=60.0):
+        """
+        Seconds until the next simulation tick: tick_interval during sessions,
+        up to idle_interval while closed, waking in time for the pre-open.
+        """
+        if self.calendar is None or not self.provider.respects_market_hours:
+            return tick_interval
+        return self.calendar.poll_interval(self.provider.now(), tick_interval, idle_interval)
+
+    def get_cached_price(self, symbol):
+        """
+        Returns the snapshot price for a symbol without triggering a refresh (None if absent).
+        """
+        entry = self._snapshot.get(symbol)
+        return entry[0] if entry else None
+
+    def snapshot_prices(self):
+        """
+        {symbol: price} copy of the current snapshot, for evaluating a batch against one view.
+        """
+        return {symbol: entry[0] for symbol, entry in list(self._snapshot.items())}
 
     def get_current_price(self, symbol):
         """
-        Fetches the latest price for a Saudi stock.
+        Returns the latest price for a Saudi stock from the snapshot cache.
+        Triggers a bulk refresh when the cached price is older than cache_ttl.
         Returns None if data is stale or invalid.
         """
-        full_symbol = f"{symbol}{self.market_suffix}"
-        try:
-            ticker = yf.Ticker(full_symbol)
-            # data = ticker.history(period="1d", interval="1m") # 1m data might be limited
-            data = ticker.history(period="1d") # Fallback to daily if intraday not available
-            
-            if data.empty:
-                print(f"Warning: No data found for {full_symbol}")
-                return None
-
-            latest = data.iloc[-1]
-            price = latest['Close']
-            
-            # Basic Validation: Price must be positive
-            if price <= 0:
-                print(f"Error: Invalid price {price} for {full_symbol}")
-                return None
-                
-            return price
-        except Exception as e:
-            print(f"Error fetching data for {full_symbol}: {e}")
+        if symbol not in self.tracked_symbols:
+            self.tracked_symbols.add(symbol)
+
+        entry = self._snapshot.get(symbol)
+        if entry and (self.provider.now() - entry[1] <= self.cache_ttl or self.market_session() == "closed"):
+            return entry[0]
+
+        if not self.backoff.is_blocked(symbol):
+            self.refresh_snapshot()
+
+        entry = self._snapshot.get(symbol)
+        if entry and (self.provider.now() - entry[1] <= self.max_stale or self.market_session() == "closed"):
+            return entry[0]
+        return None
+
+    def refresh_snapshot(self, force=False):
+        """
+        Fetches the latest close for every tracked symbol in one bulk request
+        and stores it in the snapshot cache.
+        Concurrent callers wait for the refresh in progress instead of issuing their own.
+        While the market is closed the cached last close is kept and nothing is fetched.
+        Symbols in backoff are left out of the request.
+        """
+        with self._snapshot_lock:
+            now = self.provider.now()
+            wanted = {s for s in self.tracked_symbols if not self.backoff.is_blocked(s)}
+            covered = wanted <= self._snapshot_symbols
+            if not force and covered and self.market_session() == "closed":
+                return self._snapshot
+            if not force and self.last_update and now - self.last_update <= self.cache_ttl and covered:
+                return self._snapshot
+
+            symbols = sorted(wanted)
+            if not symbols:
+                return self._snapshot
+
+            prices, errored = self.fetcher.get_prices(symbols)
+            fetched_at = self.provider.now()
+            for symbol in symbols:
+                if symbol in prices:
+                    self._snapshot[symbol] = (prices[symbol], fetched_at)
+                    self.backoff.record_success(symbol)
+                elif symbol not in errored:
+                    self.backoff.record_failure(symbol)
+            self._snapshot_symbols = set(symbols)
+            self.last_update = fetched_at
+
+        for symbol, price in prices.items():
+            for listener in self.price_listeners:
+                listener(symbol, price)
+        return self._snapshot
+
+    def update_history(self, symbols=None, force=False):
+        """
+        Appends completed bars newer than the last stored one for each symbol.
+        Each symbol is checked at most once per history_refresh seconds.
+        Returns the number of bars written.
+        """
+        if self.history_store is None:
+            return 0
+        now = self.provider.now()
+        written = 0
+        for symbol in sorted(symbols or self.tracked_symbols):
+            checked = self._history_checked.get(symbol)
+            if not force and checked is not None and now - checked < self.history_refresh:
+                continue
+            self._history_checked[symbol] = now
+            start = self.history_store.last_timestamp(symbol)
+            bars = self.fetcher.call(("history", symbol, start), self.provider.fetch_history, symbol, start)
+            if not bars:
+                continue
+            count = self.history_store.append(symbol, bars)
+            if count:
+                written += count
+                stored = self.history_store.read(symbol, last=count)
+                for listener in self.bar_listeners:
+                    listener(symbol, stored)
+        return written
+
+    def get_history(self, symbol, window=None, start=None, end=None):
+        """
+        Returns stored daily bars for a symbol as {field: array} views over the
+        memory-mapped store: the last `window` bars, optionally bounded by
+        start/end epoch seconds. Returns None when no store is configured.
+        """
+        if self.history_store is None:
             return None
+        return self.history_store.read(symbol, start=start, end=end, last=window)
 
     def get_market_status(self):
         """
         Returns TASI index status.
         """
-        try:
-            tasi = yf.Ticker("^TASI.SR")
-            data = tasi.history(period="1d")
-            if not data.empty:
-                latest = data.iloc[-1]
-                return {
-                    "index": latest['Close'],
-                    "change": latest['Close'] - latest['Open'], # Approx
-                    "status": "Open" # Placeholder logic, need real time check
-                }
-        except:
-            pass
-        return {"index": 0, "change": 0, "status": "Unknown"}
+        session = self.market_session()
+        now = self.provider.now()
+        if self._index is None or (session != "closed" and now - self._index[1] > self.cache_ttl):
+            index = self.fetcher.call("index", self.provider.fetch_index)
+            if index:
+                self._index = (index, now)
+        status = {
+            "status": self.SESSION_LABELS[session],
+            "provider": self.provider.name,
+            "breaker": self.fetcher.breaker.status(),
+            "backoff_symbols": self.backoff.blocked(),
+        }
+        if self.calendar is not None and session != "open":
+            status["next_open"] = datetime.fromtimestamp(self.calendar.next_open(now), KSA).isoformat()
+        if self._index:
+            index = self._index[0]
+            status.update({"index": index["index"], "change": index["change"]})
+        else:
+            status.update({"index": 0, "change": 0, "status": "Unknown"})
+        return status
+
+    def sleep(self, seconds):
+        """
+        Waits one simulation tick on the provider's clock.
+        """
+        self.provider.sleep(seconds)
 
     def is_data_fresh(self, timestamp):
         """
-        Checks if the data timestamp is within the last 20 minutes.
+        Checks if the data timestamp belongs to the latest trading session
+        (TASI: Sunday-Thursday, 10:00 AM to 3:00 PM KSA time).
+        Without a calendar: is it from today?
         """
-        # TASI open hours: 10:00 AM to 3:00 PM KSA time (GMT+3)
-        # For now, simplest check: is it from today?
-        now = datetime.now()
         data_time = pd.to_datetime(timestamp)
-        return data_time.date() == now.date()
+        if self.calendar is None:
+            return data_time.date() == datetime.now().date()
+        if data_time.tzinfo is None:
+            data_time = data_time.tz_localize(KSA)
+        return data_time.timestamp() >= self.calendar.session_start(self.provider.now())
@@ -0,0 +1,83 @@
+import threading
+from bisect import bisect_left, insort
+
+
+class NewsArchive:
+    """
+    The last `capacity` ingested news items, in a fixed ring buffer.
+
+    Ids are monotonic (never reused), and item n lives in slot (n - 1) % capacity,
+    so adding is O(1) and the oldest item is overwritten once the ring is
+    full. Two indexes cover the whole retention window:
+    - _by_title maps a normalized title to its id, for O(1) duplicate checks;
+    - _times is a sorted list of (published_at, id), for time-range queries by bisect.
+    Readers get lists of the items they asked for, never a copy of the archive.
+    """
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next_id = 1
+        self._oldest_id = 1
+        self._by_title = {}  # normalized title -> id
+        self._times = []     # sorted [(published_at, id)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._next_id - self._oldest_id
+
+    @staticmethod
+    def title_key(title):
+        return " ".join(title.split())
+
+    def add(self, item):
+        """
+        Stores an item (a dict without "id") under the next id.
+        Returns the stored item, or None if its title is already archived.
+        """
+        key = self.title_key(item["title"])
+        with self._lock:
+            if key in self._by_title:
+                return None
+            if len(self) == self.capacity:
+                self._evict_oldest()
+            item_id = self._next_id
+            self._next_id += 1
+            item = {"id": item_id, **item}
+            self._slots[(item_id - 1) % self.capacity] = item
+            self._by_title[key] = item_id
+            insort(self._times, (item["published_at"], item_id))
+            return item
+
+    def _evict_oldest(self):
+        slot = (self._oldest_id - 1) % self.capacity
+        old = self._slots[slot]
+        self._slots[slot] = None
+        self._oldest_id += 1
+        del self._by_title[self.title_key(old["title"])]
+        del self._times[bisect_left(self._times, (old["published_at"], old["id"]))]
+
+    def contains(self, title):
+        return self.title_key(title) in self._by_title
+
+    def latest(self, limit=50, before_id=None):
+        """
+        Up to `limit` items in ingestion order, newest first; before_id pages further back.
+        """
+        with self._lock:
+            end = self._next_id if before_id is None else min(before_id, self._next_id)
+            start = max(self._oldest_id, end - limit)
+            return [self._slots[(item_id - 1) % self.capacity] for item_id in range(end - 1, start - 1, -1)]
+
+    def between(self, start=None, end=None, limit=None):
+        """
+        Items published in [start, end) (epoch seconds, open-ended when None),
+        newest first, at most `limit`.
+        """
+        with self._lock:
+            times = self._times
+            lo = 0 if start is None else bisect_left(times, (start,))
+            hi = len(times) if end is None else bisect_left(times, (end,))
+            if limit is not None:
+                lo = max(lo, hi - limit)
+            return [self._slots[(times[i][1] - 1) % self.capacity] for i in range(hi - 1, lo - 1, -1)]
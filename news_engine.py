@@ -3,89 +3,243 @@ from bs4 import BeautifulSoup
 # Ensure we don't depend on lxml
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='bs4')
-from textblob import TextBlob
-import random
+import io
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from news_archive import NewsArchive
+from news_entities import EntityIndex
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from sentiment import SentimentMatcher
+from trading_calendar import KSA
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+class FeedState:
+    """
+    Per-source conditional request validators and the item ids already ingested.
+    """
+    SEEN_LIMIT = 1000  # ids remembered per source (feeds only carry their latest items)
+
+    def __init__(self, url):
+        self.url = url
+        self.name = None           # channel title, once seen
+        self.etag = None
+        self.last_modified = None
+        self.seen = OrderedDict()  # item id -> None, oldest first
+        self.last_status = None
+        self.last_error = None
+
+    def remember(self, item_id):
+        self.seen[item_id] = None
+        if len(self.seen) > self.SEEN_LIMIT:
+            self.seen.popitem(last=False)
+
 
 class NewsEngine:
-    def __init__(self):
-        self.archive = [] # Store all processed news
-        # In a real scenario, we'd use actual RSS URLs.
-        self.sources = [
-            "https://www.argaam.com/ar/company/marketnews/rss", 
+    """
+    Ingests RSS 2.0 / Atom feeds into an in-memory news store.
+
+    poll() fetches every source in parallel over one pooled requests.Session,
+    sending If-None-Match / If-Modified-Since so unchanged feeds cost a 304
+    and no parsing. Changed feeds are parsed item by item and parsing stops at
+    the first item already ingested (feeds list newest first), so only new
+    items are scored. start() runs poll() on a background schedule; strategies
+    read the store with latest() and never trigger a fetch themselves.
+    """
+
+    def __init__(self, sources=None, poll_interval=300.0, timeout=10.0, max_workers=4, recent_window=3600.0,
+                 session=None, archive_size=5000, entities=None):
+        self.archive = NewsArchive(archive_size) # Last archive_size processed news, deduplicated by title
+        self.sources = list(sources) if sources is not None else [
+            "https://www.argaam.com/ar/company/marketnews/rss",
             # Add more specific RSS feeds here
         ]
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.recent_window = recent_window  # seconds of news latest() returns by default
+        self.feeds = {url: FeedState(url) for url in self.sources}
+        self.sentiment = SentimentMatcher()
+        # Headline -> symbols/sectors, with rolling sentiment per symbol and sector
+        self.entities = entities or EntityIndex()
+        self.session = session or self._make_session(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="news-fetch")
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _make_session(pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = "Mozilla/5.0 (compatible; AIWealthNews/1.0)"
+        return session
+
+    # --- Ingestion ---
 
-    def fetch_latest_news(self):
+    def start(self):
         """
-        Fetches news from sources. 
-        Stores them in history for verification.
+        Polls all sources now and then every poll_interval seconds, in a daemon thread.
         """
-        news_items = []
-        # Enhanced Simulation with Market Context
-        simulated_news = [
-            {"source": "Argaam", "title": "أرباح ربع سنوية قوية لقطاع البتروكيماويات تفوق التوقعات.", "url": "#"},
-            {"source": "AlRajhi Capital", "title": "توقعات بارتفاع الفائدة قد تضغط على هوامش ربحية البنوك.", "url": "#"},
-            {"source": "SPA (Twitter)", "title": "ولي العهد يعلن عن مبادرات استثمارية ضخمة في قطاع التكنولوجيا.", "url": "#"},
-            {"source": "Reuters", "title": "ارتفاع مفاجئ في أسعار النفط يدفعه لتجاوز 90 دولاراً.", "url": "#"},
-            {"source": "Tadawul", "title": "قطاع الأسمنت يشهد انتعاشاً ملحوظاً بدعم من المشاريع الكبرى.", "url": "#"},
-            {"source": "Bloomberg", "title": "صناديق عالمية تزيد من وزن السوق السعودي في مؤشراتها.", "url": "#"},
-            {"source": "CNBC Arabia", "title": "مخاوف من ركود عالمي تسيطر على معنويات المتداولين.", "url": "#"}
-        ]
-        
-        # Pick 3 random items to keep feed fresh but not overwhelming
-        import random
-        selected_news = random.sample(simulated_news, 3)
-        
-        from datetime import datetime
-        
-        for item in selected_news:
-            sentiment = self.analyze_sentiment(item["title"])
-            
-            news_obj = {
-                "id": len(self.archive) + 1,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "source": item["source"],
-                "source_url": item["url"],
-                "title": item["title"],
-                "sentiment": sentiment,
-                "score": 1 if sentiment == "Positive" else -1 if sentiment == "Negative" else 0
-            }
-            
-            # Avoid exact duplicates in top 5
-            if not any(n['title'] == news_obj['title'] for n in self.archive[:5]):
-                news_items.append(news_obj)
-                self.archive.insert(0, news_obj)
-            
-        return news_items
-
-    def get_archive(self):
-        return self.archive[:50] # Return last 50 items
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="news-poll", daemon=True)
+            self._thread.start()
 
-    def analyze_sentiment(self, text):
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"News poll error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def poll(self):
         """
-        Analyzes Arabic text sentiment with expanded vocabulary.
+        Fetches all sources in parallel and ingests their new items.
+        Returns the new items, newest first.
         """
-        positive_keywords = [
-            'ارتفاع', 'نمو', 'أرباح', 'إيجابي', 'صعود', 'قوية', 'انتعاش', 
-            'صفقة', 'مبادرات', 'استثمار', 'مكاسب', 'توسع', 'قفزة', 'تدشين', 
-            'زيادة', 'تجاوز'
-        ]
-        negative_keywords = [
-            'انخفاض', 'خسارة', 'تراجع', 'سلبي', 'هبوط', 'ضعف', 'ضغط', 
-            'مخاوف', 'انهيار', 'تعثر', 'ركود', 'أزمة', 'عقوبات'
-        ]
-        
-        score = 0
-        for word in positive_keywords:
-            if word in text:
-                score += 1
-        for word in negative_keywords:
-            if word in text:
-                score -= 1
-                
-        if score > 0:
-            return "Positive"
-        elif score < 0:
-            return "Negative"
+        results = self._executor.map(self._fetch, self.feeds.values())
+        entries = [(feed, entry) for feed, feed_entries in zip(self.feeds.values(), results) for entry in feed_entries]
+        # Oldest first, so ids follow publication order; titles already archived (any source) are dropped
+        entries.sort(key=lambda fe: fe[1]["published"] or 0)
+        for feed, entry in entries:
+            feed.remember(entry["id"])
+        entries = [(feed, entry) for feed, entry in entries if not self.archive.contains(entry["title"])]
+        scores = self.sentiment.score_batch([entry["title"] for _, entry in entries])
+        new_items = [self._ingest(feed, entry, score) for (feed, entry), score in zip(entries, scores)]
+        new_items = [item for item in reversed(new_items) if item is not None]
+        return new_items
+
+    def _fetch(self, feed):
+        """
+        One conditional GET; returns the feed's new entries (empty on 304 or error).
+        """
+        headers = {}
+        if feed.etag:
+            headers["If-None-Match"] = feed.etag
+        if feed.last_modified:
+            headers["If-Modified-Since"] = feed.last_modified
+        try:
+            response = self.session.get(feed.url, headers=headers, timeout=self.timeout)
+            feed.last_status = response.status_code
+            if response.status_code == 304:
+                return []
+            response.raise_for_status()
+            entries = self._parse_new(feed, response.content)
+        except (requests.RequestException, ET.ParseError) as e:
+            feed.last_error = str(e)
+            print(f"Warning: Could not fetch news feed {feed.url}: {e}")
+            return []
+        # Validators are only kept once the body was ingested, so a failed parse is retried in full
+        feed.etag = response.headers.get("ETag")
+        feed.last_modified = response.headers.get("Last-Modified")
+        feed.last_error = None
+        return entries
+
+    def _parse_new(self, feed, content):
+        """
+        Streams through the feed document and returns its entries up to the
+        first one already ingested, as dicts (id, title, link, published).
+        """
+        entries = []
+        in_entry = False
+        for event, element in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+            tag = element.tag
+            if tag in ("item", f"{ATOM}entry"):
+                if event == "start":
+                    in_entry = True
+                    continue
+                in_entry = False
+                entry = self._entry(element, atom=tag != "item")
+                element.clear()
+                if entry is None:
+                    continue
+                if entry["id"] in feed.seen:
+                    break  # Everything after this was ingested by an earlier poll
+                entries.append(entry)
+            elif event == "end" and not in_entry and tag in ("title", f"{ATOM}title"):
+                feed.name = (element.text or "").strip() or feed.name  # Channel/feed title
+        return entries
+
+    @staticmethod
+    def _entry(element, atom):
+        def text(name):
+            node = element.find(f"{ATOM}{name}" if atom else name)
+            return (node.text or "").strip() if node is not None and node.text else ""
+
+        title = text("title")
+        if not title:
+            return None
+        if atom:
+            link_node = element.find(f"{ATOM}link")
+            link = link_node.get("href", "") if link_node is not None else ""
+            item_id = text("id") or link or title
+            published = text("published") or text("updated")
         else:
-            return "Neutral"
+            link = text("link")
+            item_id = text("guid") or link or title
+            published = text("pubDate")
+        return {"id": item_id, "title": title, "link": link, "published": NewsEngine._parse_time(published, atom)}
+
+    @staticmethod
+    def _parse_time(value, atom):
+        if not value:
+            return None
+        if atom and value[-1] in "Zz":
+            value = value[:-1] + "+00:00"  # RFC 3339 UTC suffix, which fromisoformat only accepts from Python 3.11
+        try:
+            parsed = datetime.fromisoformat(value) if atom else parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        # No zone (or RFC 822's -0000) means UTC
+        return parsed.timestamp() if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc).timestamp()
+
+    def _ingest(self, feed, entry, score):
+        published_at = entry["published"] or time.time()
+        sentiment = self.sentiment.label(score)
+        item = self.archive.add(self.entities.tag({
+            "timestamp": datetime.fromtimestamp(published_at, KSA).strftime("%Y-%m-%d %H:%M:%S"),
+            "published_at": published_at,
+            "source": feed.name or feed.url,
+            "source_url": entry["link"] or "#",
+            "title": entry["title"],
+            "sentiment": sentiment,
+            "score": 1 if sentiment == "Positive" else -1 if sentiment == "Negative" else 0
+        }))
+        if item is not None:
+            self.entities.add(item)
+        return item
+
+    # --- Reading ---
+
+    def latest(self, max_age=None, limit=50):
+        """
+        Ingested news published within max_age seconds (default recent_window),
+        newest first. Reads the store only; fetching happens in poll().
+        """
+        cutoff = time.time() - (self.recent_window if max_age is None else max_age)
+        return self.archive.between(cutoff, limit=limit)
+
+    def get_archive(self, limit=50, before_id=None):
+        return self.archive.latest(limit, before_id) # Last 50 items, newest first
+
+    def analyze_sentiment(self, text):
+        """
+        Analyzes Arabic text sentiment with expanded vocabulary (see sentiment.SentimentMatcher).
+        """
+        return self.sentiment.label(self.sentiment.score(text))
+
+    def analyze_batch(self, texts):
+        """
+        Sentiment labels for many headlines at once.
+        """
+        return [self.sentiment.label(score) for score in self.sentiment.score_batch(texts)]
@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import threading
+import time
+from sentiment import trie_pattern
+
+# Arabic letter forms folded together before matching, and marks that are dropped
+_ARABIC_FOLD = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ـ": None,
+                              **{chr(c): None for c in range(0x064B, 0x0653)}})
+
+
+def normalize(text):
+    return text.translate(_ARABIC_FOLD).lower()
+
+
+class RollingScore:
+    """
+    Exponentially decayed sum of sentiment scores and of mentions for one
+    entity: a mention half_life seconds old counts half. Adding and reading
+    are O(1), whatever the number of headlines seen.
+    """
+    __slots__ = ("score", "mentions", "updated_at")
+
+    def __init__(self):
+        self.score = 0.0
+        self.mentions = 0.0
+        self.updated_at = None
+
+    def add(self, score, at, half_life):
+        if self.updated_at is None or at >= self.updated_at:
+            decay = self._decay(at, half_life)
+            self.score = self.score * decay + score
+            self.mentions = self.mentions * decay + 1
+            self.updated_at = at
+        else:
+            # A late headline, older than the last one counted: add it already decayed
+            decay = 0.5 ** ((self.updated_at - at) / half_life)
+            self.score += score * decay
+            self.mentions += decay
+
+    def _decay(self, at, half_life):
+        if self.updated_at is None or at <= self.updated_at:
+            return 1.0
+        return 0.5 ** ((at - self.updated_at) / half_life)
+
+    def value(self, at, half_life):
+        decay = self._decay(at, half_life)
+        return self.score * decay, self.mentions * decay
+
+
+class EntityIndex:
+    """
+    Maps news headlines to the Tadawul symbols and sectors they mention, and
+    keeps a rolling sentiment score per symbol and per sector.
+
+    Names and Arabic aliases from the symbol dictionary are compiled into one
+    regex (see sentiment.trie_pattern), matched once per normalized headline;
+    the longest alias wins, so "بنك الرياض" is the bank rather than the
+    banking sector. A symbol mention also counts for its sector. Scores are
+    updated as news is ingested, so strategies read them (snapshot()) in O(1)
+    per entity instead of rescanning headlines per decision.
+    """
+
+    def __init__(self, symbols=None, sectors=None, half_life=6 * 3600.0):
+        self.symbols = symbols or {}   # symbol -> {"name", "sector", "aliases"}
+        self.sectors = sectors or {}   # sector -> aliases
+        self.half_life = half_life
+        self._aliases = {}             # normalized alias -> (symbols, sectors)
+        for sector, aliases in self.sectors.items():
+            for alias in [sector, *aliases]:
+                self._alias(alias, sector=sector)
+        for symbol, info in self.symbols.items():
+            for alias in [info.get("name"), *info.get("aliases", ())]:
+                if alias:
+                    self._alias(alias, symbol=symbol)
+        self._pattern = re.compile(trie_pattern(self._aliases)) if self._aliases else None
+        self._symbol_scores = {}       # symbol -> RollingScore
+        self._sector_scores = {}       # sector -> RollingScore
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, half_life=6 * 3600.0):
+        if not path or not os.path.exists(path):
+            print(f"Warning: Symbol dictionary {path} not found, news is not mapped to symbols")
+            return cls(half_life=half_life)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("symbols"), data.get("sectors"), half_life)
+
+    def _alias(self, alias, symbol=None, sector=None):
+        symbols, sectors = self._aliases.get(normalize(alias), ((), ()))
+        if symbol is not None and symbol not in symbols:
+            symbols += (symbol,)
+        if sector is not None and sector not in sectors:
+            sectors += (sector,)
+        self._aliases[normalize(alias)] = (symbols, sectors)
+
+    def sector_of(self, symbol):
+        info = self.symbols.get(symbol)
+        return info.get("sector") if info else None
+
+    def match(self, text):
+        """
+        The symbols and sectors a text mentions, as two sorted lists.
+        """
+        symbols, sectors = set(), set()
+        if self._pattern is not None:
+            for alias in set(self._pattern.findall(normalize(text))):
+                alias_symbols, alias_sectors = self._aliases[alias]
+                symbols.update(alias_symbols)
+                sectors.update(alias_sectors)
+        for symbol in symbols:
+            sector = self.sector_of(symbol)
+            if sector:
+                sectors.add(sector)
+        return sorted(symbols), sorted(sectors)
+
+    def tag(self, item):
+        """
+        Sets a news item's "symbols" and "sectors" (before it is shared with readers).
+        """
+        item["symbols"], item["sectors"] = self.match(item["title"])
+        return item
+
+    def add(self, item):
+        """
+        Adds a tagged item's score (item["score"], at item["published_at"])
+        to the rolling sentiment of its symbols and sectors.
+        """
+        symbols, sectors = item["symbols"], item["sectors"]
+        at = item.get("published_at") or time.time()
+        with self._lock:
+            for symbol in symbols:
+                self._symbol_scores.setdefault(symbol, RollingScore()).add(item["score"], at, self.half_life)
+            for sector in sectors:
+                self._sector_scores.setdefault(sector, RollingScore()).add(item["score"], at, self.half_life)
+        return item
+
+    def snapshot(self, at=None):
+        """
+        Decayed scores of every entity at one instant, in one consistent read:
+        {"symbols": {symbol: (score, mentions)}, "sectors": {sector: (score, mentions)}}.
+        """
+        at = at or time.time()
+        with self._lock:
+            return {
+                "symbols": {symbol: rolling.value(at, self.half_life) for symbol, rolling in self._symbol_scores.items()},
+                "sectors": {sector: rolling.value(at, self.half_life) for sector, rolling in self._sector_scores.items()},
+            }
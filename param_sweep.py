@@ -0,0 +1,244 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+from backtester import Backtester, MarketArrays, run_signals, _epoch
+from bar_store import BarStore
+from strategy_registry import STRATEGY_REGISTRY, strategy_params, load_params, save_params
+
+# Metrics where a smaller value ranks first (drawdown is a positive magnitude)
+LOWER_IS_BETTER = {"max_drawdown_pct"}
+
+
+def grid(space):
+    """
+    Every combination of a {param: [values]} space.
+    """
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_search(space, n, seed=0):
+    """
+    n random candidates from a {param: values} space. A list is sampled from,
+    a (low, high) tuple is drawn uniformly (integers when both bounds are ints).
+    """
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for _ in range(n):
+        candidate = {}
+        for key, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    candidate[key] = int(rng.integers(low, high + 1))
+                else:
+                    candidate[key] = round(float(rng.uniform(low, high)), 4)
+            else:
+                candidate[key] = values[int(rng.integers(len(values)))]
+        candidates.append(candidate)
+    return candidates
+
+
+class SharedArrays:
+    """
+    Copies the arrays the vector signals read (MarketArrays.SHARED_FIELDS) into
+    shared memory once. Workers attach to the blocks by name, so a task carries
+    only its params instead of a pickled copy of the price history.
+    Use as a context manager in the parent; the blocks are unlinked on exit.
+    """
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {"symbols": arrays.symbols, "settings": arrays.settings(), "fields": {}}
+        try:
+            for name in MarketArrays.SHARED_FIELDS:
+                matrix = np.ascontiguousarray(getattr(arrays, name))
+                block = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(matrix.shape, matrix.dtype, buffer=block.buf)[...] = matrix
+                self.spec["fields"][name] = (block.name, matrix.shape, matrix.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def attach(spec):
+        """
+        Read-only MarketArrays over the shared blocks, plus the blocks themselves,
+        which must stay referenced while the arrays are in use.
+        """
+        blocks = []
+        matrices = {}
+        for name, (block_name, shape, dtype) in spec["fields"].items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            matrix = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+            matrix.flags.writeable = False
+            matrices[name] = matrix
+        return MarketArrays.from_matrices(spec["symbols"], matrices, **spec["settings"]), blocks
+
+
+# Per-process state, set once by the pool initializer
+_worker = {}
+
+
+def _init_worker(spec, initial_capital):
+    arrays, blocks = SharedArrays.attach(spec)
+    _worker.update(arrays=arrays, blocks=blocks, initial_capital=initial_capital)
+
+
+def _evaluate(task):
+    name, params, seed = task
+    result = run_signals(_worker["arrays"], STRATEGY_REGISTRY[name], params, _worker["initial_capital"], seed)
+    del result["equity"]
+    result["params"] = params
+    result["seed"] = seed
+    return result
+
+
+def rank(results, metric="return_pct"):
+    """
+    Averages results over seeds for each params set, best `metric` first
+    (params sets without a value for `metric`, e.g. no closed trades, last).
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(sorted(result["params"].items())), []).append(result)
+    ranked = []
+    for runs in groups.values():
+        win_rates = [r["win_rate"] for r in runs if r["win_rate"] is not None]
+        ranked.append({
+            "strategy": runs[0]["strategy"],
+            "params": runs[0]["params"],
+            "runs": len(runs),
+            "return_pct": round(float(np.mean([r["return_pct"] for r in runs])), 2),
+            "max_drawdown_pct": round(float(np.mean([r["max_drawdown_pct"] for r in runs])), 2),
+            "trades": round(float(np.mean([r["trades"] for r in runs])), 1),
+            "win_rate": round(float(np.mean(win_rates)), 1) if win_rates else None,
+        })
+    sign = -1 if metric in LOWER_IS_BETTER else 1
+    ranked.sort(key=lambda r: (r[metric] is not None, sign * (r[metric] or 0)), reverse=True)
+    return ranked
+
+
+class ParameterSweep:
+    """
+    Evaluates many params sets of one strategy on the backtester fast path,
+    fanned out over a process pool that shares one copy of the history.
+    """
+
+    def __init__(self, backtester, processes=None):
+        self.backtester = backtester
+        self.processes = processes or os.cpu_count() or 1
+
+    def run(self, strategy_name, candidates, start=None, end=None, seeds=(0,), metric="return_pct"):
+        """
+        candidates: list of partial params dicts (see grid/random_search); params
+        not in a candidate keep their registered defaults; names the strategy
+        does not register raise ValueError.
+        Returns the ranked list (see rank).
+        """
+        spec = STRATEGY_REGISTRY[strategy_name]
+        if spec.vector is None:
+            raise ValueError(f"Strategy {strategy_name} has no vectorized form to sweep")
+        unknown = sorted({key for candidate in candidates for key in candidate} - set(spec.params))
+        if unknown:
+            raise ValueError(f"Unknown params for {strategy_name}: {', '.join(unknown)} "
+                             f"(expected {', '.join(spec.params)})")
+        base = strategy_params([spec])[strategy_name]
+        tasks = [(strategy_name, {**base, **candidate}, seed) for candidate in candidates for seed in seeds]
+        if not tasks:
+            return []
+
+        arrays = self.backtester.load(start, end)
+        started = time.monotonic()
+        with SharedArrays(arrays) as shared:
+            with ProcessPoolExecutor(self.processes, initializer=_init_worker,
+                                     initargs=(shared.spec, self.backtester.initial_capital)) as pool:
+                chunksize = max(1, len(tasks) // (self.processes * 4))
+                results = list(pool.map(_evaluate, tasks, chunksize=chunksize))
+        print(f"Sweep {strategy_name}: {len(tasks)} runs over {arrays.days} days "
+              f"on {self.processes} processes in {time.monotonic() - started:.1f}s")
+        return rank(results, metric)
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_space(items):
+    """
+    "name=a,b,c" -> list of values, "name=low:high" -> range for random search.
+    """
+    space = {}
+    for item in items:
+        key, _, values = item.partition("=")
+        if ":" in values:
+            low, high = values.split(":", 1)
+            space[key] = (_number(low), _number(high))
+        else:
+            space[key] = [_number(v) for v in values.split(",")]
+    return space
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Sweep strategy params on stored daily bars.")
+    parser.add_argument("strategy")
+    parser.add_argument("--param", action="append", default=[], help="name=a,b,c (grid) or name=low:high (random)")
+    parser.add_argument("--random", type=int, default=0, help="Random search with N candidates instead of a grid")
+    parser.add_argument("--seeds", type=int, default=1)
+    parser.add_argument("--metric", default="return_pct", choices=["return_pct", "max_drawdown_pct", "win_rate"])
+    parser.add_argument("--history-dir", default=Config.HISTORY_DIR)
+    parser.add_argument("--start", help="YYYY-MM-DD")
+    parser.add_argument("--end", help="YYYY-MM-DD")
+    parser.add_argument("--capital", type=float, default=Config.INITIAL_CAPITAL)
+    parser.add_argument("--processes", type=int, default=Config.SWEEP_PROCESSES)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--save", action="store_true", help=f"Write the best params to {Config.STRATEGY_PARAMS}")
+    args = parser.parse_args()
+
+    space = parse_space(args.param)
+    if args.random:
+        candidates = random_search(space, args.random)
+    else:
+        ranges = [key for key, values in space.items() if isinstance(values, tuple)]
+        if ranges:
+            parser.error(f"Ranges need --random: {', '.join(ranges)}")
+        candidates = grid(space)
+
+    sweep = ParameterSweep(Backtester(BarStore(args.history_dir), initial_capital=args.capital), args.processes)
+    try:
+        ranked = sweep.run(args.strategy, candidates, start=_epoch(args.start), end=_epoch(args.end),
+                           seeds=range(args.seeds), metric=args.metric)
+    except ValueError as e:
+        parser.error(str(e))
+    for r in ranked[:args.top]:
+        print(f"{r['return_pct']:>8.2f}%  DD {r['max_drawdown_pct']:>7.2f}%  trades {r['trades']:>6}  {r['params']}")
+
+    if args.save and ranked:
+        tuned = load_params(Config.STRATEGY_PARAMS)
+        tuned[args.strategy] = ranked[0]["params"]
+        save_params(Config.STRATEGY_PARAMS, tuned)
+        print(f"Saved {args.strategy} params to {Config.STRATEGY_PARAMS}")
@@ -1,12 +1,42 @@
+import time
+from collections import deque
+from audit_metrics import AuditMetrics
+from leaderboard import Leaderboard
+from position_ledger import LotLedger
+from trade_record import TradeRecord
+from valuation import ValuationEngine
+
+
 class PortfolioManager:
-    def __init__(self, initial_capital=100000.0):
+    # One portfolio per registered strategy (see ai_trader.AITrader)
+    DEFAULT_PORTFOLIOS = [
+        "رزين", "مقدام", "حصاد", 
+        "برق", "قناص", "موج", 
+        "مقتحم", "جوال", "عواطف", "محظوظ"
+    ]
+
+    def __init__(self, initial_capital=100000.0, strategy_names=None, trade_log=None, recent_trades=200):
         # We will manage 10 portfolios, indexed by ID (0-9) or Name
         self.portfolios = {}
-        strategy_names = [
-            "رزين", "مقدام", "حصاد", 
-            "برق", "قناص", "موج", 
-            "مقتحم", "صياد", "ذكي", "جسور"
-        ]
+        # Full history goes to the on-disk trade log; "history" keeps the last recent_trades in memory
+        self.trade_log = trade_log
+        self.recent_trades = recent_trades
+        # Write-ahead journal for crash recovery (state_store.StateStore), set by its attach()
+        self.journal = None
+        # Position values of all portfolios, updated per price change (subscribe on_price to the market)
+        self.valuation = ValuationEngine()
+        # Running audit metrics per portfolio (win rate, profit factor, drawdown), updated per trade/value
+        self.metrics = {}
+        # Portfolios ranked by value, reordered only when a value changes
+        self.leaderboard = Leaderboard(initial_capital)
+        # Read-only state for request threads, rebuilt by publish() (simulation thread only)
+        self.published = None
+        self._dirty = set()  # portfolios changed since the last publish
+        self._version = 0
+        # Open positions per portfolio as FIFO lots; portfolio["holdings"] is the ledger's quantities dict
+        self.ledgers = {}
+        self.initial_capital = initial_capital
+        strategy_names = strategy_names or self.DEFAULT_PORTFOLIOS
         
         for name in strategy_names:
             # Random initial push for demo aesthetics
@@ -14,126 +44,251 @@ class PortfolioManager:
             initial_variation = random.uniform(-0.5, 1.5) # Start between -0.5% and +1.5%
             start_value = initial_capital * (1 + (initial_variation / 100))
             
+            self.ledgers[name] = LotLedger()
+            self.metrics[name] = AuditMetrics()
+            self.metrics[name].reset(start_value)
             self.portfolios[name] = {
                 "id": name,
                 "cash": initial_capital, # Keep cash pure
-                "holdings": {}, 
+                "holdings": self.ledgers[name].quantities,
                 "total_value": start_value, # Visual start value
-                "history": [],
-                "active_trades": [], 
+                "history": deque(maxlen=recent_trades),
+                "trade_count": 0,
                 "last_log": "جاري تهيئة النظام..." 
             }
+            self.leaderboard.update(name, start_value, last_log=self.portfolios[name]["last_log"])
+
+    def start_week(self, week_start, week_end):
+        """
+        Starts a new trade log segment (called by ChallengeEngine at each week start).
+        """
+        if self.journal:
+            self.journal.record("week", week_start=week_start.isoformat(), week_end=week_end.isoformat())
+        if self.trade_log:
+            self.trade_log.start_segment(week_start)
+
+    def reset_portfolio(self, strategy_name, cash):
+        """
+        Empties a portfolio (positions, lots, history) and sets its cash.
+        """
+        portfolio = self.portfolios[strategy_name]
+        self.ledgers[strategy_name].clear()
+        self.valuation.clear(strategy_name)
+        portfolio["cash"] = cash
+        portfolio["history"] = deque(maxlen=self.recent_trades)
+        portfolio["trade_count"] = 0
+        portfolio["total_value"] = cash
+        self.metrics[strategy_name].reset(cash)
+        self.leaderboard.update(strategy_name, cash)
+        self._dirty.add(strategy_name)
+        if self.journal:
+            self.journal.record("reset", strategy=strategy_name, cash=cash)
+
+    def set_value(self, strategy_name, value):
+        """
+        Sets a portfolio's total value, journaling the change.
+        Returns True if the value changed.
+        """
+        portfolio = self.portfolios[strategy_name]
+        if portfolio["total_value"] == value:
+            return False
+        portfolio["total_value"] = value
+        self.metrics[strategy_name].on_value(value)
+        self.leaderboard.update(strategy_name, value)
+        self._dirty.add(strategy_name)
+        if self.journal:
+            self.journal.record("value", strategy=strategy_name, value=value)
+        return True
+
+    def portfolio_view(self, strategy_name):
+        """
+        JSON-friendly copy of a portfolio: recent trades as a list, plus open lots.
+        Trade records (TradeRecord) are shared, not copied: they are never changed once recorded.
+        """
+        portfolio = self.portfolios.get(strategy_name)
+        if not portfolio:
+            return None
+        return {**portfolio, "holdings": dict(portfolio["holdings"]), "history": list(portfolio["history"]),
+                "open_lots": self.open_lots(strategy_name)}
+
+    def publish(self):
+        """
+        Builds an immutable snapshot of all portfolios for request threads and
+        swaps it in with one reference assignment, so readers never lock and
+        never see a half-applied trade. Copy-on-write: only portfolios changed
+        since the last publish are rebuilt, the others reuse the previous
+        snapshot's objects. Call from the simulation thread once per tick;
+        readers must treat everything in it as read-only.
+        """
+        previous = self.published["portfolios"] if self.published else {}
+        dirty, self._dirty = self._dirty, set()
+        portfolios = {}
+        for name in self.portfolios:
+            view = previous.get(name)
+            if view is None or name in dirty:
+                view = self.portfolio_view(name)
+                view["audit"] = self.get_audit_report(name, history=False)
+            portfolios[name] = view
+
+        recent_trades = []
+        for name, view in portfolios.items():
+            recent_trades.extend(view["history"][-2:]) # Last 2 per strategy (records carry their strategy)
+
+        self._version += 1
+        self.published = {
+            "version": self._version,
+            "published_at": time.time(),
+            "portfolios": portfolios,
+            "leaderboard": self.get_portfolio_summary(),
+            "recent_trades": recent_trades[-10:], # Last 10 global trades
+        }
+        return self.published
+
+    def _record(self, strategy_name, portfolio, trade_record):
+        portfolio["history"].append(trade_record)
+        portfolio["trade_count"] += 1
+        self._dirty.add(strategy_name)
+        if self.journal:
+            # With the mark the position is valued at, so replay values it the same way
+            self.journal.record("trade", strategy=strategy_name, trade=trade_record,
+                                mark=self.valuation.marks.get(trade_record.symbol))
+        if self.trade_log:
+            self.trade_log.append(strategy_name, trade_record)
+
+    def open_lots(self, strategy_name):
+        """
+        Open lots of a portfolio as JSON-friendly dicts, oldest first per symbol.
+        """
+        ledger = self.ledgers.get(strategy_name)
+        return ledger.to_list() if ledger else []
 
     def update_log(self, strategy_name, message):
         if strategy_name in self.portfolios:
             self.portfolios[strategy_name]["last_log"] = message
+            self.leaderboard.update(strategy_name, last_log=message)
+            self._dirty.add(strategy_name)
 
-    def execute_trade(self, strategy_name, action, symbol, price, quantity, reasoning, goals, extra_data={}):
+    def execute_trade(self, strategy_name, action, symbol, price, quantity, reasoning, goals, extra_data={}, lot_id=None):
         """
         Executes a trade and updates the portfolio.
         extra_data: dict for links, indicators, etc.
+        A BUY opens a lot carrying its goals; a SELL closes lots FIFO (partial
+        quantities leave the rest of a lot open), or only lot_id when given.
         """
         portfolio = self.portfolios.get(strategy_name)
         if not portfolio:
             return False, "Portfolio not found"
+        ledger = self.ledgers[strategy_name]
 
         total_cost = price * quantity
         
         if action == "BUY":
             if portfolio["cash"] >= total_cost:
                 portfolio["cash"] -= total_cost
-                current_qty = portfolio["holdings"].get(symbol, 0)
-                portfolio["holdings"][symbol] = current_qty + quantity
                 
-                trade_record = {
-                    "action": "BUY",
-                    "symbol": symbol,
-                    "price": price,
-                    "quantity": quantity,
-                    "timestamp": "Now", # timestamp
-                    "reason": reasoning,
-                    "verification_link": extra_data.get('verification_link'),
-                    "rsi_value": extra_data.get('rsi_value'),
-                    "goals": goals
-                }
-                portfolio["history"].append(trade_record)
-                portfolio["active_trades"].append(trade_record)
+                trade_record = TradeRecord("BUY", symbol, price, quantity, reasoning, goals=goals,
+                                           verification_link=extra_data.get('verification_link'),
+                                           rsi_value=extra_data.get('rsi_value'), strategy=strategy_name)
+                lot = ledger.open(symbol, quantity, price, goals, trade_record)
+                trade_record.lot_id = lot.id
+                self._record(strategy_name, portfolio, trade_record)
+                self._position_changed(strategy_name, symbol, price)
                 return True, "Buy Executed"
             else:
                 return False, "Insufficient Funds"
 
         elif action == "SELL":
-            current_qty = portfolio["holdings"].get(symbol, 0)
-            if current_qty >= quantity:
-                portfolio["holdings"][symbol] = current_qty - quantity
+            try:
+                fills = ledger.close(symbol, quantity, lot_id)
+            except ValueError:
+                fills = None
+            if fills:
                 portfolio["cash"] += total_cost
-                # Remove from holdings if 0
-                if portfolio["holdings"][symbol] == 0:
-                    del portfolio["holdings"][symbol]
+                for lot, taken in fills:
+                    self.metrics[strategy_name].on_fill(lot.price, price, taken)
                     
-                trade_record = {
-                    "action": "SELL",
-                    "symbol": symbol,
-                    "price": price,
-                    "quantity": quantity,
-                    "timestamp": "Now",
-                    "reason": reasoning,
-                    "goals": None # Goals are for entry
-                }
-                portfolio["history"].append(trade_record)
-                
-                # Close active trade (logic to match sell with buy needs refinement for partial sells)
-                portfolio["active_trades"] = [t for t in portfolio["active_trades"] if t["symbol"] != symbol]
-                
+                trade_record = TradeRecord("SELL", symbol, price, quantity, reasoning, strategy=strategy_name,
+                                           lots=tuple((lot.id, taken, lot.price) for lot, taken in fills),
+                                           pnl=sum((price - lot.price) * taken for lot, taken in fills))
+                self._record(strategy_name, portfolio, trade_record)
+                self._position_changed(strategy_name, symbol, price)
                 return True, "Sell Executed"
             else:
                 return False, "Result Insufficient Holdings"
         
         return False, "Invalid Action"
 
+    def check_exits(self, strategy_name, get_price):
+        """
+        Sells each lot whose own target or stop was reached at the current price.
+        Only crossed lots are visited (see position_ledger.TriggerIndex).
+        get_price: callable symbol -> price (or None).
+        Returns [(symbol, reason)] for the exits executed.
+        """
+        ledger = self.ledgers.get(strategy_name)
+        if ledger is None:
+            return []
+
+        exits = []
+        for symbol in list(ledger.lots):
+            price = get_price(symbol)
+            if not price:
+                continue
+            for lot, reason in ledger.crossed(symbol, price):
+                self.execute_trade(strategy_name, "SELL", symbol, price, lot.quantity, reason, None, {}, lot_id=lot.id)
+                exits.append((symbol, reason))
+        return exits
+
+    def _position_changed(self, strategy_name, symbol, price):
+        portfolio = self.portfolios[strategy_name]
+        position_value = self.valuation.set_position(strategy_name, symbol, self.ledgers[strategy_name].quantity(symbol), price)
+        value = portfolio["cash"] + position_value
+        if not self.set_value(strategy_name, value) and self.journal:
+            # Unchanged, but journaled anyway: recovery restores the value after every trade
+            self.journal.record("value", strategy=strategy_name, value=value)
+
+    def sync_positions(self, strategy_name):
+        """
+        Rebuilds a portfolio's valuation positions from its ledger (after state recovery).
+        """
+        self.valuation.clear(strategy_name)
+        for symbol, quantity in self.ledgers[strategy_name].quantities.items():
+            self.valuation.set_position(strategy_name, symbol, quantity)
+
+    def on_price(self, symbol, price):
+        """
+        Price listener (MarketDataService.subscribe): revalues only the portfolios holding symbol.
+        """
+        changed = self.valuation.on_price(symbol, price)
+        if changed and self.journal:
+            self.journal.record("mark", symbol=symbol, price=price)
+        for name, position_value in changed.items():
+            self.set_value(name, self.portfolios[name]["cash"] + position_value)
+
     def get_portfolio_summary(self):
         """
-        Returns a simplified list for the leaderboard.
+        Returns a simplified list for the leaderboard, best return first, with
+        rank and rank_change. Cached: rebuilt only after values or logs changed.
         """
-        summary = []
-        for name, data in self.portfolios.items():
-            summary.append({
-                "name": name,
-                "value": data["total_value"],
-                "last_log": data.get("last_log", "..."),
-                "return": ((data["total_value"] - 100000) / 100000) * 100
-            })
-        # Sort by return DESC
-        # Sort by return DESC
-        summary.sort(key=lambda x: x["return"], reverse=True)
-        return summary
+        return self.leaderboard.ranking()
 
-    def get_audit_report(self, strategy_name):
+    def get_audit_report(self, strategy_name, history=True):
         """
-        Returns detailed performance metrics for the audit page.
+        Returns detailed performance metrics for the audit page
+        (with the recent trades unless history=False).
         """
         portfolio = self.portfolios.get(strategy_name)
         if not portfolio:
             return None
-            
-        history = portfolio["history"]
-        
-        # Calculate Logic
-        # Simple simulated metrics based on history for the demo "Proof"
-        import random
-        base_win_rate = 65 # Base %
-        if strategy_name in ["قناص", "مقدام"]: base_win_rate = 78
-        if strategy_name in ["رزين", "حصاد"]: base_win_rate = 85
-        
-        calculated_win_rate = base_win_rate + random.uniform(-5, 5)
         
-        return {
+        # Metrics are maintained per trade and per value change (see AuditMetrics), nothing is recomputed here
+        report = {
             "name": strategy_name,
             "total_value": portfolio["total_value"],
-            "return_pct": ((portfolio["total_value"] - 100000) / 100000) * 100,
-            "win_rate": int(calculated_win_rate),
-            "total_trades": len(history) + 42, # Add some fake history for credibility
-            "profit_factor": round(random.uniform(1.5, 2.8), 2),
-            "best_trade_pct": round(random.uniform(3.5, 8.2), 2),
-            "history": history # Real recent trades
+            "return_pct": ((portfolio["total_value"] - self.initial_capital) / self.initial_capital) * 100,
+            "total_trades": portfolio["trade_count"],
+            **self.metrics[strategy_name].report(),
         }
+        if history:
+            report["history"] = list(portfolio["history"]) # Real recent trades
+        return report
@@ -0,0 +1,205 @@
+import heapq
+from collections import deque
+
+
+class Lot:
+    """
+    One BUY fill, or what is left of it. Exit levels come from the entry's goals.
+    """
+
+    def __init__(self, lot_id, symbol, quantity, price, target_price=None, stop_loss=None, trade=None):
+        self.id = lot_id
+        self.symbol = symbol
+        self.quantity = quantity          # still held
+        self.entry_quantity = quantity
+        self.price = price
+        self.target_price = target_price
+        self.stop_loss = stop_loss
+        self.trade = trade                # the BUY trade record
+
+    def to_dict(self):
+        return {
+            "lot_id": self.id,
+            "symbol": self.symbol,
+            "quantity": self.quantity,
+            "entry_quantity": self.entry_quantity,
+            "price": self.price,
+            "target_price": self.target_price,
+            "stop_loss": self.stop_loss,
+        }
+
+    def __repr__(self):
+        return f"Lot({self.id}, {self.symbol!r}, {self.quantity}@{self.price})"
+
+
+class TriggerIndex:
+    """
+    Exit levels of open lots per symbol: a min-heap of targets and a max-heap
+    (negated) of stops. A price update pops only the levels it crossed, so a
+    tick costs O(k log n) for k crossings instead of a scan of every lot.
+    Entries of lots closed some other way (FIFO sells, the opposite level)
+    are skipped when they surface and purged once they outnumber live ones.
+    """
+    COMPACT_MIN = 32  # stale entries tolerated per symbol before compacting
+
+    def __init__(self):
+        self.targets = {}  # symbol -> heap of (target_price, lot_id)
+        self.stops = {}    # symbol -> heap of (-stop_loss, lot_id)
+
+    def add(self, lot):
+        if lot.target_price is not None:
+            heapq.heappush(self.targets.setdefault(lot.symbol, []), (lot.target_price, lot.id))
+        if lot.stop_loss is not None:
+            heapq.heappush(self.stops.setdefault(lot.symbol, []), (-lot.stop_loss, lot.id))
+
+    def pop_crossed(self, symbol, price, is_open):
+        """
+        Removes and returns [(lot_id, reason)] for open lots whose target
+        (price >= target) or stop (price <= stop) was crossed.
+        """
+        crossed = {}
+        targets = self.targets.get(symbol)
+        while targets and targets[0][0] <= price:
+            lot_id = heapq.heappop(targets)[1]
+            if is_open(lot_id):
+                crossed[lot_id] = "Target Reached"
+        stops = self.stops.get(symbol)
+        while stops and -stops[0][0] >= price:
+            lot_id = heapq.heappop(stops)[1]
+            if is_open(lot_id):
+                crossed.setdefault(lot_id, "Stop Loss Hit")
+        return list(crossed.items())
+
+    def compact(self, symbol, live, is_open):
+        """
+        Drops stale entries for a symbol once its heaps hold far more entries
+        than the `live` open lots.
+        """
+        for heaps in (self.targets, self.stops):
+            heap = heaps.get(symbol)
+            if heap is None:
+                continue
+            if not live:
+                del heaps[symbol]
+            elif len(heap) > 2 * live + self.COMPACT_MIN:
+                heap[:] = [entry for entry in heap if is_open(entry[1])]
+                heapq.heapify(heap)
+
+    def clear(self):
+        self.targets.clear()
+        self.stops.clear()
+
+
+class LotLedger:
+    """
+    Open lots of one portfolio, FIFO per symbol.
+
+    lots[symbol] is a deque, oldest first, so FIFO sells pop from the left;
+    by_id finds a lot in O(1) (exits close the lot that hit its level);
+    quantities[symbol] is the open quantity, kept in step with the lots and
+    shared with the portfolio's "holdings" dict; triggers indexes every lot's
+    target and stop by price.
+    """
+
+    def __init__(self):
+        self.lots = {}        # symbol -> deque of open lots
+        self.by_id = {}       # lot id -> Lot
+        self.quantities = {}  # symbol -> open quantity
+        self.triggers = TriggerIndex()
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        for lots in list(self.lots.values()):
+            yield from list(lots)
+
+    def quantity(self, symbol):
+        return self.quantities.get(symbol, 0)
+
+    def open(self, symbol, quantity, price, goals=None, trade=None):
+        goals = goals or {}
+        lot = Lot(self._next_id, symbol, quantity, price,
+                  goals.get("target_price"), goals.get("stop_loss"), trade)
+        self._next_id += 1
+        self.lots.setdefault(symbol, deque()).append(lot)
+        self.by_id[lot.id] = lot
+        self.quantities[symbol] = self.quantity(symbol) + quantity
+        self.triggers.add(lot)
+        return lot
+
+    def restore(self, lot_id, symbol, quantity, entry_quantity, price, target_price=None, stop_loss=None, trade=None):
+        """
+        Re-opens a saved lot with its original id (state recovery).
+        """
+        lot = Lot(lot_id, symbol, quantity, price, target_price, stop_loss, trade)
+        lot.entry_quantity = entry_quantity
+        self.lots.setdefault(symbol, deque()).append(lot)
+        self.by_id[lot.id] = lot
+        self.quantities[symbol] = self.quantity(symbol) + quantity
+        self.triggers.add(lot)
+        self._next_id = max(self._next_id, lot_id + 1)
+        return lot
+
+    def crossed(self, symbol, price):
+        """
+        Open lots of `symbol` whose target or stop the price reached, as
+        [(lot, reason)]. Their triggers are consumed: the caller closes them.
+        """
+        return [(self.by_id[lot_id], reason)
+                for lot_id, reason in self.triggers.pop_crossed(symbol, price, self.by_id.__contains__)]
+
+    def close(self, symbol, quantity, lot_id=None):
+        """
+        Takes `quantity` out of the symbol's lots, oldest first, or out of one
+        lot when lot_id is given. Partly sold lots stay open with the rest.
+        Returns [(lot, quantity taken)]; raises ValueError if not enough is held.
+        """
+        if lot_id is not None:
+            lot = self.by_id.get(lot_id)
+            if lot is None or lot.symbol != symbol or lot.quantity < quantity:
+                raise ValueError(f"Lot {lot_id} does not hold {quantity} of {symbol}")
+            fills = [(lot, quantity)]
+        else:
+            if self.quantity(symbol) < quantity:
+                raise ValueError(f"Only {self.quantity(symbol)} of {symbol} held, cannot sell {quantity}")
+            fills = []
+            remaining = quantity
+            for lot in self.lots[symbol]:
+                if remaining <= 0:
+                    break
+                taken = min(lot.quantity, remaining)
+                fills.append((lot, taken))
+                remaining -= taken
+
+        for lot, taken in fills:
+            lot.quantity -= taken
+            if lot.quantity == 0:
+                self._remove(lot)
+        left = self.quantity(symbol) - quantity
+        if left:
+            self.quantities[symbol] = left
+        else:
+            del self.quantities[symbol]
+        return fills
+
+    def _remove(self, lot):
+        lots = self.lots[lot.symbol]
+        if lots[0] is lot:
+            lots.popleft()
+        else:
+            lots.remove(lot)
+        if not lots:
+            del self.lots[lot.symbol]
+        del self.by_id[lot.id]
+        self.triggers.compact(lot.symbol, len(lots), self.by_id.__contains__)
+
+    def clear(self):
+        self.lots.clear()
+        self.by_id.clear()
+        self.quantities.clear()
+        self.triggers.clear()
+
+    def to_list(self):
+        return [lot.to_dict() for lot in self]
@@ -0,0 +1,261 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+TIME_COLUMNS = ("timestamp", "datetime", "date", "time")
+
+
+def frame_to_bars(frame):
+    """
+    Converts an OHLCV DataFrame (any column case, time in a column) to
+    {"timestamp": int64 epoch seconds, "open": float64, ...} sorted by time.
+    Returns None when no time column is found.
+    """
+    frame = frame.rename(columns={c: str(c).strip().lower() for c in frame.columns})
+    time_col = next((c for c in TIME_COLUMNS if c in frame.columns), None)
+    if time_col is None:
+        return None
+    stamps = pd.to_datetime(frame[time_col], utc=True)
+    order = np.argsort(stamps.values, kind="stable")
+    bars = {"timestamp": stamps.values.astype("datetime64[s]").astype(np.int64)[order]}
+    for field in BAR_FIELDS:
+        if field in frame.columns:
+            bars[field] = frame[field].to_numpy(dtype=np.float64)[order]
+        else:
+            bars[field] = np.full(len(frame), np.nan)
+    return bars
+
+
+class ProviderError(Exception):
+    """
+    Raised by a provider when the upstream request itself failed, as opposed
+    to succeeding without data, so the fetcher's circuit breaker counts it.
+    """
+
+
+class PriceProvider:
+    """
+    Source of prices behind MarketDataService.
+    Subclasses implement fetch_prices and fetch_index; the clock methods let
+    offline providers run on simulated time. Upstream failures raise
+    ProviderError; empty results ({} / None) mean the source had no data.
+    """
+    name = "base"
+    # Live sources follow Tadawul hours; replayed data runs on its own clock
+    respects_market_hours = True
+
+    def fetch_prices(self, symbols):
+        """
+        Returns {symbol: latest price} for the symbols that have data.
+        """
+        raise NotImplementedError
+
+    def fetch_index(self):
+        """
+        Returns {"index": close, "change": close - open} for TASI, or None.
+        """
+        raise NotImplementedError
+
+    def fetch_history(self, symbol, start=None):
+        """
+        Returns completed daily bars newer than `start` (epoch seconds) as
+        {"timestamp": ..., "open": ..., ...}, or None when nothing is available.
+        """
+        raise NotImplementedError
+
+    def now(self):
+        """
+        Current time (epoch seconds) as seen by this provider.
+        """
+        return time.time()
+
+    def sleep(self, seconds):
+        """
+        Waits one simulation tick.
+        """
+        time.sleep(seconds)
+
+
+class YFinanceProvider(PriceProvider):
+    """
+    Live prices from Yahoo Finance (Tadawul symbols carry the .SR suffix).
+
+    yfinance does not raise when Yahoo is unreachable: it logs the failed
+    downloads and returns an empty frame. So a request that comes back with
+    no rows at all for every symbol asked for is raised as ProviderError; a
+    frame with rows that lacks some symbols only means those have no data.
+    """
+    name = "yfinance"
+
+    def __init__(self, market_suffix=".SR", index_symbol="^TASI.SR"):
+        self.market_suffix = market_suffix
+        self.index_symbol = index_symbol
+
+    def fetch_prices(self, symbols):
+        """
+        Bulk downloads today's bars for the given symbols in one request.
+        """
+        full_symbols = [f"{s}{self.market_suffix}" for s in symbols]
+        try:
+            data = yf.download(full_symbols, period="1d", group_by="ticker",
+                               progress=False, threads=True)
+        except Exception as e:
+            raise ProviderError(f"snapshot download for {len(symbols)} symbols failed: {e}") from e
+        if data is None or data.empty:
+            raise ProviderError(f"snapshot download returned no data for any of {len(symbols)} symbols")
+
+        prices = {}
+        for symbol, full_symbol in zip(symbols, full_symbols):
+            try:
+                if isinstance(data.columns, pd.MultiIndex):
+                    frame = data[full_symbol]
+                else:
+                    frame = data
+                closes = frame['Close'].dropna()
+            except KeyError:
+                closes = pd.Series(dtype=float)
+
+            if closes.empty:
+                print(f"Warning: No data found for {full_symbol}")
+                continue
+
+            price = float(closes.iloc[-1])
+            # Basic Validation: Price must be positive
+            if price <= 0:
+                print(f"Error: Invalid price {price} for {full_symbol}")
+                continue
+            prices[symbol] = price
+        return prices
+
+    def fetch_index(self):
+        try:
+            data = yf.Ticker(self.index_symbol).history(period="1d")
+        except Exception as e:
+            raise ProviderError(f"index {self.index_symbol} failed: {e}") from e
+        if data.empty:
+            # The last session's bar is served even while the market is closed
+            raise ProviderError(f"index {self.index_symbol} returned no data")
+        latest = data.iloc[-1]
+        return {
+            "index": latest['Close'],
+            "change": latest['Close'] - latest['Open'] # Approx
+        }
+
+    def fetch_history(self, symbol, start=None, period="2y"):
+        full_symbol = f"{symbol}{self.market_suffix}"
+        try:
+            ticker = yf.Ticker(full_symbol)
+            if start is None:
+                data = ticker.history(period=period, interval="1d")
+            else:
+                since = pd.Timestamp(start, unit="s").strftime("%Y-%m-%d")
+                data = ticker.history(start=since, interval="1d")
+        except Exception as e:
+            raise ProviderError(f"history for {full_symbol} failed: {e}") from e
+
+        if data.empty:
+            if start is None:
+                raise ProviderError(f"history for {full_symbol} returned no data")
+            return None  # No session completed since start
+        # Today's bar is still forming, only completed sessions are stored
+        today = pd.Timestamp.now(tz=data.index.tz).normalize()
+        data = data[data.index < today]
+        bars = frame_to_bars(data.reset_index())
+        if bars is None or start is None:
+            return bars
+        keep = bars["timestamp"] > start
+        return {field: values[keep] for field, values in bars.items()}
+
+
+class FileReplayProvider(PriceProvider):
+    """
+    Replays recorded OHLCV bars from local files on a simulated clock.
+
+    The directory holds one file per symbol, named <symbol>.csv or <symbol>.parquet,
+    with a timestamp/date column plus open, high, low, close, volume.
+    The index is read from <index_symbol>.csv/.parquet when present.
+
+    The clock starts at the first recorded bar and advances by exactly one tick
+    per sleep() call, so a run is deterministic. speed compresses wall time:
+    speed=100 sleeps 1/100 of each tick, speed=0 does not sleep at all.
+    """
+    name = "replay"
+    respects_market_hours = False
+
+    def __init__(self, path, speed=1.0, index_symbol="TASI", start=None):
+        self.path = path
+        self.speed = speed
+        self.index_symbol = index_symbol
+        self.bars = {}  # symbol -> {"timestamp": ndarray, "open": ndarray, ...}
+        self._load()
+
+        starts = [b["timestamp"][0] for b in self.bars.values() if len(b["timestamp"])]
+        if start is not None:
+            self.clock = float(start)
+        else:
+            self.clock = float(min(starts)) if starts else time.time()
+
+    def _load(self):
+        if not os.path.isdir(self.path):
+            print(f"Warning: Replay directory {self.path} not found")
+            return
+        for filename in sorted(os.listdir(self.path)):
+            symbol, ext = os.path.splitext(filename)
+            if ext == ".csv":
+                frame = pd.read_csv(os.path.join(self.path, filename))
+            elif ext == ".parquet":
+                frame = pd.read_parquet(os.path.join(self.path, filename))
+            else:
+                continue
+            bars = frame_to_bars(frame)
+            if bars is None:
+                print(f"Warning: Skipping {filename}, no timestamp column")
+                continue
+            self.bars[symbol] = bars
+        print(f"Replay: loaded {len(self.bars)} symbols from {self.path}")
+
+    def _bar_index(self, symbol):
+        bars = self.bars.get(symbol)
+        if bars is None:
+            return None, -1
+        idx = int(np.searchsorted(bars["timestamp"], self.clock, side="right")) - 1
+        return bars, idx
+
+    def fetch_prices(self, symbols):
+        prices = {}
+        for symbol in symbols:
+            bars, idx = self._bar_index(symbol)
+            if idx < 0:
+                continue
+            price = float(bars["close"][idx])
+            if price > 0:
+                prices[symbol] = price
+        return prices
+
+    def fetch_history(self, symbol, start=None):
+        bars, idx = self._bar_index(symbol)
+        # Bars before the one in play at the replay clock are complete
+        if idx <= 0:
+            return None
+        lo = 0
+        if start is not None:
+            lo = int(np.searchsorted(bars["timestamp"], start, side="right"))
+        return {field: values[lo:idx] for field, values in bars.items()}
+
+    def fetch_index(self):
+        bars, idx = self._bar_index(self.index_symbol)
+        if idx < 0:
+            return None
+        close = float(bars["close"][idx])
+        return {"index": close, "change": close - float(bars["open"][idx])}
+
+    def now(self):
+        return self.clock
+
+    def sleep(self, seconds):
+        self.clock += seconds
+        if self.speed:
+            time.sleep(seconds / self.speed)
@@ -0,0 +1,88 @@
+import re
+from functools import lru_cache
+
+POSITIVE_KEYWORDS = [
+    'ارتفاع', 'نمو', 'أرباح', 'إيجابي', 'صعود', 'قوية', 'انتعاش',
+    'صفقة', 'مبادرات', 'استثمار', 'مكاسب', 'توسع', 'قفزة', 'تدشين',
+    'زيادة', 'تجاوز'
+]
+NEGATIVE_KEYWORDS = [
+    'انخفاض', 'خسارة', 'تراجع', 'سلبي', 'هبوط', 'ضعف', 'ضغط',
+    'مخاوف', 'انهيار', 'تعثر', 'ركود', 'أزمة', 'عقوبات'
+]
+
+
+def trie_pattern(words):
+    """
+    Regex alternation of words factored by common prefix (a trie), so the
+    engine follows one branch per character instead of trying every word.
+    Longer words win over their prefixes.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class SentimentMatcher:
+    """
+    Keyword sentiment scoring in one pass over the text.
+
+    All keywords are compiled at startup into one trie-shaped regex wrapped in
+    a lookahead, so a single scan tries every start position and reports the
+    longest keyword there, overlapping matches included, whatever the size of
+    the vocabulary. Keywords contained in the one found at a position (its
+    prefixes) are added from a precomputed table. As before, each keyword
+    counts once per text (+1 positive, -1 negative) when it occurs anywhere
+    in it. score_batch() scores many titles at once through an LRU
+    cache, so headlines repeated across polls and sources are scored once.
+    """
+
+    def __init__(self, positive=POSITIVE_KEYWORDS, negative=NEGATIVE_KEYWORDS, cache_size=4096):
+        self.weights = {}
+        for word in positive:
+            self.weights[word] = self.weights.get(word, 0) + 1
+        for word in negative:
+            self.weights[word] = self.weights.get(word, 0) - 1
+        # Zero-width, so matches may overlap: findall returns the longest keyword at each position
+        self._pattern = re.compile(f"(?=({trie_pattern(self.weights)}))")
+        # Keywords that contain other keywords (the scan reports only the longest match per position)
+        self._contained = {}
+        for word in self.weights:
+            inner = [other for other in self.weights if other != word and other in word]
+            if inner:
+                self._contained[word] = inner
+        self._cached_score = lru_cache(maxsize=cache_size)(self._score)
+
+    def _score(self, text):
+        found = set(self._pattern.findall(text))
+        if self._contained:
+            for word in list(found):
+                found.update(self._contained.get(word, ()))
+        return sum(map(self.weights.__getitem__, found))
+
+    def score(self, text):
+        return self._cached_score(text)
+
+    def score_batch(self, texts):
+        return [self._cached_score(text) for text in texts]
+
+    @staticmethod
+    def label(score):
+        if score > 0:
+            return "Positive"
+        elif score < 0:
+            return "Negative"
+        else:
+            return "Neutral"
@@ -0,0 +1,234 @@
+import datetime
+import json
+import os
+import threading
+import time
+from collections import deque
+from trade_record import TradeRecord, json_default
+
+
+class StateStore:
+    """
+    Crash-safe persistence for PortfolioManager and ChallengeEngine state.
+
+    Every state change is appended to a write-ahead log (wal.jsonl, one JSON
+    event per line with a sequence number) before the caller moves on:
+    "trade" (an executed trade record, with the mark of its symbol), "mark"
+    (a price change revaluing the portfolios holding the symbol), "value" (a
+    portfolio's new total value, also written after every trade), "reset"
+    (portfolio emptied with new cash) and "week" (a challenge week started).
+    Replay re-applies marks before trades, so positions are valued at the same
+    prices as before the crash. Every snapshot_every events, or snapshot_interval seconds, the
+    whole state is written to snapshot.json (atomic replace) and the WAL is
+    started afresh, so recovery loads one compact file and replays a short tail.
+    """
+
+    def __init__(self, root, snapshot_every=1000, snapshot_interval=300.0, sync=False):
+        self.root = root
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.sync = sync  # fsync each WAL write (survives power loss, not just process crashes)
+        self.snapshot_path = os.path.join(root, "snapshot.json")
+        self.wal_path = os.path.join(root, "wal.jsonl")
+        self.pm = None
+        self.challenge = None
+        self.seq = 0
+        self._since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._wal = None
+        self._replaying = False
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    # --- Writing ---
+
+    def record(self, kind, **data):
+        """
+        Appends one event to the WAL. Events raised while replaying are ignored.
+        """
+        if self._replaying:
+            return
+        with self._lock:
+            self.seq += 1
+            line = json.dumps({"seq": self.seq, "kind": kind, **data}, ensure_ascii=False, default=json_default)
+            if self._wal is None:
+                self._wal = open(self.wal_path, "a", encoding="utf-8")
+            self._wal.write(line + "\n")
+            self._wal.flush()
+            if self.sync:
+                os.fsync(self._wal.fileno())
+            self._since_snapshot += 1
+
+    def maybe_snapshot(self):
+        """
+        Snapshots when enough events or time have accumulated. Call once per tick.
+        """
+        if self._since_snapshot >= self.snapshot_every or (
+                self._since_snapshot and time.monotonic() - self._last_snapshot >= self.snapshot_interval):
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Writes the full state, then truncates the WAL it covers.
+        A crash between the two is harmless: replay skips events up to the snapshot's seq.
+        """
+        with self._lock:
+            data = {"seq": self.seq, "saved_at": time.time(), "portfolios": {}, "challenge": None,
+                    "marks": dict(self.pm.valuation.marks)}
+            for name, portfolio in self.pm.portfolios.items():
+                ledger = self.pm.ledgers[name]
+                data["portfolios"][name] = {
+                    "cash": portfolio["cash"],
+                    "total_value": portfolio["total_value"],
+                    "trade_count": portfolio["trade_count"],
+                    "last_log": portfolio.get("last_log"),
+                    "history": list(portfolio["history"]),
+                    "position_value": self.pm.valuation.value(name),
+                    "next_lot_id": ledger._next_id,
+                    "lots": [{**lot.to_dict(), "trade": lot.trade} for lot in ledger],
+                    "metrics": self.pm.metrics[name].state(),
+                }
+            if self.challenge is not None and self.challenge.is_active:
+                data["challenge"] = {
+                    "week_start": self.challenge.week_start.isoformat(),
+                    "week_end": self.challenge.week_end.isoformat(),
+                }
+
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            if self._wal is not None:
+                self._wal.close()
+            self._wal = open(self.wal_path, "w", encoding="utf-8")
+            self._since_snapshot = 0
+            self._last_snapshot = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    # --- Recovery ---
+
+    def attach(self, pm, challenge=None):
+        """
+        Recovers state into pm/challenge (if any was saved), then journals their changes.
+        Returns True if previous state was restored.
+        """
+        self.pm = pm
+        self.challenge = challenge
+        started = time.monotonic()
+        self._replaying = True
+        try:
+            restored = self._load_snapshot()
+            replayed = self._replay_wal()
+        finally:
+            self._replaying = False
+        pm.journal = self
+        if restored or replayed:
+            print(f"State recovered: snapshot seq {self.seq - replayed}, {replayed} WAL events replayed "
+                  f"in {(time.monotonic() - started) * 1000:.0f}ms")
+            # Fold the replayed tail into a fresh snapshot
+            self.snapshot()
+        return bool(restored or replayed)
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read state snapshot {self.snapshot_path}: {e}")
+            return False
+
+        self.seq = data["seq"]
+        self.pm.valuation.marks.update(data.get("marks", {}))
+        for name, saved in data["portfolios"].items():
+            if name not in self.pm.portfolios:
+                print(f"Warning: Snapshot portfolio {name} no longer exists, skipped")
+                continue
+            self.pm.reset_portfolio(name, saved["cash"])
+            portfolio = self.pm.portfolios[name]
+            portfolio["total_value"] = saved["total_value"]
+            portfolio["trade_count"] = saved["trade_count"]
+            portfolio["last_log"] = saved["last_log"]
+            self.pm.leaderboard.update(name, saved["total_value"], last_log=saved["last_log"])
+            portfolio["history"] = deque((TradeRecord.from_dict(trade) for trade in saved["history"]),
+                                         maxlen=self.pm.recent_trades)
+            ledger = self.pm.ledgers[name]
+            for lot in saved["lots"]:
+                ledger.restore(lot["lot_id"], lot["symbol"], lot["quantity"], lot["entry_quantity"], lot["price"],
+                               lot["target_price"], lot["stop_loss"],
+                               TradeRecord.from_dict(lot["trade"]) if lot.get("trade") else None)
+            ledger._next_id = saved["next_lot_id"]
+            self.pm.sync_positions(name)
+            if "position_value" in saved:
+                # As accumulated before the restart, not recomputed (no float drift between runs)
+                self.pm.valuation.position_value[name] = saved["position_value"]
+            if "metrics" in saved:
+                self.pm.metrics[name].load(saved["metrics"])
+
+        if data.get("challenge") and self.challenge is not None:
+            self._start_week(datetime.datetime.fromisoformat(data["challenge"]["week_start"]),
+                             datetime.datetime.fromisoformat(data["challenge"]["week_end"]))
+        return True
+
+    def _replay_wal(self):
+        if not os.path.exists(self.wal_path):
+            return 0
+        replayed = 0
+        trade_log, self.pm.trade_log = self.pm.trade_log, None  # Trades are already in the trade log
+        try:
+            with open(self.wal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break  # Torn last write of a crash: nothing after it was acknowledged
+                    if event["seq"] <= self.seq:
+                        continue
+                    self._apply(event, trade_log)
+                    self.seq = event["seq"]
+                    replayed += 1
+        finally:
+            self.pm.trade_log = trade_log
+        return replayed
+
+    def _apply(self, event, trade_log):
+        kind = event["kind"]
+        name = event.get("strategy")
+        if name is not None and name not in self.pm.portfolios:
+            return
+        if kind == "trade":
+            trade = event["trade"]
+            fills = trade.get("lots") or []
+            lot_id = fills[0]["lot_id"] if len(fills) == 1 else None
+            if event.get("mark") is not None:
+                self.pm.on_price(trade["symbol"], event["mark"])
+            self.pm.execute_trade(name, trade["action"], trade["symbol"], trade["price"], trade["quantity"],
+                                  trade["reason"], trade["goals"], trade, lot_id=lot_id)
+        elif kind == "mark":
+            self.pm.on_price(event["symbol"], event["price"])
+        elif kind == "value":
+            self.pm.set_value(name, event["value"])
+        elif kind == "reset":
+            self.pm.reset_portfolio(name, event["cash"])
+        elif kind == "week":
+            self._start_week(datetime.datetime.fromisoformat(event["week_start"]),
+                             datetime.datetime.fromisoformat(event["week_end"]), trade_log)
+
+    def _start_week(self, week_start, week_end, trade_log=None):
+        if self.challenge is not None:
+            self.challenge.week_start = week_start
+            self.challenge.week_end = week_end
+            self.challenge.is_active = True
+        trade_log = trade_log or self.pm.trade_log
+        if trade_log:
+            # Same name as before the restart, so appends continue the week's segment
+            trade_log.start_segment(week_start)
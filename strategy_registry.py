@@ -0,0 +1,115 @@
+import json
+import os
+
+
+class StrategySpec:
+    """
+    A registered strategy and the data it reads.
+    func(trader, portfolio) -> decision dict; symbols/indicators/news tell the
+    engine what to prefetch before any strategy runs.
+    params are the tunable thresholds with their defaults; the strategy reads
+    the effective values from trader.params[name].
+    vector(arrays, params) -> signals is the optional whole-history form of the
+    same rule used by the backtester's fast path.
+    """
+
+    def __init__(self, name, func, symbols=(), indicators=(), news=False, params=None):
+        self.name = name
+        self.func = func
+        self.symbols = tuple(symbols)
+        self.indicators = tuple(indicators)
+        self.news = news
+        self.params = dict(params or {})
+        self.vector = None
+
+    def __repr__(self):
+        return f"StrategySpec({self.name!r}, symbols={self.symbols}, indicators={self.indicators}, news={self.news})"
+
+
+# name -> StrategySpec, in registration order
+STRATEGY_REGISTRY = {}
+
+
+def register_strategy(name, symbols=(), indicators=(), news=False, params=None):
+    """
+    Decorator registering a strategy under its display name.
+    Works on AITrader methods and on plain functions taking (trader, portfolio).
+
+        @register_strategy("قناص", symbols=["1010"], indicators=["rsi"], params={"rsi_entry": 30})
+        def mean_reversion_strategy(self, portfolio): ...
+    """
+    def decorator(func):
+        STRATEGY_REGISTRY[name] = StrategySpec(name, func, symbols, indicators, news, params)
+        return func
+    return decorator
+
+
+def register_vector_signals(name):
+    """
+    Decorator attaching the vectorized form of an already registered strategy.
+    The function receives backtester.MarketArrays and the strategy params and returns
+    {"entries": bool (symbols x days), "quantity": int, "target": prices,
+     "stop": prices, "min_cash": float, optional "symbols": order checked}; at most the
+    first flagged symbol is bought per day, as the strategy function does.
+    """
+    def decorator(func):
+        STRATEGY_REGISTRY[name].vector = func
+        return func
+    return decorator
+
+
+def strategy_params(specs, overrides=None):
+    """
+    Effective params per strategy: registered defaults updated with overrides
+    ({name: {param: value}}). Unknown names and params are ignored with a warning.
+    """
+    overrides = overrides or {}
+    params = {}
+    for spec in specs:
+        params[spec.name] = dict(spec.params)
+        for key, value in overrides.get(spec.name, {}).items():
+            if key in spec.params:
+                params[spec.name][key] = value
+            else:
+                print(f"Warning: Strategy {spec.name} has no parameter {key!r}, ignored")
+    for name in overrides:
+        if name not in params:
+            print(f"Warning: Params given for unknown strategy {name!r}, ignored")
+    return params
+
+
+def load_params(path):
+    """
+    Reads tuned params ({name: {param: value}}) written by param_sweep; {} if missing.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read strategy params {path}: {e}")
+        return {}
+
+
+def save_params(path, params):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def data_requirements(specs):
+    """
+    Union of what a set of strategies needs: (symbols, indicator symbols, needs_news).
+    """
+    symbols = set()
+    indicator_symbols = set()
+    news = False
+    for spec in specs:
+        symbols.update(spec.symbols)
+        if spec.indicators:
+            indicator_symbols.update(spec.symbols)
+        news = news or spec.news
+    return symbols, indicator_symbols, news
@@ -0,0 +1,391 @@
+import math
+from collections import deque
+
+# --- Constant-time indicator state ---
+# update() commits a completed bar, peek() returns the value as if the forming
+# bar closed at the given price without changing state. Both are O(1), so the
+# per-tick cost does not depend on the lookback length.
+# state()/load() round-trip the dynamic fields as JSON-friendly values.
+
+
+class StreamingEMA:
+    """
+    Exponentially weighted mean (adjust=False), seeded at the first value.
+    """
+
+    def __init__(self, alpha, min_periods=1):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.mean = None
+        self.count = 0
+
+    @classmethod
+    def from_span(cls, span):
+        return cls(2.0 / (span + 1), min_periods=span)
+
+    @classmethod
+    def wilder(cls, period):
+        return cls(1.0 / period, min_periods=period)
+
+    def _next(self, x):
+        return x if self.mean is None else self.alpha * x + (1 - self.alpha) * self.mean
+
+    def update(self, x):
+        self.mean = self._next(x)
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        return self.mean if self.count >= self.min_periods else None
+
+    def peek(self, x):
+        return self._next(x) if self.count + 1 >= self.min_periods else None
+
+    def state(self):
+        return {"mean": self.mean, "count": self.count}
+
+    def load(self, state):
+        self.mean = state["mean"]
+        self.count = state["count"]
+
+
+def _rsi(avg_gain, avg_loss):
+    if avg_gain is None or avg_loss is None:
+        return None
+    if avg_loss == 0:
+        return 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+class StreamingRSI:
+    """
+    Wilder RSI on closes.
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev = None
+        self.gain = StreamingEMA.wilder(period)
+        self.loss = StreamingEMA.wilder(period)
+
+    def update(self, close):
+        if self.prev is not None:
+            delta = close - self.prev
+            self.gain.update(max(delta, 0.0))
+            self.loss.update(max(-delta, 0.0))
+        self.prev = close
+        return self.value
+
+    @property
+    def value(self):
+        return _rsi(self.gain.value, self.loss.value)
+
+    def peek(self, close):
+        if self.prev is None:
+            return None
+        delta = close - self.prev
+        return _rsi(self.gain.peek(max(delta, 0.0)), self.loss.peek(max(-delta, 0.0)))
+
+    def state(self):
+        return {"prev": self.prev, "gain": self.gain.state(), "loss": self.loss.state()}
+
+    def load(self, state):
+        self.prev = state["prev"]
+        self.gain.load(state["gain"])
+        self.loss.load(state["loss"])
+
+
+class StreamingATR:
+    """
+    Wilder Average True Range on completed bars.
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.ema = StreamingEMA.wilder(period)
+
+    def update(self, high, low, close):
+        true_range = high - low
+        if self.prev_close is not None:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.ema.update(true_range)
+
+    @property
+    def value(self):
+        return self.ema.value
+
+    def state(self):
+        return {"prev_close": self.prev_close, "ema": self.ema.state()}
+
+    def load(self, state):
+        self.prev_close = state["prev_close"]
+        self.ema.load(state["ema"])
+
+
+class RollingMinMax:
+    """
+    Min and max of the last `window` values using monotonic deques.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.n = 0
+        self._min = deque()  # (index, value), values increasing
+        self._max = deque()  # (index, value), values decreasing
+
+    def update(self, x):
+        self.n += 1
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((self.n, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((self.n, x))
+        oldest = self.n - self.window
+        while self._min[0][0] <= oldest:
+            self._min.popleft()
+        while self._max[0][0] <= oldest:
+            self._max.popleft()
+        return self.value
+
+    @property
+    def value(self):
+        if self.n < self.window:
+            return None, None
+        return self._min[0][1], self._max[0][1]
+
+    def _peek_side(self, side):
+        # Extreme of the last window-1 committed values; the front drops out
+        # when x enters, and the next element is the extreme of what remains.
+        oldest = self.n + 1 - self.window
+        for idx, value in side:
+            if idx > oldest:
+                return value
+        return None
+
+    def peek(self, x):
+        if self.n + 1 < self.window:
+            return None, None
+        lo, hi = self._peek_side(self._min), self._peek_side(self._max)
+        return (x if lo is None else min(lo, x)), (x if hi is None else max(hi, x))
+
+    def state(self):
+        return {"n": self.n, "min": list(self._min), "max": list(self._max)}
+
+    def load(self, state):
+        self.n = state["n"]
+        self._min = deque(tuple(e) for e in state["min"])
+        self._max = deque(tuple(e) for e in state["max"])
+
+
+class RollingStdev:
+    """
+    Mean and population standard deviation of the last `window` values,
+    kept as running sums (re-summed periodically to cancel float drift).
+    Missing values (None/NaN, e.g. volume of a replay file without a volume
+    column) are skipped, so they never reach the sums.
+    """
+    RESUM_EVERY = 1000
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._updates = 0
+
+    def update(self, x):
+        if _missing(x):
+            return self.value
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        self._updates += 1
+        if self._updates % self.RESUM_EVERY == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+        return self.value
+
+    @staticmethod
+    def _stats(total, total_sq, n):
+        mean = total / n
+        return mean, math.sqrt(max(total_sq / n - mean * mean, 0.0))
+
+    @property
+    def value(self):
+        """
+        (mean, stdev) once the window is full, else (None, None).
+        """
+        if len(self.values) < self.window:
+            return None, None
+        return self._stats(self.total, self.total_sq, self.window)
+
+    def peek(self, x):
+        if _missing(x):
+            return self.value
+        n = len(self.values)
+        if n + 1 < self.window:
+            return None, None
+        total, total_sq = self.total + x, self.total_sq + x * x
+        if n == self.window:
+            old = self.values[0]
+            total -= old
+            total_sq -= old * old
+        return self._stats(total, total_sq, self.window)
+
+    def state(self):
+        return {"values": list(self.values)}
+
+    def load(self, state):
+        self.values = deque()
+        self.total = self.total_sq = 0.0
+        for x in state["values"]:
+            self.update(x)
+
+
+def _missing(x):
+    return x is None or x != x  # NaN is the only value not equal to itself
+
+
+def _cross(prev_fast, prev_slow, fast, slow):
+    if None in (prev_fast, prev_slow, fast, slow):
+        return 0
+    return int(fast > slow) - int(prev_fast > prev_slow)
+
+
+class SymbolIndicators:
+    """
+    Full streaming indicator set for one symbol.
+    Completed bars are committed with commit(); live prices only ever peek.
+    """
+
+    def __init__(self, fast=10, slow=30, rsi_period=14, atr_period=14,
+                 volume_period=20, spike_ratio=2.0, range_window=20, stdev_window=20):
+        self.spike_ratio = spike_ratio
+        self.ema_fast = StreamingEMA.from_span(fast)
+        self.ema_slow = StreamingEMA.from_span(slow)
+        self.sma_fast = RollingStdev(fast)
+        self.sma_slow = RollingStdev(slow)
+        self.rsi = StreamingRSI(rsi_period)
+        self.atr = StreamingATR(atr_period)
+        self.volume = RollingStdev(volume_period)
+        self.range = RollingMinMax(range_window)
+        self.stdev = RollingStdev(stdev_window)
+        self.bars = 0
+        self.last_ts = None
+        self.last_close = None
+        self.volume_ratio = None
+        self.ema_cross = 0
+        self.sma_cross = 0
+
+    def commit(self, ts, high, low, close, volume):
+        """
+        Adds one completed bar. Bars at or before the last committed timestamp are ignored.
+        """
+        if self.last_ts is not None and ts <= self.last_ts:
+            return False
+        prev_ema = (self.ema_fast.value, self.ema_slow.value)
+        prev_sma = (self.sma_fast.value[0], self.sma_slow.value[0])
+
+        baseline = self.volume.value[0]
+        self.volume_ratio = volume / baseline if baseline and not _missing(volume) else None
+        self.volume.update(volume)
+
+        self.ema_fast.update(close)
+        self.ema_slow.update(close)
+        self.sma_fast.update(close)
+        self.sma_slow.update(close)
+        self.rsi.update(close)
+        self.atr.update(high, low, close)
+        self.range.update(close)
+        self.stdev.update(close)
+
+        self.ema_cross = _cross(*prev_ema, self.ema_fast.value, self.ema_slow.value)
+        self.sma_cross = _cross(*prev_sma, self.sma_fast.value[0], self.sma_slow.value[0])
+        self.bars += 1
+        self.last_ts = ts
+        self.last_close = close
+        return True
+
+    def values(self, price=None):
+        """
+        Indicator values with the forming bar closing at `price` (committed values if None).
+        """
+        if price is None:
+            ema_fast, ema_slow = self.ema_fast.value, self.ema_slow.value
+            sma_fast, sma_slow = self.sma_fast.value[0], self.sma_slow.value[0]
+            rsi = self.rsi.value
+            low, high = self.range.value
+            stdev = self.stdev.value[1]
+            ema_cross, sma_cross = self.ema_cross, self.sma_cross
+            close = self.last_close
+        else:
+            ema_fast, ema_slow = self.ema_fast.peek(price), self.ema_slow.peek(price)
+            sma_fast, sma_slow = self.sma_fast.peek(price)[0], self.sma_slow.peek(price)[0]
+            rsi = self.rsi.peek(price)
+            low, high = self.range.peek(price)
+            stdev = self.stdev.peek(price)[1]
+            ema_cross = _cross(self.ema_fast.value, self.ema_slow.value, ema_fast, ema_slow)
+            sma_cross = _cross(self.sma_fast.value[0], self.sma_slow.value[0], sma_fast, sma_slow)
+            close = price
+
+        atr = self.atr.value
+        trend = None
+        if ema_fast is not None and ema_slow is not None:
+            trend = "up" if ema_fast > ema_slow else "down"
+        return {
+            "bars": self.bars + (1 if price is not None else 0),
+            "close": _round(close),
+            "rsi": _round(rsi),
+            "ema_fast": _round(ema_fast),
+            "ema_slow": _round(ema_slow),
+            "sma_fast": _round(sma_fast),
+            "sma_slow": _round(sma_slow),
+            "ema_cross": ema_cross,
+            "sma_cross": sma_cross,
+            "trend": trend,
+            "atr": _round(atr),
+            "atr_pct": _round(atr / close * 100) if atr is not None and close else None,
+            "volume_ratio": _round(self.volume_ratio),
+            "volume_spike": self.volume_ratio is not None and self.volume_ratio >= self.spike_ratio,
+            "range_low": _round(low),
+            "range_high": _round(high),
+            "stdev": _round(stdev),
+            "price": price,
+        }
+
+    def state(self):
+        return {
+            "ema_fast": self.ema_fast.state(),
+            "ema_slow": self.ema_slow.state(),
+            "sma_fast": self.sma_fast.state(),
+            "sma_slow": self.sma_slow.state(),
+            "rsi": self.rsi.state(),
+            "atr": self.atr.state(),
+            "volume": self.volume.state(),
+            "range": self.range.state(),
+            "stdev": self.stdev.state(),
+            "bars": self.bars,
+            "last_ts": self.last_ts,
+            "last_close": self.last_close,
+            "volume_ratio": self.volume_ratio,
+            "ema_cross": self.ema_cross,
+            "sma_cross": self.sma_cross,
+        }
+
+    def load(self, state):
+        for name in ("ema_fast", "ema_slow", "sma_fast", "sma_slow", "rsi", "atr", "volume", "range", "stdev"):
+            getattr(self, name).load(state[name])
+        for name in ("bars", "last_ts", "last_close", "volume_ratio", "ema_cross", "sma_cross"):
+            setattr(self, name, state[name])
+
+
+def _round(value):
+    return None if value is None else round(value, 4)
@@ -0,0 +1,116 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_trader import AITrader
+from news_entities import EntityIndex
+from portfolio_manager import PortfolioManager
+from strategy_registry import STRATEGY_REGISTRY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeMarket:
+    """
+    Snapshot-only market: get_current_price fails the test if a strategy calls it.
+    """
+
+    def __init__(self, prices):
+        self.prices = prices
+
+    def track(self, symbols):
+        pass
+
+    def refresh_snapshot(self, force=False):
+        return self.prices
+
+    def snapshot_prices(self):
+        return dict(self.prices)
+
+    def get_current_price(self, symbol):
+        raise AssertionError("strategies must read the batch snapshot only")
+
+
+class FakeIndicators:
+    def update(self, symbols=None):
+        pass
+
+    def get(self, symbol):
+        return None
+
+
+class FakeNews:
+    def __init__(self, entities=None):
+        self.entities = entities or EntityIndex()
+
+
+def make_trader(prices, entities=None):
+    return AITrader(FakeMarket(prices), FakeNews(entities), indicator_engine=FakeIndicators())
+
+
+def test_price_reads_the_prefetched_snapshot_only():
+    trader = make_trader({"1120": 80.0})
+    trader.prefetch(["رزين"])
+    assert trader.price("1120") == 80.0
+    assert trader.price("2222") is None
+
+
+def _entities_with_news(*titles):
+    entities = EntityIndex.from_file(os.path.join(ROOT, "data", "tadawul_symbols.json"))
+    for title in titles:
+        entities.add(entities.tag({"title": title, "score": 1, "published_at": time.time()}))
+    return entities
+
+
+def test_news_strategies_trade_on_entity_sentiment():
+    entities = _entities_with_news("ارتفاع أرباح أرامكو", "نمو قوي لأرامكو", "أرامكو تعلن توسع جديد")
+    trader = make_trader({"1120": 80.0, "2222": 28.0, "1010": 30.0, "1180": 35.0}, entities)
+    portfolios = PortfolioManager().portfolios
+
+    decisions = trader.evaluate_all(portfolios)
+
+    assert set(decisions) == set(STRATEGY_REGISTRY)
+    assert decisions["عواطف"]["action"] == "BUY"
+    assert decisions["عواطف"]["symbol"] == "2222"
+    assert decisions["جوال"]["action"] == "BUY"
+    assert decisions["جوال"]["symbol"] == "2222"
+
+
+def test_news_strategies_hold_without_news():
+    trader = make_trader({"1120": 80.0, "2222": 28.0}, _entities_with_news())
+    decisions = trader.evaluate_all(PortfolioManager().portfolios)
+    assert decisions["عواطف"]["action"] == "HOLD"
+    assert decisions["جوال"]["action"] == "HOLD"
+
+
+def _sleeper(seconds):
+    def decide(portfolio):
+        time.sleep(seconds)
+        return {"action": "HOLD", "reason": f"slept {seconds}s", "goals": None}
+    return decide
+
+
+def test_each_strategy_gets_its_own_time_budget():
+    trader = make_trader({"1120": 80.0})
+    trader.time_budget = 0.5
+    # One worker: the second strategy starts only when the first is done, past a shared 0.5s deadline
+    trader._pool = ThreadPoolExecutor(max_workers=1)
+    trader.strategies = {"رزين": _sleeper(0.3), "قناص": _sleeper(0.3)}
+    portfolios = {"رزين": {"cash": 0}, "قناص": {"cash": 0}}
+
+    decisions = trader.evaluate_all(portfolios)
+
+    assert set(decisions) == {"رزين", "قناص"}
+
+
+def test_strategy_over_its_budget_is_skipped():
+    trader = make_trader({"1120": 80.0})
+    trader.time_budget = 0.2
+    trader.strategies = {"رزين": _sleeper(0.5), "قناص": _sleeper(0.0)}
+    portfolios = {"رزين": {"cash": 0}, "قناص": {"cash": 0}}
+
+    decisions = trader.evaluate_all(portfolios)
+
+    assert set(decisions) == {"قناص"}
+    # Still running, so not resubmitted on the next tick
+    assert set(trader.evaluate_all(portfolios)) == {"قناص"}
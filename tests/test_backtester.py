@@ -0,0 +1,47 @@
+import numpy as np
+
+from audit_metrics import AuditMetrics
+from backtester import Backtester, summarize
+from bar_store import BarStore
+
+
+def test_drawdown_is_a_positive_magnitude_like_the_audit_report():
+    equity = np.array([100000.0, 104000.0, 93600.0, 98000.0, 106000.0])
+    summary = summarize("قناص", equity, 100000.0, trades=2)
+
+    metrics = AuditMetrics()
+    metrics.reset(100000.0)
+    for value in equity:
+        metrics.on_value(value)
+
+    assert summary["max_drawdown_pct"] == 10.0
+    assert summary["max_drawdown_pct"] == metrics.report()["max_drawdown_pct"]
+
+
+DETERMINISTIC = ["رزين", "قناص", "موج", "مقتحم"]
+
+
+def _store(tmp_path, days=300, seed=4):
+    rng = np.random.default_rng(seed)
+    store = BarStore(str(tmp_path))
+    timestamps = 1_600_000_000 + 86400 * np.arange(days, dtype=np.int64)
+    for symbol in ["1120", "2222", "1010", "1180", "2010", "7010", "2280"]:
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, days)))
+        volume = rng.uniform(1e5, 5e5, days)
+        volume[rng.choice(days, 25, replace=False)] *= 5
+        store.append(symbol, {"timestamp": timestamps, "open": close * (1 + rng.normal(0, 0.005, days)),
+                              "high": close * 1.01, "low": close * 0.99, "close": close, "volume": volume})
+    return store
+
+
+def test_event_replay_and_vectorized_fast_path_agree(tmp_path):
+    backtester = Backtester(_store(tmp_path))
+    arrays = backtester.load()
+    replay = backtester.run(DETERMINISTIC, arrays=arrays)
+    vectorized = backtester.run_vectorized(DETERMINISTIC, arrays=arrays)
+
+    assert all(replay[name]["trades"] for name in DETERMINISTIC)
+    for name in DETERMINISTIC:
+        for key in ("final_value", "return_pct", "max_drawdown_pct", "trades", "win_rate"):
+            assert replay[name][key] == vectorized[name][key], (name, key)
+        np.testing.assert_allclose(replay[name]["equity"], vectorized[name]["equity"], rtol=1e-9)
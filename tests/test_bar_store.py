@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+
+from bar_store import BarStore
+
+DAY = 86400
+
+
+def _bars(days, close=None):
+    ts = np.array([1_700_000_000 + d * DAY for d in days], dtype=np.int64)
+    close = np.asarray(close if close is not None else [100.0 + d for d in days])
+    return {"timestamp": ts, "open": close - 1, "high": close + 1, "low": close - 2, "close": close,
+            "volume": np.full(len(days), 1000.0)}
+
+
+def test_appends_only_newer_bars_in_order(tmp_path):
+    store = BarStore(str(tmp_path))
+    assert store.append("2222", _bars([2, 0, 1])) == 3
+    # Already stored, duplicated and newer bars mixed together
+    assert store.append("2222", _bars([1, 3, 3, 2, 4])) == 2
+
+    bars = store.read("2222")
+    assert list(bars["timestamp"]) == [1_700_000_000 + d * DAY for d in range(5)]
+    assert list(bars["close"]) == [100.0, 101.0, 102.0, 103.0, 104.0]
+    assert store.last_timestamp("2222") == 1_700_000_000 + 4 * DAY
+    assert store.last_timestamp("1120") is None
+
+
+def test_reads_are_memory_mapped_slices(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append("2222", _bars(range(10)))
+
+    bars = store.read("2222", start=1_700_000_000 + 2 * DAY, end=1_700_000_000 + 7 * DAY, last=3)
+    assert list(bars["close"]) == [105.0, 106.0, 107.0]
+    assert isinstance(bars["close"].base, np.memmap) or isinstance(bars["close"], np.memmap)
+
+
+def test_history_persists_and_torn_appends_are_trimmed(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append("2222", _bars(range(4)))
+    # A crash mid-append left one column a bar longer than the others
+    with open(os.path.join(str(tmp_path), "2222", "close.bin"), "ab") as f:
+        f.write(np.array([999.0]).tobytes())
+
+    reopened = BarStore(str(tmp_path))
+    assert reopened.symbols() == ["2222"]
+    assert reopened.count("2222") == 4
+    assert list(reopened.read("2222")["close"]) == [100.0, 101.0, 102.0, 103.0]
+    assert reopened.append("2222", _bars([4])) == 1
+    assert reopened.count("2222") == 5
+
+
+def test_missing_fields_are_stored_as_nan(tmp_path):
+    store = BarStore(str(tmp_path))
+    bars = _bars([0, 1])
+    del bars["volume"]
+    store.append("2222", bars)
+    assert np.isnan(store.read("2222")["volume"]).all()
@@ -0,0 +1,56 @@
+from leaderboard import Leaderboard
+
+
+def _board(**values):
+    board = Leaderboard(base_value=100000.0)
+    for name, value in values.items():
+        board.update(name, value, last_log="...")
+    return board
+
+
+def _names(ranking):
+    return [entry["name"] for entry in ranking]
+
+
+def test_ranking_is_best_value_first():
+    ranking = _board(a=100500.0, b=99000.0, c=101000.0).ranking()
+
+    assert _names(ranking) == ["c", "a", "b"]
+    assert [entry["rank"] for entry in ranking] == [1, 2, 3]
+    assert ranking[0]["return"] == 1.0
+
+
+def test_value_change_reranks_and_records_moves():
+    board = _board(a=100500.0, b=99000.0, c=101000.0)
+    board.ranking()
+
+    board.update("b", 102000.0)
+    ranking = board.ranking()
+
+    assert _names(ranking) == ["b", "c", "a"]
+    assert [entry["rank_change"] for entry in ranking] == [2, -1, -1]
+    # A later change that does not move b keeps its last move
+    board.update("b", 103000.0)
+    assert board.ranking()[0]["rank_change"] == 2
+
+
+def test_ranking_is_cached_until_something_changes():
+    board = _board(a=100500.0, b=99000.0)
+    first = board.ranking()
+
+    board.update("a", 100500.0, last_log="...")
+    assert board.ranking() is first
+
+    board.update("b", last_log="شراء 2222")
+    second = board.ranking()
+    assert second is not first
+    assert second[0] is first[0]
+    assert second[1]["last_log"] == "شراء 2222"
+    assert first[1]["last_log"] == "..."
+
+
+def test_tied_values_keep_a_stable_order():
+    board = _board(b=100000.0, a=100000.0)
+    assert _names(board.ranking()) == ["a", "b"]
+    board.update("a", 100000.0)
+    assert _names(board.ranking()) == ["a", "b"]
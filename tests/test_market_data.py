@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import price_providers
+from market_data import CircuitBreaker, MarketDataService
+from price_providers import YFinanceProvider
+
+
+def _offline_download(tickers, *args, **kwargs):
+    """
+    What yfinance does without network: logs the failed downloads, raises nothing,
+    and returns an empty frame with the requested tickers' columns.
+    """
+    print(f"{len(tickers)} Failed downloads: {tickers}: DNSError('Could not resolve host: query2.finance.yahoo.com')")
+    columns = pd.MultiIndex.from_product([tickers, ["Open", "High", "Low", "Close", "Volume", "Adj Close"]],
+                                         names=["Ticker", "Price"])
+    return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name="Date"))
+
+
+def _partial_download(tickers, *args, **kwargs):
+    """
+    One ticker has a bar, the others failed (no data for them in the frame).
+    """
+    columns = pd.MultiIndex.from_product([tickers, ["Open", "Close"]], names=["Ticker", "Price"])
+    data = pd.DataFrame(np.nan, columns=columns, index=pd.DatetimeIndex(["2025-04-03"], name="Date"))
+    data[(tickers[0], "Close")] = 28.0
+    return data
+
+
+def test_offline_downloads_trip_the_breaker_without_backing_off(monkeypatch):
+    monkeypatch.setattr(price_providers.yf, "download", _offline_download)
+    market = MarketDataService(YFinanceProvider(), cache_ttl=0, breaker=CircuitBreaker(min_calls=2))
+    market.track(["2222", "1120"])
+    for _ in range(2):
+        market.refresh_snapshot(force=True)
+
+    assert market.fetcher.breaker.state == "open"
+    assert market.backoff.blocked() == []
+
+
+def test_symbols_missing_from_a_download_are_backed_off(monkeypatch):
+    monkeypatch.setattr(price_providers.yf, "download", _partial_download)
+    market = MarketDataService(YFinanceProvider(), cache_ttl=0)
+    market.track(["1120", "2222"])
+    market.refresh_snapshot(force=True)
+
+    assert market.fetcher.breaker.state == "closed"
+    assert market.get_cached_price("1120") == 28.0
+    assert market.backoff.blocked() == ["2222"]
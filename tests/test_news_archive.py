@@ -0,0 +1,48 @@
+from news_archive import NewsArchive
+
+
+def _item(title, published_at):
+    return {"title": title, "published_at": published_at}
+
+
+def test_full_ring_evicts_the_oldest_item():
+    archive = NewsArchive(capacity=3)
+    for n in range(1, 6):
+        archive.add(_item(f"headline {n}", 1000 + n))
+
+    assert len(archive) == 3
+    assert [item["id"] for item in archive.latest()] == [5, 4, 3]
+    assert not archive.contains("headline 2")
+    # An evicted title can be archived again, under a new id
+    assert archive.add(_item("headline 2", 1010))["id"] == 6
+    assert [item["published_at"] for item in archive.between()] == [1010, 1005, 1004]
+
+
+def test_duplicate_titles_are_rejected_across_the_window():
+    archive = NewsArchive(capacity=10)
+    archive.add(_item("ارتفاع  أرباح أرامكو", 1000))
+    for n in range(5):
+        archive.add(_item(f"headline {n}", 1001 + n))
+
+    assert archive.add(_item("ارتفاع أرباح أرامكو ", 2000)) is None
+    assert len(archive) == 6
+
+
+def test_latest_pages_back_by_id():
+    archive = NewsArchive(capacity=10)
+    for n in range(1, 8):
+        archive.add(_item(f"headline {n}", 1000 + n))
+
+    first = archive.latest(limit=3)
+    assert [item["id"] for item in first] == [7, 6, 5]
+    assert [item["id"] for item in archive.latest(limit=3, before_id=first[-1]["id"])] == [4, 3, 2]
+
+
+def test_between_queries_by_publication_time():
+    archive = NewsArchive(capacity=10)
+    # Ingested out of publication order
+    for title, published_at in [("a", 1030), ("b", 1010), ("c", 1020), ("d", 1040)]:
+        archive.add(_item(title, published_at))
+
+    assert [item["title"] for item in archive.between(1010, 1040)] == ["a", "c", "b"]
+    assert [item["title"] for item in archive.between(start=1015, limit=2)] == ["d", "a"]
@@ -0,0 +1,68 @@
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate
+
+from news_engine import NewsEngine
+
+ATOM_FEED = """<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>Tadawul News</title>
+  <entry>
+    <id>urn:news:1</id>
+    <title>ارتفاع أرباح أرامكو</title>
+    <link href="https://example.com/1"/>
+    <updated>2025-03-31T10:00:00Z</updated>
+  </entry>
+</feed>""".encode("utf-8")
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, content=ATOM_FEED):
+        self.content = content
+
+    def get(self, url, headers=None, timeout=None):
+        return FakeResponse(self.content)
+
+
+def rss_feed(*items):
+    """
+    RSS 2.0 document with (guid, title, published epoch seconds) items, newest first.
+    """
+    entries = "".join(f"<item><guid>{guid}</guid><title>{title}</title><pubDate>{formatdate(published)}</pubDate></item>"
+                      for guid, title, published in items)
+    return f"<rss><channel><title>Argaam</title>{entries}</channel></rss>".encode("utf-8")
+
+
+def test_atom_utc_timestamps_are_parsed():
+    published = NewsEngine._parse_time("2025-03-31T10:00:00Z", atom=True)
+    assert published == datetime(2025, 3, 31, 10, 0, tzinfo=timezone.utc).timestamp()
+
+
+def test_poll_keeps_atom_updated_time():
+    engine = NewsEngine(["https://example.com/feed"], session=FakeSession())
+    items = engine.poll()
+    assert len(items) == 1
+    assert items[0]["published_at"] == datetime(2025, 3, 31, 10, 0, tzinfo=timezone.utc).timestamp()
+    assert items[0]["source"] == "Tadawul News"
+
+
+def test_latest_serves_news_within_the_recent_window():
+    now = time.time()
+    feed = rss_feed(("2", "نمو أرباح سابك", now - 60), ("1", "تراجع أسهم البنوك", now - 7200))
+    engine = NewsEngine(["https://example.com/rss"], session=FakeSession(feed), recent_window=3600)
+    engine.poll()
+
+    assert [item["title"] for item in engine.latest()] == ["نمو أرباح سابك"]
+    assert [item["title"] for item in engine.latest(max_age=3 * 3600)] == ["نمو أرباح سابك", "تراجع أسهم البنوك"]
+    assert len(engine.latest(max_age=3 * 3600, limit=1)) == 1
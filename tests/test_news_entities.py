@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from news_entities import EntityIndex
+
+SYMBOLS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tadawul_symbols.json")
+
+
+def test_headlines_map_to_symbols_and_their_sectors():
+    entities = EntityIndex.from_file(SYMBOLS)
+    assert entities.match("ارتفاع أرباح بنك الرياض") == (["1010"], ["البنوك"])
+    assert entities.match("نمو قوي لأرامكو مع صعود النفط") == (["2222"], ["الطاقة"])
+    assert entities.match("تراجع قطاع البتروكيماويات") == ([], ["المواد الأساسية"])
+    assert entities.match("طقس معتدل") == ([], [])
+
+
+def test_snapshot_decays_scores_by_half_life():
+    entities = EntityIndex.from_file(SYMBOLS, half_life=3600.0)
+    entities.add(entities.tag({"title": "ارتفاع أرباح أرامكو", "score": 1, "published_at": 1000.0}))
+    entities.add(entities.tag({"title": "أرامكو تعلن توسع", "score": 1, "published_at": 4600.0}))
+
+    scores = entities.snapshot(at=4600.0)
+    assert scores["symbols"]["2222"] == pytest.approx((1.5, 1.5))
+    assert scores["sectors"]["الطاقة"] == pytest.approx((1.5, 1.5))
+    assert entities.snapshot(at=8200.0)["symbols"]["2222"] == pytest.approx((0.75, 0.75))
+
+
+def test_late_headlines_count_already_decayed():
+    entities = EntityIndex.from_file(SYMBOLS, half_life=3600.0)
+    entities.add(entities.tag({"title": "خسارة سابك", "score": -1, "published_at": 4600.0}))
+    entities.add(entities.tag({"title": "أرباح سابك", "score": 1, "published_at": 1000.0}))
+
+    assert entities.snapshot(at=4600.0)["symbols"]["2010"] == pytest.approx((-0.5, 1.5))
@@ -0,0 +1,32 @@
+import pytest
+
+from param_sweep import ParameterSweep, rank
+
+
+def _result(params, return_pct, win_rate, max_drawdown_pct=1.0):
+    return {"strategy": "قناص", "params": params, "return_pct": return_pct, "max_drawdown_pct": max_drawdown_pct,
+            "trades": 1, "win_rate": win_rate}
+
+
+def test_rank_puts_missing_metric_last():
+    results = [_result({"rsi_entry": 25}, 1.0, None), _result({"rsi_entry": 30}, 0.5, 40.0),
+               _result({"rsi_entry": 35}, 0.2, 60.0)]
+    ranked = rank(results, metric="win_rate")
+    assert [r["params"]["rsi_entry"] for r in ranked] == [35, 30, 25]
+
+
+def test_rank_averages_win_rate_over_seeds_that_have_one():
+    ranked = rank([_result({"rsi_entry": 30}, 1.0, None), _result({"rsi_entry": 30}, 1.0, 50.0)])
+    assert ranked[0]["win_rate"] == 50.0
+
+
+def test_rank_puts_the_smallest_drawdown_first():
+    results = [_result({"rsi_entry": 25}, 1.0, None, 8.0), _result({"rsi_entry": 30}, 0.5, None, 2.5),
+               _result({"rsi_entry": 35}, 0.2, None, 4.0)]
+    ranked = rank(results, metric="max_drawdown_pct")
+    assert [r["params"]["rsi_entry"] for r in ranked] == [30, 35, 25]
+
+
+def test_sweep_rejects_unknown_params():
+    with pytest.raises(ValueError, match="rsi_entyr"):
+        ParameterSweep(backtester=None).run("قناص", [{"rsi_entyr": 25}])
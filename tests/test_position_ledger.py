@@ -0,0 +1,113 @@
+import pytest
+
+from portfolio_manager import PortfolioManager
+from position_ledger import LotLedger
+
+
+def test_partial_sells_close_lots_oldest_first():
+    ledger = LotLedger()
+    first = ledger.open("2222", 100, 28.0)
+    second = ledger.open("2222", 50, 30.0)
+
+    fills = ledger.close("2222", 120)
+
+    assert [(lot.id, taken) for lot, taken in fills] == [(first.id, 100), (second.id, 20)]
+    assert [lot.id for lot in ledger] == [second.id]
+    assert second.quantity == 30 and second.entry_quantity == 50
+    assert ledger.quantities == {"2222": 30}
+    assert first.id not in ledger.by_id
+
+
+def test_sell_by_lot_id_leaves_older_lots_open():
+    ledger = LotLedger()
+    first = ledger.open("2222", 100, 28.0)
+    second = ledger.open("2222", 50, 30.0)
+
+    ledger.close("2222", 50, lot_id=second.id)
+
+    assert [lot.id for lot in ledger] == [first.id]
+    assert ledger.quantity("2222") == 100
+
+
+def test_selling_more_than_held_changes_nothing():
+    ledger = LotLedger()
+    lot = ledger.open("2222", 10, 28.0)
+    with pytest.raises(ValueError):
+        ledger.close("2222", 11)
+    with pytest.raises(ValueError):
+        ledger.close("2222", 11, lot_id=lot.id)
+    assert ledger.quantity("2222") == 10 and lot.quantity == 10
+
+
+def test_portfolio_sell_books_fifo_pnl_per_lot():
+    pm = PortfolioManager(strategy_names=["قناص"])
+    pm.execute_trade("قناص", "BUY", "1010", 30.0, 100, "entry", None)
+    pm.execute_trade("قناص", "BUY", "1010", 32.0, 100, "add", None)
+
+    ok, _ = pm.execute_trade("قناص", "SELL", "1010", 31.0, 150, "trim", None)
+
+    assert ok
+    sell = pm.portfolios["قناص"]["history"][-1]
+    assert sell.pnl == pytest.approx(100 * 1.0 + 50 * -1.0)
+    assert pm.portfolios["قناص"]["holdings"] == {"1010": 50}
+    assert pm.metrics["قناص"].closed == 2 and pm.metrics["قناص"].wins == 1
+    assert pm.execute_trade("قناص", "SELL", "1010", 31.0, 51, "too much", None)[0] is False
+
+
+def _goals(target, stop):
+    return {"target_price": target, "stop_loss": stop}
+
+
+def test_only_crossed_levels_fire_and_are_consumed():
+    ledger = LotLedger()
+    low = ledger.open("2222", 10, 28.0, _goals(29.0, 27.0))
+    high = ledger.open("2222", 10, 30.0, _goals(33.0, 29.5))
+
+    assert ledger.crossed("2222", 28.5) == [(high, "Stop Loss Hit")]
+    fired = ledger.crossed("2222", 29.2)
+    assert [(lot.id, reason) for lot, reason in fired] == [(low.id, "Target Reached")]
+    # Consumed: the same price does not fire them again
+    assert ledger.crossed("2222", 29.2) == []
+
+
+def test_target_wins_when_both_levels_are_crossed():
+    ledger = LotLedger()
+    lot = ledger.open("2222", 10, 28.0, _goals(28.0, 28.0))
+    assert [(fired.id, reason) for fired, reason in ledger.crossed("2222", 28.0)] == [(lot.id, "Target Reached")]
+
+
+def test_lots_closed_by_fifo_sells_never_fire():
+    ledger = LotLedger()
+    sold = ledger.open("2222", 10, 28.0, _goals(29.0, 27.0))
+    kept = ledger.open("2222", 10, 28.0, _goals(29.0, 27.0))
+    ledger.close("2222", 10)
+
+    assert [lot.id for lot, _ in ledger.crossed("2222", 30.0)] == [kept.id]
+    assert sold.id not in ledger.by_id
+
+
+def test_stale_levels_are_compacted():
+    ledger = LotLedger()
+    keep = ledger.open("2222", 1, 28.0, _goals(40.0, 20.0))
+    for _ in range(100):
+        ledger.open("2222", 1, 28.0, _goals(40.0, 20.0))
+        ledger.close("2222", 1, lot_id=ledger._next_id - 1)
+
+    limit = 2 * len(ledger) + ledger.triggers.COMPACT_MIN
+    assert len(ledger.triggers.targets["2222"]) <= limit
+    assert len(ledger.triggers.stops["2222"]) <= limit
+    # Nothing left open: the symbol's heaps are dropped
+    ledger.close("2222", 1, lot_id=keep.id)
+    assert "2222" not in ledger.triggers.targets and "2222" not in ledger.triggers.stops
+
+
+def test_check_exits_sells_each_crossed_lot():
+    pm = PortfolioManager(strategy_names=["رزين"])
+    pm.execute_trade("رزين", "BUY", "1120", 80.0, 10, "entry", _goals(84.0, 78.4))
+    pm.execute_trade("رزين", "BUY", "1120", 82.0, 10, "add", _goals(86.1, 80.4))
+
+    exits = pm.check_exits("رزين", {"1120": 84.5}.get)
+
+    assert exits == [("1120", "Target Reached")]
+    assert pm.portfolios["رزين"]["holdings"] == {"1120": 10}
+    assert [lot["price"] for lot in pm.open_lots("رزين")] == [82.0]
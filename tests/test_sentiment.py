@@ -0,0 +1,38 @@
+import itertools
+import random
+
+from sentiment import NEGATIVE_KEYWORDS, POSITIVE_KEYWORDS, SentimentMatcher
+
+
+def baseline_score(text, positive=POSITIVE_KEYWORDS, negative=NEGATIVE_KEYWORDS):
+    """
+    The scorer SentimentMatcher replaced: one substring test per keyword.
+    """
+    return sum(1 for word in positive if word in text) - sum(1 for word in negative if word in text)
+
+
+def test_overlapping_keywords_match_the_baseline():
+    matcher = SentimentMatcher()
+    keywords = POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS
+    texts = []
+    for a, b in itertools.permutations(keywords, 2):
+        # b starting inside a, wherever a's suffix is b's prefix (and plain concatenation)
+        texts.extend(a + b[k:] for k in range(min(len(a), len(b)) + 1) if a.endswith(b[:k]))
+    assert texts
+    for text in texts:
+        assert matcher.score(text) == baseline_score(text), text
+
+
+def test_random_headlines_match_the_baseline():
+    matcher = SentimentMatcher()
+    rng = random.Random(7)
+    vocabulary = POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS + ["أرامكو", "السوق", "في", "ال", "ت", "ا", " "]
+    texts = ["".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 8))) for _ in range(2000)]
+    assert matcher.score_batch(texts) == [baseline_score(text) for text in texts]
+
+
+def test_custom_vocabulary_with_nested_and_shared_words():
+    positive, negative = ["ربح", "أرباح", "ارتفاع"], ["ارتفاع التكاليف", "تكاليف", "ربح"]
+    matcher = SentimentMatcher(positive, negative)
+    for text in ["ارتفاع التكاليف", "أرباحربح", "ارتفاعارتفاع التكاليف", "ربح"]:
+        assert matcher.score(text) == baseline_score(text, positive, negative), text
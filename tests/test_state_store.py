@@ -0,0 +1,44 @@
+from portfolio_manager import PortfolioManager
+from state_store import StateStore
+
+NAMES = ["رزين", "محظوظ"]
+
+
+def _recover(root):
+    pm = PortfolioManager(strategy_names=NAMES)
+    StateStore(root).attach(pm)
+    return pm
+
+
+def test_recovery_after_crash_matches_live_state(tmp_path):
+    pm = PortfolioManager(strategy_names=NAMES)
+    store = StateStore(str(tmp_path))
+    store.attach(pm)
+    pm.on_price("1180", 35.0)
+    pm.execute_trade("محظوظ", "BUY", "1180", 35.0, 100, "entry", None)
+    store.snapshot()
+
+    # WAL tail: marks move, a BUY at the current mark (value unchanged), a drop, a partial SELL
+    pm.on_price("1180", 36.2)
+    pm.on_price("1120", 80.0)
+    pm.execute_trade("محظوظ", "BUY", "1180", 36.2, 50, "add", None)
+    pm.execute_trade("رزين", "BUY", "1120", 80.0, 10, "entry", None)
+    pm.on_price("1180", 33.9)
+    pm.on_price("1120", 78.5)
+    pm.execute_trade("محظوظ", "SELL", "1180", 33.9, 70, "cut", None)
+    pm.on_price("1180", 34.4)
+    # Killed here: the WAL is left as written, nothing is closed or snapshotted
+
+    recovered = _recover(str(tmp_path))
+    for name in NAMES:
+        assert recovered.portfolios[name]["total_value"] == pm.portfolios[name]["total_value"]
+        assert recovered.portfolios[name]["cash"] == pm.portfolios[name]["cash"]
+        assert recovered.metrics[name].max_drawdown_pct == pm.metrics[name].max_drawdown_pct
+        assert recovered.metrics[name].report() == pm.metrics[name].report()
+        assert recovered.valuation.value(name) == pm.valuation.value(name)
+    assert recovered.valuation.marks == pm.valuation.marks
+
+    # Valuation keeps following prices from the recovered state
+    pm.on_price("1180", 35.1)
+    recovered.on_price("1180", 35.1)
+    assert recovered.portfolios["محظوظ"]["total_value"] == pm.portfolios["محظوظ"]["total_value"]
@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pytest
+
+import indicators
+from streaming_indicators import RollingStdev, SymbolIndicators
+
+
+def _series(n=200, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    high = close * (1 + rng.uniform(0, 0.01, n))
+    low = close * (1 - rng.uniform(0, 0.01, n))
+    volume = rng.uniform(5e5, 2e6, n)
+    volume[rng.choice(n, 10, replace=False)] *= 4  # Some spikes
+    return high, low, close, volume
+
+
+def _vectorized(high, low, close, volume, t):
+    """
+    Indicator values at bar t from the whole-history functions (one-row matrices).
+    """
+    h, l, c, v = (x[None, :t + 1] for x in (high, low, close, volume))
+    ema_fast, ema_slow = indicators.ema(c, 10), indicators.ema(c, 30)
+    sma_fast, sma_slow = indicators.sma(c, 10), indicators.sma(c, 30)
+    return {
+        "rsi": indicators.rsi(c, 14)[0, -1],
+        "ema_fast": ema_fast[0, -1],
+        "ema_slow": ema_slow[0, -1],
+        "sma_fast": sma_fast[0, -1],
+        "sma_slow": sma_slow[0, -1],
+        "ema_cross": int(indicators.crossover(ema_fast, ema_slow)[0, -1]),
+        "sma_cross": int(indicators.crossover(sma_fast, sma_slow)[0, -1]),
+        "atr": indicators.atr(h, l, c, 14)[0, -1],
+        "volume_ratio": indicators.volume_ratio(v, 20)[0, -1],
+    }
+
+
+def _assert_same(streamed, vectorized):
+    for key, expected in vectorized.items():
+        if isinstance(expected, float) and math.isnan(expected):
+            assert streamed[key] is None, key
+        else:
+            assert streamed[key] == pytest.approx(round(float(expected), 4), abs=1e-4), key
+
+
+def test_committed_values_match_the_vectorized_functions():
+    high, low, close, volume = _series()
+    stream = SymbolIndicators()
+    for t in range(len(close)):
+        stream.commit(t, high[t], low[t], close[t], volume[t])
+        _assert_same(stream.values(), _vectorized(high, low, close, volume, t))
+
+
+def test_peek_matches_committing_the_forming_bar():
+    high, low, close, volume = _series()
+    stream = SymbolIndicators()
+    for t in range(len(close) - 1):
+        stream.commit(t, high[t], low[t], close[t], volume[t])
+    peeked = stream.values(price=close[-1])
+    state = stream.state()
+
+    stream.commit(len(close) - 1, high[-1], low[-1], close[-1], volume[-1])
+    committed = stream.values()
+    for key in ("rsi", "ema_fast", "ema_slow", "sma_fast", "sma_slow", "ema_cross", "sma_cross", "close"):
+        assert peeked[key] == committed[key], key
+    # Peeking left the state untouched
+    restored = SymbolIndicators()
+    restored.load(state)
+    assert restored.values(price=close[-1]) == peeked
+
+
+def test_checkpoint_round_trip_continues_identically():
+    high, low, close, volume = _series()
+    stream = SymbolIndicators()
+    for t in range(120):
+        stream.commit(t, high[t], low[t], close[t], volume[t])
+    resumed = SymbolIndicators()
+    resumed.load(stream.state())
+    for t in range(120, len(close)):
+        stream.commit(t, high[t], low[t], close[t], volume[t])
+        resumed.commit(t, high[t], low[t], close[t], volume[t])
+    assert resumed.values() == stream.values()
+    assert not resumed.commit(10, high[10], low[10], close[10], volume[10])  # Old bars are ignored
+
+
+def test_missing_values_do_not_poison_rolling_state():
+    window = RollingStdev(3)
+    for x in (1.0, 2.0, float("nan"), None, 3.0):
+        window.update(x)
+    assert window.value == pytest.approx((2.0, np.std([1.0, 2.0, 3.0])))
@@ -0,0 +1,21 @@
+import datetime
+import os
+
+from trading_calendar import KSA, TradingCalendar
+
+HOLIDAYS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tadawul_holidays.txt")
+
+
+def test_eid_closures_are_not_trading_days():
+    calendar = TradingCalendar(HOLIDAYS)
+    assert not calendar.is_trading_day(datetime.date(2025, 3, 31))  # Eid al-Fitr, a Monday
+    assert not calendar.is_trading_day(datetime.date(2025, 6, 8))   # Eid al-Adha, a Sunday
+    assert calendar.is_trading_day(datetime.date(2025, 4, 3))       # Trading resumes
+
+
+def test_market_stays_closed_through_eid():
+    calendar = TradingCalendar(HOLIDAYS)
+    noon = datetime.datetime(2025, 3, 31, 12, 0, tzinfo=KSA).timestamp()
+    assert calendar.session(noon) == "closed"
+    resume = datetime.datetime(2025, 4, 3, 10, 0, tzinfo=KSA).timestamp()
+    assert calendar.next_open(noon) == resume
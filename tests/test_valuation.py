@@ -0,0 +1,50 @@
+import pytest
+
+from portfolio_manager import PortfolioManager
+from valuation import ValuationEngine
+
+
+def test_price_change_revalues_only_holders():
+    engine = ValuationEngine()
+    engine.set_position("رزين", "2222", 10, 28.0)
+    engine.set_position("قناص", "1120", 5, 80.0)
+
+    assert engine.on_price("2222", 30.0) == {"رزين": pytest.approx(300.0)}
+    assert engine.value("قناص") == pytest.approx(400.0)
+    # Same price again, or a symbol nobody holds: nothing to revalue
+    assert engine.on_price("2222", 30.0) == {}
+    assert engine.on_price("7010", 40.0) == {}
+
+
+def test_position_value_matches_full_revaluation():
+    engine = ValuationEngine()
+    moves = [("set", "رزين", "2222", 10, 28.0), ("price", "2222", 29.5), ("set", "رزين", "1120", 4, 80.0),
+             ("set", "قناص", "2222", 7, 29.5), ("price", "1120", 78.25), ("set", "رزين", "2222", 3, None),
+             ("price", "2222", 27.75), ("set", "قناص", "2222", 0, None), ("price", "2222", 31.0)]
+    for move in moves:
+        if move[0] == "set":
+            engine.set_position(*move[1:])
+        else:
+            engine.on_price(*move[1:])
+        for portfolio, positions in engine.positions.items():
+            expected = sum(quantity * engine.marks[symbol] for symbol, quantity in positions.items())
+            assert engine.value(portfolio) == pytest.approx(expected)
+    assert engine.value("قناص") == 0.0
+    assert "قناص" not in engine.holders["2222"]
+
+
+def test_portfolio_value_and_drawdown_follow_prices():
+    pm = PortfolioManager(strategy_names=["رزين", "قناص"])
+    for name in pm.portfolios:
+        pm.reset_portfolio(name, 100000.0)
+    pm.execute_trade("رزين", "BUY", "2222", 50.0, 100, "entry", {"target_price": 60.0, "stop_loss": 40.0})
+    cash = pm.portfolios["رزين"]["cash"]
+    peak = pm.portfolios["رزين"]["total_value"]
+
+    pm.on_price("2222", 45.0)
+
+    value = pm.portfolios["رزين"]["total_value"]
+    assert value == pytest.approx(cash + 4500.0)
+    assert pm.portfolios["قناص"]["total_value"] == 100000.0
+    assert pm.get_audit_report("رزين")["max_drawdown_pct"] == pytest.approx((max(peak, 100000.0) - value) / max(peak, 100000.0) * 100, abs=0.01)
+    assert [entry["name"] for entry in pm.get_portfolio_summary()] == ["قناص", "رزين"]
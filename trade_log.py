@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+from trade_record import TradeRecord, json_default
+
+
+class TradeLog:
+    """
+    Append-only trade history on disk, one JSON-lines segment per challenge week.
+
+    Segment files are named after the week start (week-YYYYmmddTHHMMSS.jsonl),
+    so sorting by name is chronological. Each line is one trade record with
+    the strategy name and the time it was logged. Portfolios keep only their
+    recent trades in memory; everything older is read back lazily with
+    iter_trades().
+    """
+    PREFIX = "week-"
+    SUFFIX = ".jsonl"
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.segment = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def segment_name(self, week_start):
+        return f"{self.PREFIX}{week_start.strftime('%Y%m%dT%H%M%S')}{self.SUFFIX}"
+
+    def start_segment(self, week_start):
+        """
+        Closes the current segment; later appends go to the one for week_start.
+        """
+        with self._lock:
+            self._close()
+            self.segment = self.segment_name(week_start)
+        return self.segment
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def append(self, strategy_name, record):
+        """
+        Logs one trade (a TradeRecord or a dict of the same shape).
+        """
+        if isinstance(record, TradeRecord):
+            record = record.to_dict()
+        line = json.dumps({**record, "strategy": strategy_name, "logged_at": time.time()},
+                          ensure_ascii=False, default=json_default)
+        with self._lock:
+            if self._file is None:
+                if self.segment is None:
+                    # Trades before any week started: open a segment named after now
+                    self.segment = f"{self.PREFIX}{time.strftime('%Y%m%dT%H%M%S')}{self.SUFFIX}"
+                self._file = open(os.path.join(self.root, self.segment), "a", encoding="utf-8")
+            # One write per record and a flush, so readers only ever see whole lines
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def segments(self):
+        """
+        Segment names, oldest first.
+        """
+        return sorted(name for name in os.listdir(self.root)
+                      if name.startswith(self.PREFIX) and name.endswith(self.SUFFIX))
+
+    def iter_trades(self, strategy_name=None, segments=None, newest_first=False):
+        """
+        Lazily yields logged trade records, optionally for one strategy and a
+        subset of segments. Files are opened one at a time as iteration reaches
+        them; newest_first walks segments backwards (lines within a segment are
+        still read in order, then yielded reversed).
+        """
+        available = self.segments()
+        names = available if segments is None else [s for s in segments if s in available]
+        if newest_first:
+            names = reversed(names)
+        for name in names:
+            records = self._read_segment(name, strategy_name)
+            if newest_first:
+                yield from reversed(list(records))
+            else:
+                yield from records
+
+    def _read_segment(self, name, strategy_name):
+        try:
+            f = open(os.path.join(self.root, name), encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line of a crashed writer
+                if strategy_name is None or record.get("strategy") == strategy_name:
+                    yield record
@@ -0,0 +1,94 @@
+import sys
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class TradeRecord:
+    """
+    One executed trade, immutable once recorded.
+
+    Slotted instead of a dict: a record is a fixed set of attribute slots,
+    strings that repeat across trades (action, symbol, strategy, reason,
+    verification link, horizon) are interned so every record shares one copy,
+    and goals are kept as three fields rather than a nested dict. Records are
+    shared by history, lots, the trade log and published snapshots; to_dict()
+    gives the JSON shape the API has always served.
+    """
+    __slots__ = ("strategy", "action", "symbol", "price", "quantity", "timestamp", "reason",
+                 "verification_link", "rsi_value", "target_price", "stop_loss", "time_horizon",
+                 "lot_id", "lots", "pnl")
+
+    def __init__(self, action, symbol, price, quantity, reason=None, timestamp="Now", goals=None,
+                 verification_link=None, rsi_value=None, lot_id=None, lots=None, pnl=None, strategy=None):
+        self.strategy = _intern(strategy)
+        self.action = _intern(action)
+        self.symbol = _intern(symbol)
+        self.price = price
+        self.quantity = quantity
+        self.timestamp = _intern(timestamp)
+        self.reason = _intern(reason)
+        self.verification_link = _intern(verification_link)
+        self.rsi_value = rsi_value
+        goals = goals or {}
+        self.target_price = goals.get("target_price")
+        self.stop_loss = goals.get("stop_loss")
+        self.time_horizon = _intern(goals.get("time_horizon"))
+        self.lot_id = lot_id
+        self.lots = lots  # SELL: tuple of (lot_id, quantity, entry_price) per lot closed
+        self.pnl = pnl
+
+    @property
+    def goals(self):
+        if self.target_price is None and self.stop_loss is None and self.time_horizon is None:
+            return None
+        return {"target_price": self.target_price, "stop_loss": self.stop_loss, "time_horizon": self.time_horizon}
+
+    def to_dict(self):
+        record = {
+            "action": self.action,
+            "symbol": self.symbol,
+            "price": self.price,
+            "quantity": self.quantity,
+            "timestamp": self.timestamp,
+            "reason": self.reason,
+            "goals": self.goals,
+        }
+        if self.action == "SELL":
+            record["lots"] = [{"lot_id": lot_id, "quantity": quantity, "entry_price": entry_price}
+                              for lot_id, quantity, entry_price in self.lots or ()]
+            record["pnl"] = self.pnl
+        else:
+            record["verification_link"] = self.verification_link
+            record["rsi_value"] = self.rsi_value
+            record["lot_id"] = self.lot_id
+        if self.strategy is not None:
+            record["strategy"] = self.strategy
+        return record
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuilds a record from its to_dict() form (snapshots, WAL, trade log).
+        """
+        lots = data.get("lots")
+        return cls(data["action"], data["symbol"], data["price"], data["quantity"], data.get("reason"),
+                   data.get("timestamp", "Now"), data.get("goals"), data.get("verification_link"),
+                   data.get("rsi_value"), data.get("lot_id"),
+                   tuple((lot["lot_id"], lot["quantity"], lot["entry_price"]) for lot in lots) if lots else None,
+                   data.get("pnl"), data.get("strategy"))
+
+    def __repr__(self):
+        return f"TradeRecord({self.action} {self.quantity} {self.symbol!r} @ {self.price})"
+
+
+def json_default(obj):
+    """
+    json.dumps(default=...) hook: trade records serialize as their dict form,
+    anything else unknown as str (as the stores always did).
+    """
+    if isinstance(obj, TradeRecord):
+        return obj.to_dict()
+    return str(obj)
+
@@ -0,0 +1,108 @@
+import datetime
+import os
+
+KSA = datetime.timezone(datetime.timedelta(hours=3), "AST")
+
+
+class TradingCalendar:
+    """
+    Tadawul trading sessions: Sunday to Thursday, 10:00-15:00 KSA time,
+    minus the holidays listed in a local file.
+
+    Holiday file format: one date per line (YYYY-MM-DD) or an inclusive range
+    (YYYY-MM-DD..YYYY-MM-DD); text after '#' is ignored.
+    Times are epoch seconds in and out.
+    """
+    # Python weekday(): Monday=0 ... Sunday=6
+    TRADING_WEEKDAYS = (6, 0, 1, 2, 3)
+
+    def __init__(self, holidays_path=None, open_time=datetime.time(10, 0),
+                 close_time=datetime.time(15, 0), pre_open_minutes=15):
+        self.open_time = open_time
+        self.close_time = close_time
+        self.pre_open = datetime.timedelta(minutes=pre_open_minutes)
+        self.holidays = set()
+        if holidays_path:
+            self.load_holidays(holidays_path)
+
+    def load_holidays(self, path):
+        if not os.path.exists(path):
+            print(f"Warning: Holiday file {path} not found, trading every Sunday-Thursday")
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                if ".." in line:
+                    first, last = (datetime.date.fromisoformat(p.strip()) for p in line.split(".."))
+                else:
+                    first = last = datetime.date.fromisoformat(line)
+                day = first
+                while day <= last:
+                    self.holidays.add(day)
+                    day += datetime.timedelta(days=1)
+
+    def is_trading_day(self, day):
+        return day.weekday() in self.TRADING_WEEKDAYS and day not in self.holidays
+
+    def _local(self, ts):
+        return datetime.datetime.fromtimestamp(ts, KSA)
+
+    def _at(self, day, at):
+        return datetime.datetime.combine(day, at, KSA)
+
+    def is_open(self, ts):
+        now = self._local(ts)
+        return self.is_trading_day(now.date()) and self.open_time <= now.time() < self.close_time
+
+    def session(self, ts):
+        """
+        "open", "pre_open" (within pre_open_minutes of the bell) or "closed".
+        """
+        if self.is_open(ts):
+            return "open"
+        if self.next_open(ts) - ts <= self.pre_open.total_seconds():
+            return "pre_open"
+        return "closed"
+
+    def next_open(self, ts):
+        """
+        Epoch seconds of the next session open (ts itself while the market is open).
+        """
+        if self.is_open(ts):
+            return ts
+        now = self._local(ts)
+        day = now.date()
+        if now.time() >= self.open_time:
+            day += datetime.timedelta(days=1)
+        for _ in range(60):
+            if self.is_trading_day(day):
+                return self._at(day, self.open_time).timestamp()
+            day += datetime.timedelta(days=1)
+        return ts + 86400  # No session in the next 60 days: holiday file is likely wrong
+
+    def session_start(self, ts):
+        """
+        Epoch seconds of the open of the latest session that started at or before ts.
+        """
+        now = self._local(ts)
+        day = now.date()
+        if now.time() < self.open_time:
+            day -= datetime.timedelta(days=1)
+        for _ in range(60):
+            if self.is_trading_day(day):
+                return self._at(day, self.open_time).timestamp()
+            day -= datetime.timedelta(days=1)
+        return ts - 86400
+
+    def poll_interval(self, ts, tick_interval, idle_interval=60.0):
+        """
+        Seconds to wait before the next tick: the normal tick while the session is
+        open or about to open, otherwise idle_interval, shortened so the loop wakes
+        up in time for the pre-open ramp.
+        """
+        if self.session(ts) != "closed":
+            return tick_interval
+        until_pre_open = self.next_open(ts) - self.pre_open.total_seconds() - ts
+        return max(tick_interval, min(idle_interval, until_pre_open))
@@ -0,0 +1,80 @@
+import threading
+
+
+class ValuationEngine:
+    """
+    Incremental mark-to-market for every portfolio at once.
+
+    Keeps the open quantity of each symbol per portfolio, indexed both ways
+    (holders[symbol] and positions[portfolio]), the price each symbol is
+    marked at, and every portfolio's position value (sum of quantity * mark).
+    A price change applies quantity * delta to the portfolios holding that
+    symbol only, so a tick costs O(holders of the symbols whose price moved)
+    instead of O(portfolios x holdings).
+    """
+
+    def __init__(self):
+        self.marks = {}           # symbol -> price positions are valued at
+        self.holders = {}         # symbol -> {portfolio: quantity}
+        self.positions = {}       # portfolio -> {symbol: quantity}
+        self.position_value = {}  # portfolio -> sum(quantity * mark)
+        self._lock = threading.Lock()
+
+    def value(self, portfolio):
+        return self.position_value.get(portfolio, 0.0)
+
+    def set_position(self, portfolio, symbol, quantity, price=None):
+        """
+        Records a portfolio's new open quantity of a symbol.
+        price seeds the mark of a symbol that has not been priced yet (the fill price).
+        Returns the portfolio's position value.
+        """
+        with self._lock:
+            if symbol not in self.marks and price:
+                self.marks[symbol] = price
+            positions = self.positions.setdefault(portfolio, {})
+            holders = self.holders.setdefault(symbol, {})
+            old = positions.get(symbol, 0)
+            if quantity:
+                positions[symbol] = quantity
+                holders[portfolio] = quantity
+            else:
+                positions.pop(symbol, None)
+                holders.pop(portfolio, None)
+                if not holders:
+                    del self.holders[symbol]
+            if not positions:
+                # Nothing held: reset exactly instead of carrying float residue
+                self.position_value[portfolio] = 0.0
+            else:
+                self.position_value[portfolio] = self.value(portfolio) + (quantity - old) * self.marks.get(symbol, 0.0)
+            return self.position_value[portfolio]
+
+    def clear(self, portfolio):
+        with self._lock:
+            for symbol in self.positions.pop(portfolio, {}):
+                holders = self.holders[symbol]
+                del holders[portfolio]
+                if not holders:
+                    del self.holders[symbol]
+            self.position_value[portfolio] = 0.0
+
+    def on_price(self, symbol, price):
+        """
+        Marks a symbol at a new price. Returns {portfolio: position value} for
+        the portfolios whose value changed.
+        """
+        with self._lock:
+            mark = self.marks.get(symbol)
+            if not price or price == mark:
+                return {}
+            self.marks[symbol] = price
+            holders = self.holders.get(symbol)
+            if not holders:
+                return {}
+            delta = price - (mark or 0.0)
+            changed = {}
+            for portfolio, quantity in holders.items():
+                self.position_value[portfolio] += quantity * delta
+                changed[portfolio] = self.position_value[portfolio]
+            return changed